@@ -0,0 +1,378 @@
+import argparse
+import json
+import os
+import platform
+import random
+import signal
+import sys
+import tempfile
+import time
+import tracemalloc
+from tabulate import tabulate
+import DVR_log
+import DVR_logic
+
+TOPOLOGIES = ("ring", "grid", "random", "scale-free", "tree")
+
+LOG_LEVELS = {"off": DVR_log.LOG_OFF, "actions": DVR_log.LOG_ACTIONS, "messages": DVR_log.LOG_MESSAGES}
+
+class BenchmarkTimeout(Exception):
+    """
+    Raised when a scenario runs longer than its time limit.
+    """
+
+def ringTopology(n: int, rng: random.Random) -> list[tuple[int, int]]:
+    """
+    Returns the edges of a ring of n nodes.
+    """
+    edges = [(i, i + 1) for i in range(1, n)]
+    if n > 2:
+        edges.append((n, 1))
+    return edges
+
+def gridTopology(n: int, rng: random.Random) -> list[tuple[int, int]]:
+    """
+    Returns the edges of a square grid of n nodes, n being a square.
+    """
+    side = int(round(n ** 0.5))
+    edges = []
+    for r in range(side):
+        for c in range(side):
+            id = r * side + c + 1
+            if c + 1 < side:
+                edges.append((id, id + 1))
+            if r + 1 < side:
+                edges.append((id, id + side))
+    return edges
+
+def randomTopology(n: int, rng: random.Random, degree: float = 4.0) -> list[tuple[int, int]]:
+    """
+    Returns the edges of an Erdős–Rényi graph of n nodes with the given average degree.
+    The edges are sampled directly, instead of testing every pair of nodes.
+    """
+    target = min(int(n * degree / 2), n * (n - 1) // 2)
+    edges = set()
+    while len(edges) < target:
+        a, b = rng.randint(1, n), rng.randint(1, n)
+        if a != b:
+            edges.add((min(a, b), max(a, b)))
+    return sorted(edges)
+
+def scaleFreeTopology(n: int, rng: random.Random, m: int = 2) -> list[tuple[int, int]]:
+    """
+    Returns the edges of a Barabási–Albert graph of n nodes: every new node
+    links to m existing nodes, chosen with probability proportional to their degree.
+    """
+    edges = []
+    #Every node appears once for each of its edges, so uniform sampling follows the degree
+    ends = []
+    for id in range(2, n + 1):
+        targets = set()
+        while len(targets) < min(m, id - 1):
+            targets.add(rng.choice(ends) if ends and rng.random() < 0.9 else rng.randint(1, id - 1))
+        for t in targets:
+            edges.append((t, id))
+            ends += [t, id]
+    return edges
+
+def treeTopology(n: int, rng: random.Random) -> list[tuple[int, int]]:
+    """
+    Returns the edges of a random recursive tree of n nodes: every node links to a random earlier one.
+    """
+    return [(rng.randint(1, id - 1), id) for id in range(2, n + 1)]
+
+GENERATORS = {
+    "ring": ringTopology,
+    "grid": gridTopology,
+    "random": randomTopology,
+    "scale-free": scaleFreeTopology,
+    "tree": treeTopology,
+}
+
+def generateTopology(kind: str, n: int, seed: int) -> tuple[list[int], list[tuple[int, int, int]]]:
+    """
+    Generates a weighted topology. The same kind, size and seed always give the same topology.
+
+    Args:
+        kind (str): One of TOPOLOGIES.
+        n (int): The number of nodes (the grid uses the largest square that fits).
+        seed (int): The seed of the random generator.
+
+    Returns:
+        tuple[list[int], list[tuple[int, int, int]]]: The node identifiers, starting from 1 like in the GUI,
+        and the (src, dst, weight) of every edge.
+    """
+    if kind == "grid":
+        n = max(int(n ** 0.5), 1) ** 2
+    rng = random.Random(f"{kind}-{n}-{seed}")
+    edges = GENERATORS[kind](n, rng)
+    return list(range(1, n + 1)), [(a, b, rng.randint(1, 9)) for a, b in edges]
+
+class Benchmark:
+    """
+    Runs the scenarios of one topology on a network, measuring each of them.
+    The network is built by the first scenario and modified by the following ones.
+
+    Attributes:
+        kind (str): The kind of topology.
+        nodes (list[int]): The node identifiers.
+        edges (list[tuple[int, int, int]]): The (src, dst, weight) of every edge.
+        rng (random.Random): The generator of the failures.
+        NodeList (NodeRegistry): The nodes of the network.
+        NetManager (EdgesMap): The network's edge manager.
+    """
+    def __init__(self, kind: str, n: int, seed: int):
+        """
+        Constructor to generate the topology, with an empty network.
+
+        Args:
+            kind (str): One of TOPOLOGIES.
+            n (int): The number of nodes.
+            seed (int): The seed of the topology and of the failures.
+        """
+        self.kind: str = kind
+        self.nodes, self.edges = generateTopology(kind, n, seed)
+        self.rng: random.Random = random.Random(f"failures-{kind}-{n}-{seed}")
+        self.NodeList: DVR_logic.NodeRegistry = DVR_logic.NodeRegistry()
+        self.NetManager: DVR_logic.EdgesMap = DVR_logic.EdgesMap()
+
+    def addNodes(self):
+        """
+        Adds all the nodes of the topology to the network.
+        """
+        for id in self.nodes:
+            self.NodeList.append(self.NetManager.addNode(id))
+
+    def buildBatch(self) -> DVR_logic.ConvergenceStats:
+        """
+        Builds the network adding all the edges in one transaction, converging once.
+        """
+        self.addNodes()
+        with self.NetManager.transaction(self.NodeList) as transaction:
+            for src, dst, w in self.edges:
+                self.NetManager.addEdge(src, dst, w, self.NodeList)
+        return transaction.stats
+
+    def buildIncremental(self) -> DVR_logic.ConvergenceStats:
+        """
+        Builds the network adding one edge at a time and converging after each, like the GUI does.
+        """
+        self.addNodes()
+        total = DVR_logic.ConvergenceStats()
+        for src, dst, w in self.edges:
+            self.NetManager.addEdge(src, dst, w, self.NodeList)
+            addStats(total, DVR_logic.updateNet(self.NodeList, self.NetManager, [src, dst]))
+        return total
+
+    def edgeFailures(self, count: int) -> DVR_logic.ConvergenceStats:
+        """
+        Removes random edges one at a time, converging after each removal like the GUI does.
+        """
+        total = DVR_logic.ConvergenceStats()
+        edges = self.edgeIds()
+        for src, dst in self.rng.sample(edges, min(count, len(edges))):
+            self.NetManager.removeEdge(src, dst, self.NodeList)
+            addStats(total, DVR_logic.updateNet(self.NodeList, self.NetManager, [src, dst]))
+        return total
+
+    def nodeFailures(self, count: int) -> DVR_logic.ConvergenceStats:
+        """
+        Removes random nodes one at a time, converging after each removal like the GUI does.
+        """
+        total = DVR_logic.ConvergenceStats()
+        for id in self.rng.sample(self.NetManager.getNodesId(), min(count, len(self.NodeList))):
+            neighbors = self.NetManager.getNeighborsId(id)
+            self.NetManager.removeNode(id, self.NodeList)
+            addStats(total, DVR_logic.updateNet(self.NodeList, self.NetManager, neighbors))
+        return total
+
+    def edgeIds(self) -> list[tuple[int, int]]:
+        """
+        Returns the edges currently in the network, each once.
+        """
+        return [(id, nb) for id in self.NetManager.getNodesId() for nb in self.NetManager.getNeighborsId(id) if id < nb]
+
+def addStats(total: DVR_logic.ConvergenceStats, stats: DVR_logic.ConvergenceStats):
+    """
+    Adds the counters of a convergence run to a total.
+    """
+    for k, v in stats.counters().items():
+        setattr(total, k, getattr(total, k) + v)
+
+def measure(action, timeout: float = None, traceMemory: bool = True) -> dict:
+    """
+    Runs an action, measuring its wall time, the memory it allocates and the log it writes.
+
+    Args:
+        action (Callable[[], ConvergenceStats]): The scenario to run.
+        timeout (float, optional): The maximum duration in seconds, enforced where SIGALRM exists.
+        traceMemory (bool): Whether to trace the allocated memory, which slows the run down.
+
+    Returns:
+        dict: The wall time in seconds, the number of updateRoutes calls and the other counters of the
+        convergence, the peak of memory allocated in bytes (None if not traced), the log bytes written
+        and whether the scenario timed out.
+    """
+    DVR_log.flushLog()
+    logStart = DVR_log.sink.bytesWritten
+    useAlarm = timeout and hasattr(signal, "SIGALRM")
+    if useAlarm:
+        def onAlarm(signum, frame):
+            raise BenchmarkTimeout()
+        previous = signal.signal(signal.SIGALRM, onAlarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    if traceMemory:
+        tracemalloc.start()
+
+    stats = DVR_logic.ConvergenceStats()
+    timedOut = False
+    start = time.perf_counter()
+    try:
+        stats = action()
+    except BenchmarkTimeout:
+        timedOut = True
+    finally:
+        wallTime = time.perf_counter() - start
+        if useAlarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    peak = None
+    if traceMemory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    DVR_log.flushLog()
+
+    return {
+        "wallTime": round(wallTime, 6),
+        "updateRoutes": stats.messages,
+        "rounds": stats.rounds,
+        "skipped": stats.skipped,
+        "updates": stats.updates,
+        "entries": stats.entries,
+        "peakMemory": peak,
+        "logBytes": DVR_log.sink.bytesWritten - logStart,
+        "timedOut": timedOut,
+    }
+
+def runBenchmarks(topologies: list[str], sizes: list[int], seed: int = 0, edgeFailures: int = 5, nodeFailures: int = 2,
+                  incrementalMax: int = 200, timeout: float = None, traceMemory: bool = True, progress=None) -> list[dict]:
+    """
+    Runs the scenarios on every topology and size: the build-up of the network, in a single transaction
+    (and, up to incrementalMax nodes, also one edge at a time), then edge failures and node failures.
+    A topology whose scenario times out skips its remaining scenarios, since its tables are left half converged.
+
+    Args:
+        topologies (list[str]): The kinds of topology, from TOPOLOGIES.
+        sizes (list[int]): The numbers of nodes.
+        seed (int): The seed of the topologies and of the failures.
+        edgeFailures (int): The number of edges removed by the edge failure scenario.
+        nodeFailures (int): The number of nodes removed by the node failure scenario.
+        incrementalMax (int): The largest network also built one edge at a time.
+        timeout (float, optional): The maximum duration of each scenario, in seconds.
+        traceMemory (bool): Whether to trace the allocated memory.
+        progress (Callable[[dict], None], optional): Called with every result as soon as it is measured.
+
+    Returns:
+        list[dict]: One record for every scenario run.
+    """
+    results = []
+    for kind in topologies:
+        for n in sizes:
+            scenarios = []
+            if n <= incrementalMax:
+                scenarios.append(("build-incremental", lambda b: b.buildIncremental()))
+            scenarios += [
+                ("build-batch", lambda b: b.buildBatch()),
+                ("edge-failures", lambda b: b.edgeFailures(edgeFailures)),
+                ("node-failures", lambda b: b.nodeFailures(nodeFailures)),
+            ]
+            for name, scenario in scenarios:
+                #Every build starts from an empty network, the failures continue from the last build
+                if name.startswith("build"):
+                    bench = Benchmark(kind, n, seed)
+                record = {"topology": kind, "size": n, "nodes": len(bench.nodes), "edges": len(bench.edges), "scenario": name}
+                record.update(measure(lambda: scenario(bench), timeout, traceMemory))
+                results.append(record)
+                if progress != None:
+                    progress(record)
+                if record["timedOut"]:
+                    break
+    return results
+
+def compareResults(results: list[dict], baseline: list[dict]) -> list[list]:
+    """
+    Compares results with the ones of a previous run, scenario by scenario.
+
+    Args:
+        results (list[dict]): The current results.
+        baseline (list[dict]): The results of the previous run.
+
+    Returns:
+        list[list]: For every scenario in both runs, its key and the ratio current / previous
+        of wall time, updateRoutes calls and peak memory.
+    """
+    def key(r):
+        return (r["topology"], r["size"], r["scenario"])
+    def ratio(a, b):
+        return round(a / b, 3) if a != None and b else None
+    previous = {key(r): r for r in baseline}
+    rows = []
+    for r in results:
+        p = previous.get(key(r))
+        if p != None:
+            rows.append([*key(r), ratio(r["wallTime"], p["wallTime"]), ratio(r["updateRoutes"], p["updateRoutes"]), ratio(r["peakMemory"], p["peakMemory"])])
+    return rows
+
+def main():
+    """
+    Runs the benchmark suite and writes the results to a JSON file.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark of the distance vector routing core on synthetic topologies")
+    parser.add_argument("--topologies", nargs="+", choices=TOPOLOGIES, default=list(TOPOLOGIES), help="kinds of topology (default: all)")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 100, 1000, 10000], help="numbers of nodes (default: 10 100 1000 10000)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the topologies and of the failures")
+    parser.add_argument("--edge-failures", type=int, default=5, help="edges removed by the edge failure scenario")
+    parser.add_argument("--node-failures", type=int, default=2, help="nodes removed by the node failure scenario")
+    parser.add_argument("--incremental-max", type=int, default=200, help="largest network also built one edge at a time")
+    parser.add_argument("--timeout", type=float, default=600, help="maximum seconds for each scenario (0 for none)")
+    parser.add_argument("--update-mode", choices=DVR_logic.UPDATE_MODES, default="full", help="routing tables sent to the neighbors (default: full)")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="actions", help="verbosity of the log, written to a temporary file (default: actions)")
+    parser.add_argument("--no-memory", action="store_true", help="do not trace memory, for more accurate times")
+    parser.add_argument("--output", default="benchmark.json", help="file for the results (default: benchmark.json)")
+    parser.add_argument("--baseline", help="results of a previous run to compare with")
+    args = parser.parse_args()
+
+    DVR_log.setLogLevel(LOG_LEVELS[args.log_level])
+    DVR_logic.setUpdateMode(DVR_logic.UPDATE_MODES[args.update_mode])
+    logFile, DVR_log.sink.path = tempfile.mkstemp(prefix="dvr-bench-", suffix=".log")
+    os.close(logFile)
+
+    columns = ["topology", "size", "nodes", "edges", "scenario", "wallTime", "updateRoutes", "peakMemory", "logBytes", "timedOut"]
+    print(" ".join(columns))
+    def progress(record):
+        print(" ".join(str(record[c]) for c in columns), flush=True)
+
+    try:
+        results = runBenchmarks(args.topologies, args.sizes, args.seed, args.edge_failures, args.node_failures,
+                                args.incremental_max, args.timeout or None, not args.no_memory, progress)
+    finally:
+        DVR_log.sink.close()
+        os.remove(DVR_log.sink.path)
+
+    with open(args.output, 'w') as file:
+        json.dump({
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "arguments": vars(args),
+            "results": results,
+        }, file, indent=1)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        print(tabulate(compareResults(results, baseline), headers=["Topology", "Size", "Scenario", "Time", "updateRoutes", "Memory"]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import csv
+import json
+import sys
+import DVR_logic
+
+#Formats of the exported files
+FORMATS = ("text", "csv", "json")
+
+#Columns of the routing tables in the text format, as in WebNode.__str__
+HEADERS = ("Destination", "Distance", "Next Hop")
+
+class Exporter:
+    """
+    Writes routing tables and edges to a file while reading them, one route or edge at a time, so that
+    the memory used does not depend on the size of the network. The formats are:
+
+    - text: the routing tables as printed by WebNode.__str__, without caching the rendering in the node,
+      and the edges as printed by EdgesMap.__str__;
+    - csv: a row per route (node, destination, distance, next_hop) and per edge (src, dst, weight),
+      each kind with its own header before its first row;
+    - json: JSON Lines, an object per route and per edge, with a "type" field telling them apart.
+
+    Attributes:
+        file (TextIO): The file written.
+        format (str): One of FORMATS.
+    """
+    def __init__(self, file, format: str = "text"):
+        """
+        Constructor to initialize the exporter.
+
+        Args:
+            file (TextIO): The open file to write to.
+            format (str): One of FORMATS.
+
+        Raises:
+            ValueError: If the format is not valid.
+        """
+        if format not in FORMATS:
+            raise ValueError(f"Invalid format {format}")
+        self.file = file
+        self.format: str = format
+        self.__csv = csv.writer(file, lineterminator="\n") if format == "csv" else None
+        self.__headers: set[str] = set()
+
+    def __header(self, kind: str, columns: list[str]):
+        """
+        Writes the CSV header of a kind of rows, before its first row.
+        """
+        if kind not in self.__headers:
+            self.__headers.add(kind)
+            self.__csv.writerow(columns)
+
+    def writeRoutingTable(self, node: DVR_logic.WebNode):
+        """
+        Writes the routing table of a node.
+
+        Args:
+            node (WebNode): The node.
+        """
+        nodeId = node.getId()
+        routingMap = node.getRoutingMap()
+        if self.format == "text":
+            #The widths of the columns, as tabulate computes them, so that the two outputs are the same
+            widths = [len(h) + 2 for h in HEADERS]
+            for k, e in routingMap.items():
+                widths[0] = max(widths[0], len(str(k)))
+                widths[1] = max(widths[1], len(str(e.dist)))
+                widths[2] = max(widths[2], len(str(e.nextHop)))
+            write = self.file.write
+            write(f"Node {nodeId}'s routing table:\n")
+            write("  ".join(h.ljust(w) for h, w in zip(HEADERS, widths)).rstrip() + "\n")
+            write("  ".join("-" * w for w in widths) + "\n")
+            for k, e in routingMap.items():
+                write(f"{str(k).ljust(widths[0])}  {str(e.dist).ljust(widths[1])}  {e.nextHop}\n")
+            if not routingMap:
+                write("\n")
+        elif self.format == "csv":
+            self.__header("route", ["node", "destination", "distance", "next_hop"])
+            writerow = self.__csv.writerow
+            for k, e in routingMap.items():
+                writerow((nodeId, k, e.dist, e.nextHop))
+        else:
+            write = self.file.write
+            for k, e in routingMap.items():
+                write(json.dumps({"type": "route", "node": nodeId, "destination": k, "distance": e.dist, "nextHop": e.nextHop}) + "\n")
+
+    def writeRoutingTables(self, NodeList: list[DVR_logic.WebNode]):
+        """
+        Writes the routing tables of all nodes, one node at a time. In the text format every table is followed by an empty line.
+
+        Args:
+            NodeList (list[WebNode]): The nodes of the network.
+        """
+        for node in NodeList:
+            self.writeRoutingTable(node)
+            if self.format == "text":
+                self.file.write("\n")
+
+    def writeEdges(self, NetManager: DVR_logic.EdgesMap):
+        """
+        Writes every edge of the network once, as listed by EdgesMap.iterEdges.
+
+        Args:
+            NetManager (EdgesMap): The network's edge manager.
+        """
+        if self.format == "text":
+            write = self.file.write
+            write("Edge Map\n")
+            for src, dst, w in NetManager.iterEdges():
+                write(f"({src}) -- {w} -- ({dst})\n")
+        elif self.format == "csv":
+            self.__header("edge", ["src", "dst", "weight"])
+            writerow = self.__csv.writerow
+            for edge in NetManager.iterEdges():
+                writerow(edge)
+        else:
+            write = self.file.write
+            for src, dst, w in NetManager.iterEdges():
+                write(json.dumps({"type": "edge", "src": src, "dst": dst, "weight": w}) + "\n")
+
+def exportNetwork(path: str, NodeList: list[DVR_logic.WebNode] = None, NetManager: DVR_logic.EdgesMap = None, format: str = "text"):
+    """
+    Writes the routing tables and the edges of a network to a file, streaming them.
+
+    Args:
+        path (str): The path of the file, '-' for the standard output.
+        NodeList (list[WebNode], optional): The nodes whose routing tables are written, None to skip them.
+        NetManager (EdgesMap, optional): The network's edge manager, None to skip the edges.
+        format (str): One of FORMATS.
+
+    Raises:
+        ValueError: If the format is not valid.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Invalid format {format}")
+    file = sys.stdout if path == "-" else open(path, 'w', newline="")
+    try:
+        exporter = Exporter(file, format)
+        if NodeList != None:
+            exporter.writeRoutingTables(NodeList)
+        if NetManager != None:
+            exporter.writeEdges(NetManager)
+    finally:
+        if file is not sys.stdout:
+            file.close()
@@ -0,0 +1,166 @@
+import math
+from collections import deque
+import numpy as np
+
+#Average length of the edges of a layout, in canvas pixels
+SPACING = 40
+
+#Number of nodes whose hop distances place all the others
+PIVOTS = 50
+
+#Number of steps of the force-directed refinement
+ITERATIONS = 50
+
+def hopDistances(adjacency: list[list[int]], source: int) -> np.ndarray:
+    """
+    Returns the number of hops from a node to every other, with a breadth-first search.
+
+    Args:
+        adjacency (list[list[int]]): The neighbors of every node, as positions in the list.
+        source (int): The position of the starting node.
+
+    Returns:
+        np.ndarray: The hop distance of every node, -1 if it cannot be reached.
+    """
+    dist = np.full(len(adjacency), -1, dtype=np.int64)
+    dist[source] = 0
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        hops = dist[node] + 1
+        for nb in adjacency[node]:
+            if dist[nb] < 0:
+                dist[nb] = hops
+                queue.append(nb)
+    return dist
+
+def pivotLayout(adjacency: list[list[int]], pivots: int = PIVOTS, seed: int = 0) -> np.ndarray:
+    """
+    Places the nodes with pivot MDS (Brandes and Pich): the hop distances from a few pivots, chosen
+    as far as possible from each other, are double centered, and their two main singular vectors
+    are the coordinates. The global shape of the network is found with pivots searches and
+    an SVD of an n x pivots matrix, instead of moving every node step by step.
+
+    Args:
+        adjacency (list[list[int]]): The neighbors of every node, as positions in the list.
+        pivots (int): The number of pivots.
+        seed (int): The seed of the choice of the first pivot.
+
+    Returns:
+        np.ndarray: The n x 2 positions, in hops.
+    """
+    n = len(adjacency)
+    pivots = min(pivots, n)
+    columns = []
+    nearest = np.full(n, np.iinfo(np.int64).max)
+    pivot = int(np.random.default_rng(seed).integers(n))
+    for _ in range(pivots):
+        dist = hopDistances(adjacency, pivot)
+        columns.append(dist)
+        reached = dist >= 0
+        nearest[reached] = np.minimum(nearest[reached], dist[reached])
+        pivot = int(np.argmax(np.where(reached, nearest, -1))) if reached.all() else int(np.argmax(~reached))
+    dist = np.stack(columns, axis=1).astype(np.float64)
+    #Nodes of other components are placed one hop beyond the farthest reachable node
+    dist[dist < 0] = dist.max() + 1
+
+    squared = dist * dist
+    centered = squared - squared.mean(axis=0) - squared.mean(axis=1)[:, None] + squared.mean()
+    u, s, _ = np.linalg.svd(-centered / 2, full_matrices=False)
+    pos = u[:, :2] * np.sqrt(s[:2])
+    if pos.shape[1] < 2:
+        pos = np.hstack([pos, np.zeros((n, 2 - pos.shape[1]))])
+    return pos
+
+def repulsion(pos: np.ndarray, k: float) -> np.ndarray:
+    """
+    Returns the repulsive displacement of every node, k^2 / d away from each node closer than 2k.
+    The nodes are sorted into a grid of cells of side 2k, so that only the pairs in neighboring cells
+    are compared, as in the grid variant of Fruchterman and Reingold.
+
+    Args:
+        pos (np.ndarray): The n x 2 positions of the nodes.
+        k (float): The ideal distance between two nodes.
+
+    Returns:
+        np.ndarray: The n x 2 displacements.
+    """
+    n = len(pos)
+    disp = np.zeros((n, 2))
+    cell = np.floor(pos / (2 * k)).astype(np.int64)
+    cols = cell[:, 0] - cell[:, 0].min()
+    rows = cell[:, 1] - cell[:, 1].min() + 1
+    #One empty row above and below every column, so that the neighbors of a cell never wrap to another column
+    height = rows.max() + 2
+    key = cols * height + rows
+    order = np.argsort(key, kind="stable")
+    sortedKey = key[order]
+    nodes = np.arange(n)
+    for dc in (-1, 0, 1):
+        for dr in (-1, 0, 1):
+            neighborKey = key + dc * height + dr
+            lo = np.searchsorted(sortedKey, neighborKey, "left")
+            counts = np.searchsorted(sortedKey, neighborKey, "right") - lo
+            total = counts.sum()
+            if total == 0:
+                continue
+            #All the pairs (i, j) with j in the neighboring cell of i
+            i = np.repeat(nodes, counts)
+            j = order[np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)]
+            delta = pos[i] - pos[j]
+            d2 = np.einsum("ij,ij->i", delta, delta)
+            force = np.where((i != j) & (d2 < 4 * k * k), k * k / np.maximum(d2, 1e-4), 0.0)
+            disp[:, 0] += np.bincount(i, delta[:, 0] * force, n)
+            disp[:, 1] += np.bincount(i, delta[:, 1] * force, n)
+    return disp
+
+def forceLayout(nodesId: list[int], edges: list[tuple[int, int]], iterations: int = ITERATIONS, seed: int = 0) -> dict[int, tuple[float, float]]:
+    """
+    Places the nodes of a network: pivotLayout finds its global shape, then a few steps of the force-directed
+    layout of Fruchterman and Reingold, where edges pull their nodes together and close nodes push each other apart,
+    separate the nodes placed on top of each other. Every step is computed on whole arrays.
+    The layout is the same for the same network and seed.
+
+    Args:
+        nodesId (list[int]): The identifiers of the nodes.
+        edges (list[tuple[int, int]]): The pairs of nodes joined by an edge.
+        iterations (int): The number of force-directed steps.
+        seed (int): The seed of the choice of the pivots and of the small random shifts that separate overlapping nodes.
+
+    Returns:
+        dict[int, tuple[float, float]]: The position of every node, starting from (0, 0), with edges about SPACING long.
+    """
+    n = len(nodesId)
+    if n == 0:
+        return {}
+    index = {id: i for i, id in enumerate(nodesId)}
+    src = np.fromiter((index[e[0]] for e in edges), np.int64, len(edges))
+    dst = np.fromiter((index[e[1]] for e in edges), np.int64, len(edges))
+    adjacency = [[] for _ in range(n)]
+    for a, b in zip(src.tolist(), dst.tolist()):
+        adjacency[a].append(b)
+        adjacency[b].append(a)
+
+    rng = np.random.default_rng(seed)
+    pos = pivotLayout(adjacency, seed=seed)
+    #Scale the shape so that edges are about SPACING long, the ideal distance of the refinement
+    lengths = np.hypot(*(pos[src] - pos[dst]).T) if len(edges) else np.zeros(0)
+    scale = SPACING / lengths.mean() if len(edges) and lengths.mean() > 0 else SPACING
+    pos = pos * scale + rng.normal(0, SPACING / 10, (n, 2))
+
+    k = SPACING
+    for step in range(iterations):
+        disp = repulsion(pos, k)
+        delta = pos[src] - pos[dst]
+        #Attraction d^2 / k along the edge
+        pull = delta * (np.hypot(delta[:, 0], delta[:, 1]) / k)[:, None]
+        disp[:, 0] += np.bincount(dst, pull[:, 0], n) - np.bincount(src, pull[:, 0], n)
+        disp[:, 1] += np.bincount(dst, pull[:, 1], n) - np.bincount(src, pull[:, 1], n)
+
+        #Every node moves along its displacement by at most the current temperature
+        temperature = k * (1 - step / iterations)
+        length = np.maximum(np.hypot(disp[:, 0], disp[:, 1]), 1e-9)
+        pos += disp * (np.minimum(length, temperature) / length)[:, None]
+
+    pos -= pos.min(axis=0)
+    return {id: (float(pos[i, 0]), float(pos[i, 1])) for i, id in enumerate(nodesId)}
@@ -0,0 +1,162 @@
+import atexit
+import threading
+
+#Log levels, from the least to the most verbose
+LOG_OFF = 0
+LOG_ACTIONS = 1
+LOG_MESSAGES = 2
+
+class LogSink:
+    """
+    Represents a buffered log file.
+    Lines are collected in an in-memory buffer and written to the file in batches
+    by a background thread, so that logging does not open and close the file for every line.
+
+    Attributes:
+        path (str): The path of the log file.
+        level (int): The most verbose level that is written, lines above it are discarded.
+        batchSize (int): The number of buffered lines that wakes up the writer thread.
+        flushInterval (float): The maximum time, in seconds, a line waits in the buffer.
+    """
+    def __init__(self, path: str = 'log.txt', level: int = LOG_MESSAGES, batchSize: int = 4096, flushInterval: float = 0.5):
+        """
+        Constructor to initialize the log sink. The file and the writer thread are opened on the first write.
+
+        Args:
+            path (str): The path of the log file.
+            level (int): The most verbose level that is written.
+            batchSize (int): The number of buffered lines that wakes up the writer thread.
+            flushInterval (float): The maximum time, in seconds, a line waits in the buffer.
+        """
+        self.path: str = path
+        self.level: int = level
+        self.batchSize: int = batchSize
+        self.flushInterval: float = flushInterval
+        self.bytesWritten: int = 0
+        self.__buffer: list[str] = []
+        self.__file = None
+        self.__writer: threading.Thread = None
+        self.__closed: bool = False
+        self.__bufferLock = threading.Condition(threading.Lock())
+        self.__fileLock = threading.Lock()
+
+    def isEnabled(self, level: int) -> bool:
+        """
+        Checks if lines of the given level are written.
+
+        Args:
+            level (int): The level to check.
+
+        Returns:
+            bool: True if the level is enabled, False otherwise.
+        """
+        return level <= self.level
+
+    def write(self, text: str):
+        """
+        Appends a line to the buffer. The line is written to the file by the writer thread.
+
+        Args:
+            text (str): The text to write, including its line terminator.
+        """
+        with self.__bufferLock:
+            self.__buffer.append(text)
+            if self.__writer == None:
+                self.__closed = False
+                self.__writer = threading.Thread(target=self.__run, name="DVR log writer", daemon=True)
+                self.__writer.start()
+            if len(self.__buffer) >= self.batchSize:
+                self.__bufferLock.notify()
+
+    def flush(self):
+        """
+        Writes every buffered line to the file, waiting for the writes to complete.
+        """
+        with self.__fileLock:
+            with self.__bufferLock:
+                batch = self.__buffer
+                self.__buffer = []
+            self.__writeBatch(batch)
+            if self.__file != None:
+                self.__file.flush()
+
+    def reset(self):
+        """
+        Discards the buffered lines and empties the log file.
+        """
+        with self.__fileLock:
+            with self.__bufferLock:
+                self.__buffer = []
+            if self.__file != None:
+                self.__file.close()
+                self.__file = None
+            with open(self.path, 'w'):
+                pass
+            self.bytesWritten = 0
+
+    def close(self):
+        """
+        Flushes the buffer, stops the writer thread and closes the file.
+        The sink can still be used afterwards: the next write reopens it.
+        """
+        with self.__bufferLock:
+            writer = self.__writer
+            self.__closed = True
+            self.__bufferLock.notify()
+        if writer != None:
+            writer.join()
+        self.flush()
+        with self.__fileLock:
+            if self.__file != None:
+                self.__file.close()
+                self.__file = None
+
+    def __run(self):
+        """
+        Body of the writer thread: writes the buffer every flushInterval seconds,
+        or as soon as batchSize lines are waiting, until the sink is closed.
+        """
+        while True:
+            with self.__bufferLock:
+                if not self.__closed and len(self.__buffer) < self.batchSize:
+                    self.__bufferLock.wait(self.flushInterval)
+                closed = self.__closed
+                if closed:
+                    self.__writer = None
+            self.flush()
+            if closed:
+                return
+
+    def __writeBatch(self, batch: list[str]):
+        """
+        Writes a batch of lines to the file. Must be called holding the file lock.
+
+        Args:
+            batch (list[str]): The lines to write.
+        """
+        if not batch:
+            return
+        if self.__file == None:
+            self.__file = open(self.path, 'a', encoding='utf-8')
+        #The file position counts the bytes as written, encoded and with the platform's line terminators
+        start = self.__file.tell()
+        self.__file.write("".join(batch))
+        self.bytesWritten += self.__file.tell() - start
+
+sink: LogSink = LogSink()
+atexit.register(lambda: sink.close())
+
+def setLogLevel(level: int):
+    """
+    Sets the most verbose level written to the log.
+
+    Args:
+        level (int): One of LOG_OFF, LOG_ACTIONS, LOG_MESSAGES.
+    """
+    sink.level = level
+
+def flushLog():
+    """
+    Writes every buffered line to the log file.
+    """
+    sink.flush()
@@ -1,15 +1,38 @@
+from __future__ import annotations
+from collections import deque
+import heapq
+import itertools
+import json
+import time
 from tabulate import tabulate
-#import heapq
+import DVR_log
+
+#Modes of the routing tables sent to the neighbors during the convergence
+#Full: the whole table. Split horizon: without the routes through the receiver.
+#Poison reverse: the routes through the receiver are sent with distance INFINITY.
+#The split modes cut the routes sent, not the number of updateRoutes calls, which can even grow.
+UPDATE_FULL = 0
+UPDATE_SPLIT_HORIZON = 1
+UPDATE_POISON_REVERSE = 2
+
+UPDATE_MODES = {"full": UPDATE_FULL, "split-horizon": UPDATE_SPLIT_HORIZON, "poison-reverse": UPDATE_POISON_REVERSE}
+
+#Distance of a poisoned route, which a receiver treats as a missing route
+INFINITY = float("inf")
 
 class RoutingMapEntry:
     """
     Represents a single entry in the routing table of a node.
     A routing table is a dictionary, where the key is the destination node identifier
     and the value is a RoutingMapEntry object.
+    Entries are slotted, since a network holds one for every pair of connected nodes,
+    and are updated in place by their node when a route changes.
     Attributes:
         dist (int): The distance to the destination.
         nextHop (int): The identifier of the next hop node.
     """
+    __slots__ = ("dist", "nextHop")
+    
     def __init__(self, dist:int, nextHop: int):
         """
         Constructor to initialize a routing table entry.
@@ -30,11 +53,41 @@ class EdgeMapEntry:
         dst (int): The identifier of the destination node.
         w (int): The weight of the edge.
     """
+    __slots__ = ("dst", "w")
+    
     def __init__(self, dst:int, w: int):
         
         self.dst:int = dst
         self.w:int = w
 
+#Stands for a missing route when looking up a received table, and for a withdrawn route in a delta update
+POISONED = RoutingMapEntry(INFINITY, None)
+
+def advertiseRoutes(routingMap: dict[int, RoutingMapEntry], receiverId: int, mode: int = UPDATE_FULL) -> dict[int, RoutingMapEntry]:
+    """
+    Returns the part of a routing table sent to a neighbor in an update mode, see WebNode.advertise.
+    Used as is on tables copied out of their node, for example by DVR_parallel.
+
+    Args:
+        routingMap (dict[int, RoutingMapEntry]): The routing table of the sender.
+        receiverId (int): The identifier of the neighbor.
+        mode (int): UPDATE_FULL, UPDATE_SPLIT_HORIZON or UPDATE_POISON_REVERSE.
+
+    Returns:
+        dict[int, RoutingMapEntry]: The table to send, to be treated as read-only. In full mode it is routingMap itself.
+    """
+    if mode == UPDATE_FULL:
+        return routingMap
+    if mode == UPDATE_SPLIT_HORIZON:
+        return {k: e for k, e in routingMap.items() if e.nextHop != receiverId or k == receiverId}
+    return {k: e if e.nextHop != receiverId or k == receiverId else RoutingMapEntry(INFINITY, e.nextHop) for k, e in routingMap.items()}
+
+#Serial numbers of the WebNodes, telling apart nodes created with the identifier of a removed one
+serials = itertools.count(1)
+
+#Changes kept in the change log of a node beyond the size of its routing table
+CHANGE_LOG_SLACK = 32
+
 class WebNode:
     """
     Represents a node in the network.
@@ -47,7 +100,16 @@ class WebNode:
             id (int): The unique identifier of the node.
         """
         self.__routingMap:dict[int, RoutingMapEntry] = {}
+        self.__byNextHop:dict[int, set[int]] = {}
         self.__id:int = id
+        self.__rendered:str = None
+        self.__dirty:bool = True
+        self.__version:int = 0
+        self.__worsenedVersion:int = 0
+        self.__serial:int = next(serials)
+        self.__changes:list[int] = []
+        self.__changesBase:int = 0
+        self.__received:dict[int, tuple] = {}
         
     def getId(self) -> int:
         """
@@ -61,15 +123,174 @@ class WebNode:
     def getRoutingMap(self) -> dict[int, RoutingMapEntry]:
         """
         Returns the routing map of the node.
+        The map must be treated as read-only: the node tracks its own changes to it.
+        Its entries are updated in place, use copyRoutingMap to keep the table as it is now.
 
         Returns:
             dict[int, RoutingMapEntry]: The routing table for the node.
         """
         return self.__routingMap
     
+    def copyRoutingMap(self) -> dict[int, RoutingMapEntry]:
+        """
+        Returns a copy of the routing map of the node, not affected by later changes.
+
+        Returns:
+            dict[int, RoutingMapEntry]: A copy of the routing table for the node.
+        """
+        return self.__copyOf(self.__routingMap)
+    
+    @staticmethod
+    def __copyOf(routingMap: dict[int, RoutingMapEntry]) -> dict[int, RoutingMapEntry]:
+        """
+        Returns a copy of a routing table, with new entries.
+        """
+        return {k: RoutingMapEntry(e.dist, e.nextHop) for k, e in routingMap.items()}
+    
+    def advertise(self, receiverId: int, mode: int = UPDATE_FULL) -> dict[int, RoutingMapEntry]:
+        """
+        Returns the routing table to send to a neighbor, according to the update mode.
+        The route to the receiver itself is always sent unchanged, since the receiver learns from it its distance to this node.
+
+        Args:
+            receiverId (int): The identifier of the neighbor.
+            mode (int): UPDATE_FULL, UPDATE_SPLIT_HORIZON or UPDATE_POISON_REVERSE.
+
+        Returns:
+            dict[int, RoutingMapEntry]: The table to send, to be treated as read-only. In full mode it is the routing map itself.
+        """
+        return advertiseRoutes(self.__routingMap, receiverId, mode)
+    
+    def getVersion(self) -> int:
+        """
+        Returns the version of the routing table, increased every time the table changes.
+
+        Returns:
+            int: The version of the routing table.
+        """
+        return self.__version
+    
+    def getSerial(self) -> int:
+        """
+        Returns the serial number of the node, unique among all the WebNodes created,
+        even if they have the same identifier.
+
+        Returns:
+            int: The serial number of the node.
+        """
+        return self.__serial
+    
+    def changesSince(self, version: int) -> list[int]:
+        """
+        Returns the destinations whose routes changed, or were removed, after a version of the routing table.
+        The change log only keeps about as many changes as the routing table has routes:
+        older versions must be compared with the whole table.
+
+        Args:
+            version (int): A previous version of the routing table.
+
+        Returns:
+            list[int]: The changed destinations, in the order they changed, possibly repeated.
+            None if the change log does not go back to the version.
+        """
+        if version < self.__changesBase:
+            return None
+        return self.__changes[version - self.__changesBase:]
+    
+    def getReceivedState(self, senderId: int) -> tuple:
+        """
+        Returns the state in which the node last processed a neighbor's routing table, as recorded by the ConvergenceEngine.
+
+        Args:
+            senderId (int): The identifier of the neighbor.
+
+        Returns:
+            tuple: The recorded state, None if there is none.
+        """
+        return self.__received.get(senderId)
+    
+    def setReceivedState(self, senderId: int, state: tuple):
+        """
+        Records the state in which the node processed a neighbor's routing table.
+        The record is dropped when the table is processed again without recording it,
+        when the routing table is replaced and when the neighbor is no longer connected.
+
+        Args:
+            senderId (int): The identifier of the neighbor.
+            state (tuple): The state, see ConvergenceEngine.
+        """
+        self.__received[senderId] = state
+    
+    def getDestinationsVia(self, nextHopId: int) -> set[int]:
+        """
+        Returns the destinations routed through a next hop, from the index kept along with the routing table.
+        The set must be treated as read-only, and is updated in place when the routes change.
+
+        Args:
+            nextHopId (int): The identifier of the next hop.
+
+        Returns:
+            set[int]: The identifiers of the destinations, empty if no route goes through the next hop.
+        """
+        return self.__byNextHop.get(nextHopId, set())
+    
+    def getWorsenedVersion(self) -> int:
+        """
+        Returns the version of the routing table when a route was last removed or made longer.
+        While it does not change, the table only gained routes or shortened them.
+
+        Returns:
+            int: The version of the last change that removed or lengthened a route.
+        """
+        return self.__worsenedVersion
+    
+    def setRoutingMap(self, routingMap: dict[int, RoutingMapEntry], copy: bool = True):
+        """
+        Replaces the routing map of the node, for example with tables computed elsewhere.
+
+        Args:
+            routingMap (dict[int, RoutingMapEntry]): The new routing table for the node.
+            copy (bool): Whether to copy the table. Without copying, the node takes ownership of
+                the table and its entries, which must not be used elsewhere.
+        """
+        self.__routingMap = self.__copyOf(routingMap) if copy else routingMap
+        self.__byNextHop = {}
+        for k, e in self.__routingMap.items():
+            self.__byNextHop.setdefault(e.nextHop, set()).add(k)
+        self.__dirty = True
+        self.__version += 1
+        self.__worsenedVersion = self.__version
+        self.__changes = []
+        self.__changesBase = self.__version
+        self.__received = {}
+        tablesChanged()
+    
+    def isDirty(self) -> bool:
+        """
+        Checks if the routing table changed since it was last rendered.
+
+        Returns:
+            bool: True if the routing table must be rendered again, False otherwise.
+        """
+        return self.__dirty
+    
     def __str__(self):
         """
         Converts the WebNode to a string representation.
+        The table is rendered only when it changed since the last conversion,
+        otherwise the previous rendering is returned.
+
+        Returns:
+            str: A formatted string showing the node's routing table.
+        """
+        if self.__dirty:
+            self.__rendered = self.__render()
+            self.__dirty = False
+        return self.__rendered
+    
+    def __render(self) -> str:
+        """
+        Renders the routing table with tabulate.
 
         Returns:
             str: A formatted string showing the node's routing table.
@@ -92,66 +313,189 @@ class WebNode:
         )
 
         return f"Node {str(self.__id)}'s routing table:\n{table}\n"
+    
+    def __setRoute(self, dstId: int, dist: int, nextHop: int):
+        """
+        Sets the route to a destination in the routing table, updating the existing entry in place.
+
+        Args:
+            dstId (int): The identifier of the destination.
+            dist (int): The distance to the destination.
+            nextHop (int): The identifier of the next hop node.
+        """
+        entry = self.__routingMap.get(dstId)
+        self.__dirty = True
+        self.__version += 1
+        self.__logChange(dstId)
+        if entry == None:
+            self.__routingMap[dstId] = RoutingMapEntry(dist, nextHop)
+            self.__byNextHop.setdefault(nextHop, set()).add(dstId)
+            return
+        if entry.dist < dist:
+            self.__worsenedVersion = self.__version
+        entry.dist = dist
+        if entry.nextHop != nextHop:
+            self.__unindex(dstId, entry.nextHop)
+            self.__byNextHop.setdefault(nextHop, set()).add(dstId)
+            entry.nextHop = nextHop
+    
+    def __delRoute(self, dstId: int):
+        """
+        Removes the route to a destination from the routing table.
+
+        Args:
+            dstId (int): The identifier of the destination.
+        """
+        self.__unindex(dstId, self.__routingMap.pop(dstId).nextHop)
+        self.__dirty = True
+        self.__version += 1
+        self.__worsenedVersion = self.__version
+        self.__logChange(dstId)
+    
+    def __unindex(self, dstId: int, nextHop: int):
+        """
+        Removes a destination from the next hop index, dropping the next hop when no route goes through it anymore.
+        """
+        destinations = self.__byNextHop[nextHop]
+        destinations.discard(dstId)
+        if not destinations:
+            del self.__byNextHop[nextHop]
+    
+    def __logChange(self, dstId: int):
+        """
+        Appends a change to the change log, one for every version, dropping the oldest half
+        of the log when it grows beyond the size of the routing table.
 
-    def updateRoutes(self, senderId: int, routingMap: dict[int, RoutingMapEntry], phisical:list[EdgeMapEntry]) -> bool:
+        Args:
+            dstId (int): The identifier of the changed destination.
+        """
+        changes = self.__changes
+        changes.append(dstId)
+        if len(changes) > len(self.__routingMap) + CHANGE_LOG_SLACK:
+            half = len(changes) // 2
+            del changes[:half]
+            self.__changesBase += half
+
+    def updateRoutes(self, senderId: int, routingMap: dict[int, RoutingMapEntry], phisical:list[EdgeMapEntry], maxDist: int = INFINITY, delta: bool = False) -> bool:
         """
         Updates the node's routing table based on the received routing table from another node.
+        Routes at distance INFINITY, sent in poison reverse mode, are treated as missing from the table.
+        The route to a neighbor through its edge is as long as the edge, and a route through the sender follows
+        the sender's distance even when it grows: past maxDist the route is deleted, since it is counting to
+        infinity around a loop, and it can be learned again from another neighbor.
+        
+        With delta, routingMap only holds the routes changed since the sender's table was last processed,
+        the withdrawn ones at distance INFINITY, and only they are processed: the ConvergenceEngine sends a
+        delta only if this node did not lose or lengthen any route, nor change its route to the sender, since then.
 
         Args:
             senderId (int): The identifier of the node sending the update.
             routingMap (dict[int, RoutingMapEntry]): The routing map of the sender.
             phisical (list[EdgeMapEntry]): The list of edges connected to this node.
+            maxDist (int): Routes longer than this are not learned, since they can only be stale
+                routes counting to infinity around a loop. See EdgesMap.getDistanceBound.
+            delta (bool): Whether routingMap only holds the changed routes.
 
         Returns:
             bool: True if the routing table was updated, False otherwise.
         """
-        actionLog(f"Node {self.__id}: received {senderId}'s table to update")
+        actionLog("Node %s: received %s's table to update", self.__id, senderId)
+        poisoned = POISONED
+        #The recorded state no longer describes this node, unless the ConvergenceEngine records it again
+        self.__received.pop(senderId, None)
         
         registeredSender = senderId in self.__routingMap.keys()
+        changes = False
+        startVersion = self.__version
+        #The direct edges, looked up only when a route must be compared with them
+        weights = None
         
         # If the sender is not in the routing table, try to add it
-        if self.__id in routingMap.keys() and (not registeredSender or self.__routingMap[senderId].dist > routingMap[self.__id].dist):
-            messageLog(f"Node {self.__id}: adding sender {senderId}: w:{routingMap[self.__id].dist}, nh:{senderId}")
-            self.__routingMap[senderId] = RoutingMapEntry(routingMap[self.__id].dist, senderId)
+        own = routingMap.get(self.__id, poisoned)
+        route = self.__routingMap.get(senderId)
+        edge = next((e.w for e in phisical if e.dst == senderId), None)
+        if edge != None:
+            #The route through the edge is as long as the edge: the sender's distance to this node may go through
+            #other nodes, and would stay stale if a link on that path failed
+            dist = edge if route == None or route.dist > edge or (route.nextHop == senderId and route.dist != edge) else None
+        else:
+            dist = own.dist if own.dist != INFINITY and (route == None or route.dist > own.dist) else None
+        if dist != None:
+            messageLog("Node %s: adding sender %s: w:%s, nh:%s", self.__id, senderId, dist, senderId)
+            self.__setRoute(senderId, dist, senderId)
             registeredSender = True
+            changes = True
         
         #If the sender is still not in the routing table, return False
         if not registeredSender:
-            messageLog(f"Node {self.__id}: has no route to {senderId}")
+            messageLog("Node %s: has no route to %s", self.__id, senderId)
             return False
         
-        changes = False
         deprecated = []
+        removed = 0
         
         #If a route through the sender is no longer reachable, remove it
-        for k in self.__routingMap.keys():
-            if self.__routingMap[k].nextHop == senderId and k != senderId and k not in routingMap.keys():
-                messageLog(f"Node {self.__id}: route to {k} deprecated")
-                deprecated.append(k)
+        #The routes through the sender were all in its table when it was last processed, so a delta only has to check the withdrawn ones
+        if delta:
+            for k, entry in routingMap.items():
+                route = self.__routingMap.get(k) if entry.dist == INFINITY else None
+                if route != None and route.nextHop == senderId and k != senderId:
+                    messageLog("Node %s: route to %s deprecated", self.__id, k)
+                    deprecated.append(k)
+        else:
+            for k in self.__byNextHop.get(senderId, ()):
+                if k != senderId and routingMap.get(k, poisoned).dist == INFINITY:
+                    messageLog("Node %s: route to %s deprecated", self.__id, k)
+                    deprecated.append(k)
         
-        #Update or remove deprecated routes
+        #Update or remove deprecated routes, replacing them with the direct edge if there is one
+        if deprecated and weights == None:
+            weights = {e.dst: e.w for e in phisical}
         for k in deprecated:
-            updated = False
-            for e in phisical:
-                if e.dst == k:
-                    messageLog(f"Node {self.__id}: updating deprecated route to {k}: w:{e.w}, nh:{e.dst}")
-                    self.__routingMap[k] = RoutingMapEntry(e.w, e.dst)
-                    updated = True
-                    break
-            if not updated:
-                messageLog(f"Node {self.__id}: removing deprecated route to {k}")
-                del self.__routingMap[k]
+            w = weights.get(k)
+            if w != None:
+                messageLog("Node %s: updating deprecated route to %s: w:%s, nh:%s", self.__id, k, w, k)
+                self.__setRoute(k, w, k)
+            else:
+                messageLog("Node %s: removing deprecated route to %s", self.__id, k)
+                self.__delRoute(k)
+                removed += 1
             changes = True
             
-        #Update routes to other nodes
-        for k in routingMap.keys():
-            if k != self.__id and (k not in self.__routingMap or self.__routingMap[k].dist > routingMap[k].dist + self.__routingMap[senderId].dist):
-                messageLog(f"Node {self.__id}: updating route to {k}: w:{routingMap[k].dist + self.__routingMap[senderId].dist}, nh:{senderId}")
-                self.__routingMap[k] = RoutingMapEntry(routingMap[k].dist + self.__routingMap[senderId].dist, senderId)
+        #Update routes to other nodes, following the sender's distance for the routes through it, even when it got longer
+        #The routes through the sender go over the edge to it, even if the route to the sender itself is shorter through another node
+        senderDist = edge if edge != None else self.__routingMap[senderId].dist
+        for k, entry in routingMap.items():
+            if k == self.__id or entry.dist == INFINITY:
+                continue
+            dist = entry.dist + senderDist
+            route = self.__routingMap.get(k)
+            if route == None or route.dist > dist:
+                if dist <= maxDist:
+                    messageLog("Node %s: updating route to %s: w:%s, nh:%s", self.__id, k, dist, senderId)
+                    self.__setRoute(k, dist, senderId)
+                    changes = True
+            elif route.nextHop == senderId and route.dist != dist:
+                if weights == None:
+                    weights = {e.dst: e.w for e in phisical}
+                w = weights.get(k)
+                if w != None and w <= dist:
+                    messageLog("Node %s: updating lengthened route to %s: w:%s, nh:%s", self.__id, k, w, k)
+                    self.__setRoute(k, w, k)
+                elif dist <= maxDist:
+                    messageLog("Node %s: lengthening route to %s: w:%s, nh:%s", self.__id, k, dist, senderId)
+                    self.__setRoute(k, dist, senderId)
+                else:
+                    #The route counted to infinity around a loop
+                    messageLog("Node %s: removing route to %s, longer than %s", self.__id, k, maxDist)
+                    self.__delRoute(k)
+                    removed += 1
                 changes = True
         
+        if metrics != None:
+            metrics.recordUpdateRoutes(self.__id, self.__version - startVersion, len(deprecated), removed)
         if changes:
-            messageLog(f"\n{str(self)}\n")
+            messageLog("\n%s\n", self)
         return changes
     
     def readRoutes(self, edges: list[EdgeMapEntry]):
@@ -161,46 +505,145 @@ class WebNode:
         Args:
             edges (list[EdgeMapEntry]): The list of edges connected to this node.
         """
-        messageLog(f"Node {self.__id}: reading routes\n")
+        messageLog("Node %s: reading routes\n", self.__id)
         entryToDel = []
         
-        #Check and remove deprecated routes
-        for k in self.__routingMap.keys():
-            exists = False
-            for e in edges:
-                if e.dst == self.__routingMap[k].nextHop:
-                    if e.w != self.__routingMap[k].dist and e.dst == k:
-                        self.__routingMap[k].dist = e.w
-                        messageLog(f"Node {self.__id}: found deprecated route to {k}\n")
-                        for k1 in self.__routingMap.keys():
-                            if self.__routingMap[k1].nextHop == e.dst and k1 not in entryToDel:
-                                entryToDel.append(k1)
-                    exists = True
-                    break
-            if not exists and k not in entryToDel:
-                entryToDel.append(k)
+        #Forget the tables received from nodes that are no longer neighbors
+        if self.__received:
+            neighbors = {e.dst for e in edges}
+            for k in [k for k in self.__received if k not in neighbors]:
+                del self.__received[k]
+        
+        #Check and remove deprecated routes: all the routes through a next hop that is no longer a neighbor,
+        #or whose edge changed weight, found through the next hop index
+        weights = {e.dst: e.w for e in edges}
+        for nh, destinations in self.__byNextHop.items():
+            w = weights.get(nh)
+            if w != None:
+                route = self.__routingMap.get(nh)
+                if route == None or route.nextHop != nh or route.dist == w:
+                    continue
+                messageLog("Node %s: found deprecated route to %s\n", self.__id, nh)
+            entryToDel += destinations
             
         for k in entryToDel:
-            messageLog(f"Node {self.__id}: removing route to {k}\n")
-            del self.__routingMap[k]
+            messageLog("Node %s: removing route to %s\n", self.__id, k)
+            self.__delRoute(k)
         
         #Update routes
         for e in edges:
             if e.dst not in self.__routingMap.keys() or self.__routingMap[e.dst].dist > e.w:
-                messageLog(f"Node {self.__id}: updating route to {e.dst}: w:{e.w}, nh:{e.dst}\n")
-                self.__routingMap[e.dst] = RoutingMapEntry(e.w, e.dst)
+                messageLog("Node %s: updating route to %s: w:%s, nh:%s\n", self.__id, e.dst, e.w, e.dst)
+                self.__setRoute(e.dst, e.w, e.dst)
                 
-        messageLog(f"\n{str(self)}\n")
+        messageLog("\n%s\n", self)
         
+class NodeRegistry:
+    """
+    Represents the collection of all WebNodes in the network, indexed by their identifier.
+    It keeps the insertion order when iterated, like a list, but lookups, insertions
+    and deletions by identifier are O(1).
+    """
+    def __init__(self, nodes: list[WebNode] = None) -> None:
+        """
+        Constructor to initialize the registry.
+        
+        Args:
+            nodes (list[WebNode], optional): The initial nodes of the registry.
+        """
+        self.__nodes: dict[int, WebNode] = {}
+        if nodes != None:
+            for n in nodes:
+                self.append(n)
+    
+    def __len__(self) -> int:
+        return len(self.__nodes)
+    
+    def __iter__(self):
+        return iter(self.__nodes.values())
+    
+    def __contains__(self, nodeId: int) -> bool:
+        return nodeId in self.__nodes
+    
+    def __getitem__(self, nodeId: int) -> WebNode:
+        """
+        Returns the node with the given identifier.
+        
+        Args:
+            nodeId (int): The identifier of the node.
+
+        Returns:
+            WebNode: The node with the given identifier.
+        
+        Raises:
+            KeyError: If the node is not in the registry.
+        """
+        return self.__nodes[nodeId]
+    
+    def get(self, nodeId: int) -> WebNode:
+        """
+        Returns the node with the given identifier.
+        
+        Args:
+            nodeId (int): The identifier of the node.
+
+        Returns:
+            WebNode: The node with the given identifier, or None if the node is not found.
+        """
+        return self.__nodes.get(nodeId)
+    
+    def ids(self) -> list[int]:
+        """
+        Returns the identifiers of the nodes in the registry, in insertion order.
+
+        Returns:
+            list[int]: The identifiers of the nodes.
+        """
+        return list(self.__nodes.keys())
+    
+    def append(self, node: WebNode):
+        """
+        Adds a node to the registry, replacing any node with the same identifier.
+        
+        Args:
+            node (WebNode): The node to add.
+        """
+        self.__nodes[node.getId()] = node
+    
+    def remove(self, node: WebNode):
+        """
+        Removes a node from the registry.
+        
+        Args:
+            node (WebNode): The node to remove.
+        
+        Raises:
+            ValueError: If the node is not in the registry.
+        """
+        if self.__nodes.get(node.getId()) is not node:
+            raise ValueError(f"Node {node.getId()} is not in the registry")
+        del self.__nodes[node.getId()]
+
 class EdgesMap:
     """
     Represents the collection of all edges in the network. It manages the connections between nodes.
+    Each node's edges are indexed by the identifier of the node at the other end, and a reverse
+    index keeps track of the nodes having an edge towards each node, so that adding, finding and
+    removing an edge are O(1) and removing a node only touches its own neighbors.
+    Listeners can be registered to be told about every change, for example to invalidate caches.
     """
     def __init__(self) -> None:
         """
         Constructor to initialize the edge map.
         """
-        self.__edgeMap: dict[int, list[EdgeMapEntry]] = {}
+        self.__edgeMap: dict[int, dict[int, EdgeMapEntry]] = {}
+        self.__reverseMap: dict[int, set[int]] = {}
+        self.__transaction: TopologyTransaction = None
+        self.__listeners: list = []
+        self.__weight: int = 0
+        self.__generation: int = 0
+        #Cached by getDistanceBound, None when it must be computed again
+        self.__bound: int = None
         
     def __str__(self):
         """
@@ -209,14 +652,22 @@ class EdgesMap:
         Returns:
             str: A formatted string showing all edges in the network.
         """
-        toRet = "Edge Map\n"
-        seen = []
-        for k in self.__edgeMap.keys():
-            for e in self.__edgeMap[k]:
-                if (k, e.dst) not in seen and (e.dst, k) not in seen:
-                    seen.append((k, e.dst))
-                    toRet += f'({k}) -- {e.w} -- ({e.dst})\n'
-        return toRet
+        return "Edge Map\n" + "".join(f'({k}) -- {w} -- ({dst})\n' for k, dst, w in self.iterEdges())
+    
+    def iterEdges(self):
+        """
+        Yields every edge once, from the first of its nodes in the order they were added,
+        in O(E) time: an edge is listed at both its ends, and is skipped at the second one.
+
+        Yields:
+            tuple[int, int, int]: The first node, the second node and the weight of every edge.
+        """
+        position = {k: i for i, k in enumerate(self.__edgeMap)}
+        for k, edges in self.__edgeMap.items():
+            i = position[k]
+            for dst, e in edges.items():
+                if position[dst] > i:
+                    yield (k, dst, e.w)
     
     def getMap(self) -> dict[int, list[EdgeMapEntry]]:
         """
@@ -225,7 +676,16 @@ class EdgesMap:
         Returns:
             dict[int, list[EdgeMapEntry]]: The map of all edges.
         """
-        return self.__edgeMap
+        return {k: list(v.values()) for k, v in self.__edgeMap.items()}
+    
+    def getNodesId(self) -> list[int]:
+        """
+        Returns the identifiers of all nodes in the network, in the order they were added.
+
+        Returns:
+            list[int]: The identifiers of the nodes.
+        """
+        return list(self.__edgeMap.keys())
     
     def doExistsNode(self, nodeId: int) -> bool:
         """
@@ -237,7 +697,7 @@ class EdgesMap:
         Returns:
             bool: True if the node exists, False otherwise.
         """
-        return nodeId in self.__edgeMap.keys()
+        return nodeId in self.__edgeMap
     
     def doExistsEdge(self, srcId: int, dstId: int) -> bool:
         """
@@ -250,14 +710,174 @@ class EdgesMap:
         Returns:
             bool: True if the edge exists, False otherwise.
         """
-        if srcId not in self.__edgeMap.keys() or dstId not in self.__edgeMap.keys():
+        if srcId not in self.__edgeMap or dstId not in self.__edgeMap:
             return False
         
-        for e in self.__edgeMap[srcId]:
-            if e.dst == dstId:
-                return True
+        return dstId in self.__edgeMap[srcId]
+    
+    def getEdge(self, srcId: int, dstId: int) -> EdgeMapEntry:
+        """
+        Returns the edge going from a node to another.
+
+        Args:
+            srcId (int): The source node identifier.
+            dstId (int): The destination node identifier.
+
+        Returns:
+            EdgeMapEntry: The edge, or None if it does not exist.
+        """
+        edges = self.__edgeMap.get(srcId)
+        return edges.get(dstId) if edges != None else None
+    
+    def getGeneration(self) -> int:
+        """
+        Returns a counter increased every time a node or an edge is added or removed, or the map is loaded,
+        so that caches depending on the edges can tell when they are stale.
+
+        Returns:
+            int: The generation of the edge map.
+        """
+        return self.__generation
+    
+    def __link(self, srcId: int, dstId: int, weight: int) -> bool:
+        """
+        Inserts the edge going from srcId to dstId, if it does not exist yet.
+
+        Returns:
+            bool: True if the edge was inserted, False otherwise.
+        """
+        if dstId in self.__edgeMap[srcId]:
+            return False
+        self.__edgeMap[srcId][dstId] = EdgeMapEntry(dstId, weight)
+        self.__reverseMap[dstId].add(srcId)
+        self.__weight += weight
+        return True
+    
+    def __unlink(self, srcId: int, dstId: int):
+        """
+        Deletes the edge going from srcId to dstId, if it exists.
+        """
+        edge = self.__edgeMap[srcId].pop(dstId, None)
+        if edge != None:
+            self.__reverseMap[dstId].discard(srcId)
+            self.__weight -= edge.w
         
-        return False
+    def loadMap(self, edgeMap: dict[int, list[EdgeMapEntry]]):
+        """
+        Replaces all the nodes and edges, for example with the ones of a saved network.
+        The nodes do not read the network: their routing tables must be restored separately.
+        
+        Args:
+            edgeMap (dict[int, list[EdgeMapEntry]]): The edges of every node, in the format of getMap.
+                Every edge must be listed at both its ends.
+        
+        Raises:
+            RuntimeError: If a transaction is open.
+        """
+        if self.__transaction != None:
+            raise RuntimeError("Cannot load a map while a transaction is open")
+        self.__edgeMap = {id: {e.dst: e for e in edges} for id, edges in edgeMap.items()}
+        self.__reverseMap = {id: set() for id in self.__edgeMap}
+        self.__weight = 0
+        for id, edges in self.__edgeMap.items():
+            for dst, e in edges.items():
+                self.__reverseMap[dst].add(id)
+                self.__weight += e.w
+        self.__generation += 1
+        self.__bound = None
+        actionLog("Loaded %s nodes", len(self.__edgeMap))
+        if self.__listeners:
+            self.__notify("loadMap", None)
+    
+    def addListener(self, listener):
+        """
+        Registers a function called after every change of the edge map, with the name of the
+        operation ("addNode", "removeNode", "addEdge", "removeEdge" or "loadMap"), the identifiers
+        of the nodes and, for edges, the weight: listener(operation, srcId, dstId, weight).
+        
+        Args:
+            listener (Callable[[str, int, int, int], None]): The function to call.
+        """
+        self.__listeners.append(listener)
+    
+    def removeListener(self, listener):
+        """
+        Unregisters a function registered with addListener.
+        
+        Args:
+            listener (Callable[[str, int, int, int], None]): The function to unregister.
+        """
+        self.__listeners.remove(listener)
+    
+    def __notify(self, operation: str, srcId: int, dstId: int = None, weight: int = None):
+        """
+        Calls the registered listeners.
+        """
+        for listener in self.__listeners:
+            listener(operation, srcId, dstId, weight)
+    
+    def transaction(self, NodeList: list[WebNode]) -> TopologyTransaction:
+        """
+        Opens a transaction: until it is committed, adding and removing edges and nodes
+        only records the nodes that must read the network, instead of making them read it.
+        
+        Args:
+            NodeList (list[WebNode]): The list of WebNodes in the network.
+
+        Returns:
+            TopologyTransaction: The open transaction, usable as a context manager.
+        
+        Raises:
+            RuntimeError: If a transaction is already open.
+        """
+        if self.__transaction != None:
+            raise RuntimeError("A transaction is already open")
+        self.__transaction = TopologyTransaction(self, NodeList)
+        return self.__transaction
+    
+    def commit(self) -> ConvergenceStats:
+        """
+        Commits the open transaction: every node touched by its changes reads the network once,
+        then a single updateNet propagates all the changes.
+
+        Returns:
+            ConvergenceStats: The cost of the convergence.
+        
+        Raises:
+            RuntimeError: If no transaction is open.
+        """
+        if self.__transaction == None:
+            raise RuntimeError("No transaction is open")
+        transaction = self.__transaction
+        self.__transaction = None
+        
+        nodesId = [n for n in transaction.touched if n in self.__edgeMap]
+        actionLog("Committing changes to %s nodes", len(nodesId))
+        makeNodesReadNet(nodesId, self, transaction.NodeList)
+        transaction.stats = updateNet(transaction.NodeList, self, nodesId)
+        return transaction.stats
+    
+    def abort(self):
+        """
+        Closes the open transaction without converging: its changes stay in the edge map, but the routing
+        tables are not updated, and the touched nodes are left in the transaction for the caller.
+        
+        Raises:
+            RuntimeError: If no transaction is open.
+        """
+        if self.__transaction == None:
+            raise RuntimeError("No transaction is open")
+        actionLog("Aborting changes to %s nodes", len(self.__transaction.touched))
+        self.__transaction = None
+    
+    def __nodesChanged(self, nodesId: list[int], NodeList: list[WebNode]):
+        """
+        Makes the indicated nodes read the network, or records them if a transaction is open.
+        """
+        if self.__transaction != None:
+            self.__transaction.touch(nodesId)
+        else:
+            makeNodesReadNet(nodesId, self, NodeList)
         
     def addEdge(self, srcId: int, dstId: int, weight: int, NodeList: list[WebNode]):
         """
@@ -270,22 +890,21 @@ class EdgesMap:
             weight (int): The weight of the edge.
             NodeList (list[WebNode]): The list of WebNodes in the network.
         """
-        if srcId not in self.__edgeMap.keys() or dstId not in self.__edgeMap.keys():
+        if srcId not in self.__edgeMap or dstId not in self.__edgeMap:
             return
         
-        update = False
-        
-        if not self.doExistsEdge(srcId, dstId):
-            self.__edgeMap[srcId].append(EdgeMapEntry(dstId, weight))
-            update = True
-            
-        if not self.doExistsEdge(dstId, srcId):
-            self.__edgeMap[dstId].append(EdgeMapEntry(srcId, weight))
-            update = True
+        update = self.__link(srcId, dstId, weight)
+        update = self.__link(dstId, srcId, weight) or update
             
         if update:
-            actionLog(f"Edge {srcId} - {dstId} added")
-            makeNodesReadNet([srcId, dstId], self, NodeList)
+            self.__generation += 1
+            if self.__bound != None:
+                #A shortest path through the new edge is at most two old shortest paths and the edge
+                self.__bound = min(2 * self.__bound + weight, self.getTotalWeight())
+            actionLog("Edge %s - %s added", srcId, dstId)
+            if self.__listeners:
+                self.__notify("addEdge", srcId, dstId, weight)
+            self.__nodesChanged([srcId, dstId], NodeList)
     
     def removeEdge(self, srcId: int, dstId: int, NodeList: list[WebNode]):
         """
@@ -297,20 +916,20 @@ class EdgesMap:
             dstId (int): The identifier of the destination node.
             NodeList (list[WebNode]): The list of WebNodes in the network.
         """
-        if srcId not in self.__edgeMap.keys() or dstId not in self.__edgeMap.keys():
+        if srcId not in self.__edgeMap or dstId not in self.__edgeMap:
             return
         
-        for e in self.__edgeMap[srcId]:
-            if e.dst == dstId:
-                self.__edgeMap[srcId].remove(e)
-                break
-            
-        for e in self.__edgeMap[dstId]:
-            if e.dst == srcId:
-                self.__edgeMap[dstId].remove(e)
-                break
-        actionLog(f"Edge {srcId} - {dstId} removed")
-        makeNodesReadNet([srcId, dstId], self, NodeList)
+        edge = self.__edgeMap[srcId].get(dstId)
+        self.__unlink(srcId, dstId)
+        self.__unlink(dstId, srcId)
+        if edge != None:
+            self.__generation += 1
+            self.__bound = None
+        
+        actionLog("Edge %s - %s removed", srcId, dstId)
+        if edge != None and self.__listeners:
+            self.__notify("removeEdge", srcId, dstId, edge.w)
+        self.__nodesChanged([srcId, dstId], NodeList)
     
     def addNode(self, nodeId: int) -> WebNode:
         """
@@ -322,9 +941,13 @@ class EdgesMap:
         Returns:
             WebNode: The newly added WebNode object, or None if the node already exists.
         """
-        if nodeId not in self.__edgeMap.keys():
-            actionLog(f"Node {nodeId} added")
-            self.__edgeMap[nodeId] = []
+        if nodeId not in self.__edgeMap:
+            actionLog("Node %s added", nodeId)
+            self.__edgeMap[nodeId] = {}
+            self.__reverseMap[nodeId] = set()
+            self.__generation += 1
+            if self.__listeners:
+                self.__notify("addNode", nodeId)
             return WebNode(nodeId)
         return None
     
@@ -337,26 +960,29 @@ class EdgesMap:
             nodeId (int): The identifier of the node to remove.
             NodeList (list[WebNode]): The list of WebNodes in the network.
         """
-        if nodeId not in self.__edgeMap.keys():
+        if nodeId not in self.__edgeMap:
             return
         
         neighbors = self.getNeighborsId(nodeId)
         
-        actionLog(f"Node {nodeId} removed")
+        actionLog("Node %s removed", nodeId)
         
-        NodeList.remove(NodeList[findNodePos(nodeId, NodeList)])
+        node = getNode(nodeId, NodeList)
+        if node != None:
+            NodeList.remove(node)
         
-        #Remove all edges connected to the node
-        for k in self.__edgeMap.keys():
-            i = 0
-            while i in range(len(self.__edgeMap[k])):
-                if self.__edgeMap[k][i].dst == nodeId:
-                    self.__edgeMap[k].remove(self.__edgeMap[k][i])
-                else:
-                    i+=1
-        del self.__edgeMap[nodeId]
+        #Remove all edges connected to the node, using the reverse index to find them
+        for k in self.__reverseMap.pop(nodeId):
+            self.__weight -= self.__edgeMap[k].pop(nodeId).w
+        for k, e in self.__edgeMap.pop(nodeId).items():
+            self.__reverseMap[k].discard(nodeId)
+            self.__weight -= e.w
+        self.__generation += 1
+        self.__bound = None
         
-        makeNodesReadNet(neighbors, self, NodeList)
+        if self.__listeners:
+            self.__notify("removeNode", nodeId)
+        self.__nodesChanged(neighbors, NodeList)
     
     def getEdges(self, nodeId: int) -> list[EdgeMapEntry]:
         """
@@ -368,7 +994,50 @@ class EdgesMap:
         Returns:
             list[EdgeMapEntry]: The list of edges connected to the node.
         """
-        return self.__edgeMap[nodeId] if nodeId in self.__edgeMap.keys() else None
+        return list(self.__edgeMap[nodeId].values()) if nodeId in self.__edgeMap else None
+    
+    def getTotalWeight(self) -> int:
+        """
+        Returns the sum of the weights of all the edges, counting each edge once.
+        No shortest path can be longer, so a longer route is stale.
+
+        Returns:
+            int: The total weight of the network.
+        """
+        return self.__weight // 2
+    
+    def getDistanceBound(self) -> int:
+        """
+        Returns an upper bound on the length of every shortest path, usually much lower than getTotalWeight.
+        In every connected component, any two nodes are connected through any third one, so no shortest path
+        is longer than the sum of the two longest distances from one of its nodes, computed with Dijkstra.
+        The bound is cached: adding an edge updates it in O(1), while removing edges or nodes,
+        which can lengthen the shortest paths, makes it be computed again, in O(E log V), when next needed.
+
+        Returns:
+            int: The bound, 0 for a network without edges.
+        """
+        if self.__bound == None:
+            bound = 0
+            seen = set()
+            for root in self.__edgeMap:
+                if root in seen:
+                    continue
+                distances = {root: 0}
+                queue = [(0, root)]
+                while queue:
+                    dist, node = heapq.heappop(queue)
+                    if dist > distances[node]:
+                        continue
+                    for dst, e in self.__edgeMap[node].items():
+                        candidate = dist + e.w
+                        if candidate < distances.get(dst, candidate + 1):
+                            distances[dst] = candidate
+                            heapq.heappush(queue, (candidate, dst))
+                seen.update(distances)
+                bound = max(bound, sum(heapq.nlargest(2, distances.values())))
+            self.__bound = bound
+        return self.__bound
     
     def getNeighborsId(self, nodeId: int) -> list[int]:
         """
@@ -380,15 +1049,76 @@ class EdgesMap:
         Returns:
             list[int]: A list of identifiers of the neighboring nodes.
         """
-        edges = self.getEdges(nodeId)
-        nb = []
-        for e in edges:
-            nb.append(e.dst)
-        return nb
+        return list(self.__edgeMap[nodeId].keys())
+
+class TopologyTransaction:
+    """
+    Represents a batch of topology changes on an EdgesMap, opened with EdgesMap.transaction.
+    The changes are applied to the edge map immediately, but the network converges only once,
+    when the transaction is committed. Used as a context manager, it is committed when the block exits,
+    and aborted if the block raises an exception, since the changes may be only half applied.
+    
+    Attributes:
+        NetManager (EdgesMap): The network's edge manager.
+        NodeList (list[WebNode]): The list of WebNodes in the network.
+        touched (dict[int, None]): The nodes touched by the changes, in the order they were touched.
+        stats (ConvergenceStats): The cost of the convergence, once committed.
+    """
+    def __init__(self, NetManager: EdgesMap, NodeList: list[WebNode]):
+        """
+        Constructor to initialize an empty transaction.
+        
+        Args:
+            NetManager (EdgesMap): The network's edge manager.
+            NodeList (list[WebNode]): The list of WebNodes in the network.
+        """
+        self.NetManager:EdgesMap = NetManager
+        self.NodeList:list[WebNode] = NodeList
+        self.touched:dict[int, None] = {}
+        self.stats:ConvergenceStats = None
+    
+    def touch(self, nodesId: list[int]):
+        """
+        Records nodes that must read the network when the transaction is committed.
+        
+        Args:
+            nodesId (list[int]): The identifiers of the nodes.
+        """
+        for n in nodesId:
+            self.touched[n] = None
+    
+    def commit(self) -> ConvergenceStats:
+        """
+        Commits the transaction, see EdgesMap.commit.
+
+        Returns:
+            ConvergenceStats: The cost of the convergence.
+        """
+        return self.NetManager.commit()
+    
+    def abort(self):
+        """
+        Aborts the transaction, see EdgesMap.abort.
+        """
+        self.NetManager.abort()
+    
+    def __enter__(self) -> TopologyTransaction:
+        return self
+    
+    def __exit__(self, excType, exc, tb):
+        if self.stats == None:
+            #A block interrupted halfway, for example by a timeout, must not converge a half applied topology
+            if excType != None:
+                self.abort()
+            else:
+                self.commit()
+        return False
 
 def findNodePos(id: int, NodeList: list[WebNode]) -> int:
     """
     Finds the position of a node in the NodeList by its identifier.
+    If NodeList is a NodeRegistry, the position is the identifier itself,
+    so that NodeList[findNodePos(id, NodeList)] keeps working in O(1).
     
     Args:
         id (int): The identifier of the node.
@@ -397,11 +1127,46 @@ def findNodePos(id: int, NodeList: list[WebNode]) -> int:
     Returns:
         int: The index of the node in the NodeList, or None if the node is not found.
     """
+    if isinstance(NodeList, NodeRegistry):
+        return id if id in NodeList else None
+    
+    for i, n in enumerate(NodeList):
+        if n.getId() == id:
+            return i
+    return None
+
+def getNode(id: int, NodeList: list[WebNode]) -> WebNode:
+    """
+    Returns the node with the given identifier.
+    
+    Args:
+        id (int): The identifier of the node.
+        NodeList (list[WebNode]): The list of WebNodes.
+
+    Returns:
+        WebNode: The node with the given identifier, or None if the node is not found.
+    """
+    if isinstance(NodeList, NodeRegistry):
+        return NodeList.get(id)
+    
     for n in NodeList:
         if n.getId() == id:
-            return NodeList.index(n)
+            return n
     return None
 
+def asRegistry(NodeList: list[WebNode]) -> NodeRegistry:
+    """
+    Returns an indexed view of the given nodes.
+    A NodeRegistry is returned as is, a list is indexed into a new NodeRegistry.
+    
+    Args:
+        NodeList (list[WebNode]): The list of WebNodes.
+
+    Returns:
+        NodeRegistry: The registry of the nodes.
+    """
+    return NodeList if isinstance(NodeList, NodeRegistry) else NodeRegistry(NodeList)
+
 def makeNodesReadNet(nodesId: list[int], NetManager: EdgesMap, NodeList: list[WebNode]):
     """
     Makes the indicated nodes to read the net.
@@ -411,10 +1176,292 @@ def makeNodesReadNet(nodesId: list[int], NetManager: EdgesMap, NodeList: list[We
         NetManager (EdgesMap): The network's edge manager.
         NodeList (list[WebNode]): The list of WebNodes in the network.
     """
+    nodes = asRegistry(NodeList)
     for n in nodesId:
-        NodeList[findNodePos(n, NodeList)].readRoutes(NetManager.getEdges(n))
+        nodes[n].readRoutes(NetManager.getEdges(n))
+    tablesChanged()
+
+class ConvergenceStats:
+    """
+    Represents the cost of a convergence run.
+
+    Attributes:
+        rounds (int): The number of passes started from the priority nodes, including the last one,
+            which finds the network stable.
+        messages (int): The number of routing tables processed, that is the number of updateRoutes calls.
+        skipped (int): The number of routing tables not delivered, because the receiver had already processed them.
+        updates (int): The number of messages that changed the receiver's routing table.
+        entries (int): The number of routes in the processed routing tables, poisoned ones included.
+        suppressed (int): The number of routes left out of the processed routing tables, or poisoned, by the update mode.
+        deltas (int): The number of routing tables sent as a delta, holding only the changed routes.
+        pending (list[int]): The nodes that must still send their routing tables if the run was stopped
+            before the network was stable, empty otherwise.
+    """
+    def __init__(self):
+        """
+        Constructor to initialize empty statistics.
+        """
+        self.rounds:int = 0
+        self.messages:int = 0
+        self.skipped:int = 0
+        self.updates:int = 0
+        self.entries:int = 0
+        self.suppressed:int = 0
+        self.deltas:int = 0
+        self.pending:list[int] = []
+    
+    def counters(self) -> dict[str, int]:
+        """
+        Returns the counters, that is every attribute but the pending nodes.
+
+        Returns:
+            dict[str, int]: The value of every counter, by name.
+        """
+        return {k: v for k, v in vars(self).items() if k != "pending"}
+    
+    def __str__(self):
+        return (f"rounds: {self.rounds}, messages: {self.messages}, skipped: {self.skipped}, updates: {self.updates}, "
+                f"entries: {self.entries}, suppressed: {self.suppressed}, deltas: {self.deltas}")
+
+class ConvergenceEngine:
+    """
+    Propagates routing tables through the network until it stabilizes.
+    Tables are delivered in the same order as the original algorithm: the priority nodes send their
+    tables to their neighbors, every node whose table changes is appended to a FIFO worklist and sends
+    its table in turn, and the whole pass is repeated until it changes nothing.
+    
+    Every node records, with WebNode.setReceivedState, the state in which it processed each neighbor's table,
+    so the record outlives the run. A delivery is skipped if the sender's table did not change since then,
+    and the receiver did not lose or lengthen any route, nor change its route to the sender: updateRoutes
+    would change nothing, so the routing tables are the same as with every delivery performed.
+    If only the sender's table changed, and its change log goes back to the recorded version, the sender
+    sends a delta with just the changed routes, which updateRoutes processes in O(changes) instead of
+    O(table size). Otherwise, or if the delta would not be smaller, the whole table is sent.
+    
+    Every node sends the table built by WebNode.advertise for the update mode: with split horizon or
+    poison reverse, a node does not advertise back the routes it learned through the receiver, so after
+    a failure two neighbors do not keep relaxing each other's stale routes.
+    
+    Routes longer than EdgesMap.getDistanceBound are not learned, which stops a count to infinity.
+    A node that removed or lengthened routes, while processing a table or before the run, may then be left
+    without a route that another neighbor still has, but does not send since its own table did not change:
+    once the worklist is empty, such a node processes again the tables of the neighbors it processed before,
+    as if it asked them to advertise again, and the nodes it changes are appended to the worklist.
+    
+    Attributes:
+        nodes (NodeRegistry): The nodes of the network.
+        NetManager (EdgesMap): The network's edge manager.
+        mode (int): The update mode, UPDATE_FULL, UPDATE_SPLIT_HORIZON or UPDATE_POISON_REVERSE.
+    """
+    def __init__(self, NodeList: list[WebNode], NetManager: EdgesMap, mode: int = None):
+        """
+        Constructor to initialize the engine.
+
+        Args:
+            NodeList (list[WebNode]): The list of WebNodes in the network.
+            NetManager (EdgesMap): The network's edge manager.
+            mode (int): The update mode, by default the one set with setUpdateMode.
+        """
+        self.nodes:NodeRegistry = asRegistry(NodeList)
+        self.NetManager:EdgesMap = NetManager
+        self.mode:int = mode if mode != None else updateMode
+        #After a failure, a stale route around a loop is withdrawn and learned again longer and longer,
+        #in every mode: no shortest path is longer than the distance bound, which stops this count to infinity
+        self.__maxDist:int = NetManager.getDistanceBound()
+        #The nodes that removed or lengthened routes since they last asked their neighbors for their tables
+        self.__worsened:dict[int, None] = {}
+    
+    def __state(self, receiver: WebNode, sender: WebNode) -> tuple[int, int, int, int, int, int]:
+        """
+        Returns what a receiver's processing of a sender's table depends on.
+
+        Returns:
+            tuple[int, int, int, int, int, int]: The sender's table version, the sender's serial number,
+            the receiver's last worsening, the receiver's distance to the sender (None if unknown),
+            the update mode and the longest route that can be learned.
+        """
+        route = receiver.getRoutingMap().get(sender.getId())
+        return (sender.getVersion(), sender.getSerial(), receiver.getWorsenedVersion(), route.dist if route != None else None, self.mode, self.__maxDist)
+    
+    def __delta(self, sender: WebNode, receiver: WebNode, changes: list[int]) -> dict[int, RoutingMapEntry]:
+        """
+        Returns the routes of the sender that changed, as the receiver would see them in the sender's table:
+        the removed ones, and with split horizon or poison reverse the ones through the receiver, are POISONED.
+        Returns None if the receiver's distance to the sender would get shorter, since then every route
+        of the sender must be processed again.
+        """
+        senderMap = sender.getRoutingMap()
+        receiverMap = receiver.getRoutingMap()
+        receiverId = receiver.getId()
+        split = self.mode != UPDATE_FULL
+        delta = {}
+        added = 0
+        for k in changes:
+            if k in delta:
+                continue
+            entry = senderMap.get(k)
+            if entry == None or (split and entry.nextHop == receiverId and k != receiverId):
+                delta[k] = POISONED
+            else:
+                delta[k] = entry
+                if k not in receiverMap:
+                    added += 1
+        own = delta.get(receiverId)
+        route = receiverMap.get(sender.getId())
+        if own != None and own.dist != INFINITY and (route == None or route.dist > own.dist):
+            return None
+        if added > 1:
+            #New routes are added to the receiver's table in the order of the sender's table, as with the whole table
+            ordered = {k: e for k, e in delta.items() if k not in senderMap}
+            ordered.update((k, delta[k]) for k in senderMap if k in delta)
+            delta = ordered
+        return delta
+    
+    def isPending(self, receiverId: int, senderId: int) -> bool:
+        """
+        Checks if a node has to process a neighbor's routing table.
+
+        Args:
+            receiverId (int): The identifier of the receiving node.
+            senderId (int): The identifier of the sending node.
+
+        Returns:
+            bool: True if processing the sender's table may change the receiver's, False otherwise.
+        """
+        receiver = self.nodes[receiverId]
+        return receiver.getReceivedState(senderId) != self.__state(receiver, self.nodes[senderId])
+    
+    def __deliver(self, sender: WebNode, receiverId: int, stats: ConvergenceStats) -> bool:
+        """
+        Delivers a routing table to a neighbor, unless the neighbor already processed it.
+
+        Returns:
+            bool: True if the receiver's routing table was updated, False otherwise.
+        """
+        senderId = sender.getId()
+        receiver = self.nodes[receiverId]
+        seen = receiver.getReceivedState(senderId)
+        state = self.__state(receiver, sender)
+        if seen == state:
+            stats.skipped += 1
+            return False
+        
+        stats.messages += 1
+        worsened = receiver.getWorsenedVersion()
+        #Only the sender's table changed since the receiver processed it: send the changes, if the log has them
+        changes = sender.changesSince(seen[0]) if seen != None and seen[1:] == state[1:] else None
+        routingMap = self.__delta(sender, receiver, changes) if changes != None and len(changes) < len(sender.getRoutingMap()) else None
+        delta = routingMap != None
+        if delta:
+            stats.deltas += 1
+            stats.entries += len(routingMap)
+        elif self.mode == UPDATE_FULL:
+            routingMap = sender.getRoutingMap()
+            stats.entries += len(routingMap)
+        else:
+            routingMap = sender.advertise(receiverId, self.mode)
+            full = len(sender.getRoutingMap())
+            stats.entries += len(routingMap)
+            stats.suppressed += full - len(routingMap) if self.mode == UPDATE_SPLIT_HORIZON else sum(e.dist == INFINITY for e in routingMap.values())
+        changed = receiver.updateRoutes(senderId, routingMap, self.NetManager.getEdges(receiverId), self.__maxDist, delta)
+        receiver.setReceivedState(senderId, self.__state(receiver, sender))
+        if changed:
+            stats.updates += 1
+            if receiver.getWorsenedVersion() != worsened:
+                self.__worsened[receiverId] = None
+        return changed
+    
+    def __relearn(self, stats: ConvergenceStats) -> list[int]:
+        """
+        Makes the nodes that removed or lengthened routes process again the tables of the neighbors
+        they processed before that, since those neighbors do not send them again unless they change.
+
+        Returns:
+            list[int]: The nodes whose routing table was updated.
+        """
+        worsened = self.__worsened
+        self.__worsened = {}
+        changed = []
+        for id in worsened:
+            if not self.NetManager.doExistsNode(id):
+                continue
+            receiver = self.nodes[id]
+            for nb in self.NetManager.getNeighborsId(id):
+                seen = receiver.getReceivedState(nb)
+                if seen != None and seen[2] != receiver.getWorsenedVersion() and self.__deliver(self.nodes[nb], id, stats):
+                    changed.append(id)
+        return list(dict.fromkeys(changed))
+    
+    def run(self, priorityNodesId: list[int], progress=None) -> ConvergenceStats:
+        """
+        Makes the indicated nodes send their routing tables to their neighbors,
+        and propagates every resulting change until the network is stable.
+        
+        If progress returns False, the run stops after the current node: the priority nodes, the nodes
+        still in the worklist and those still to process their neighbors' tables again are left in the
+        pending list of the statistics, and a later run started from them completes the propagation.
+
+        Args:
+            priorityNodesId (list[int]): The list of node identifiers to process first.
+            progress (Callable[[ConvergenceStats], bool], optional): Called after every node has sent its table,
+                with the statistics so far; returning False stops the run.
+
+        Returns:
+            ConvergenceStats: The cost of the run.
+        """
+        stats = ConvergenceStats()
+        priority = [id for id in priorityNodesId if self.NetManager.doExistsNode(id)]
+        observeQueue = metrics.observeQueue if metrics != None else None
+        
+        #The priority nodes may have removed routes while reading the network
+        self.__worsened = dict.fromkeys(priority)
+        changes = True
+        while changes:
+            queue = deque(priority)
+            stats.rounds += 1
+            
+            changes = False
+            
+            #simulate the real order of updates
+            while queue:
+                if observeQueue != None:
+                    observeQueue(len(queue))
+                id = queue.popleft()
+                sender = self.nodes[id]
+                for nb in self.NetManager.getNeighborsId(id):
+                    if self.__deliver(sender, nb, stats):
+                        queue.append(nb)
+                        changes = True
+                if progress != None and not progress(stats):
+                    stats.pending = list(dict.fromkeys(priority + list(queue) + list(self.__worsened)))
+                    return stats
+                if not queue and self.__worsened:
+                    relearned = self.__relearn(stats)
+                    if relearned:
+                        queue.extend(relearned)
+                        changes = True
+        
+        return stats
+
+#The update mode used by updateNet, see setUpdateMode
+updateMode: int = UPDATE_FULL
+
+def setUpdateMode(mode: int):
+    """
+    Sets the update mode used by updateNet, and so by the GUI and the EdgesMap transactions.
+    
+    Args:
+        mode (int): UPDATE_FULL, UPDATE_SPLIT_HORIZON or UPDATE_POISON_REVERSE.
+    
+    Raises:
+        ValueError: If the mode is not valid.
+    """
+    global updateMode
+    if mode not in UPDATE_MODES.values():
+        raise ValueError(f"Invalid update mode {mode}")
+    updateMode = mode
 
-def updateNet(NodeList: list[WebNode], NetManager: EdgesMap, priorityNodesId:list[int]):
+def updateNet(NodeList: list[WebNode], NetManager: EdgesMap, priorityNodesId:list[int], mode: int = None, progress=None) -> ConvergenceStats:
     """
     Updates the network's routing tables by processing the nodes in the priority list.
     
@@ -422,65 +1469,390 @@ def updateNet(NodeList: list[WebNode], NetManager: EdgesMap, priorityNodesId:lis
         NodeList (list[WebNode]): The list of WebNodes in the network.
         NetManager (EdgesMap): The network's edge manager.
         priorityNodesId (list[int]): The list of node identifiers to process first.
+        mode (int): The update mode, by default the one set with setUpdateMode.
+        progress (Callable[[ConvergenceStats], bool], optional): Called while the network converges,
+            see ConvergenceEngine.run; returning False stops the convergence.
+    
+    Returns:
+        ConvergenceStats: The number of rounds and messages needed to converge.
     """
-    changes = True
-    while changes:
-        queue = priorityNodesId[:]
-        
-        changes = False
-        
-        #simulate the real order of updates
-        while queue:
-            id = queue.pop(0)
-            for nb in NetManager.getNeighborsId(id):
-                if NodeList[findNodePos(nb, NodeList)].updateRoutes(id, NodeList[findNodePos(id, NodeList)].getRoutingMap(), NetManager.getEdges(nb)):
-                    queue.append(nb)
-                    changes = True
-                    
-def actionLog(message: str):
+    try:
+        return ConvergenceEngine(NodeList, NetManager, mode).run(priorityNodesId, progress)
+    finally:
+        tablesChanged()
+
+#Increased every time the routing tables may have changed, see tablesChanged
+tablesGeneration: int = 0
+
+def tablesChanged():
+    """
+    Records that the routing tables may have changed, so that the caches built on them, like DVR_paths.PathQuery, are dropped.
+    Called by updateNet, makeNodesReadNet and WebNode.setRoutingMap, and by the code updating the tables in other ways.
+    """
+    global tablesGeneration
+    tablesGeneration += 1
+
+def getTablesGeneration() -> int:
+    """
+    Returns the generation of the routing tables, increased by tablesChanged.
+
+    Returns:
+        int: The generation of the routing tables.
+    """
+    return tablesGeneration
+
+class LatencyHistogram:
+    """
+    Represents the distribution of the durations of an operation.
+    Durations are counted in buckets whose upper bounds are powers of two microseconds.
+
+    Attributes:
+        count (int): The number of durations observed.
+        total (float): The sum of the durations, in seconds.
+        max (float): The longest duration, in seconds.
+        buckets (dict[int, int]): The number of durations up to each bound, in microseconds.
+    """
+    def __init__(self):
+        """
+        Constructor to initialize an empty histogram.
+        """
+        self.count:int = 0
+        self.total:float = 0.0
+        self.max:float = 0.0
+        self.buckets:dict[int, int] = {}
+    
+    def observe(self, seconds: float):
+        """
+        Adds a duration to the histogram.
+
+        Args:
+            seconds (float): The duration, in seconds.
+        """
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        bound = 1 << int(seconds * 1e6).bit_length()
+        self.buckets[bound] = self.buckets.get(bound, 0) + 1
+    
+    def percentile(self, p: float) -> float:
+        """
+        Returns an upper bound of the given percentile of the durations.
+
+        Args:
+            p (float): The percentile, between 0 and 100.
+
+        Returns:
+            float: The bound of the bucket holding the percentile, in seconds.
+        """
+        seen = 0
+        for bound in sorted(self.buckets):
+            seen += self.buckets[bound]
+            if seen * 100 >= p * self.count:
+                return min(bound / 1e6, self.max)
+        return 0.0
+    
+    def toDict(self) -> dict:
+        """
+        Returns the histogram as a dictionary, suitable for JSON.
+
+        Returns:
+            dict: The count, mean, p50, p99 and max durations in seconds, and the buckets in microseconds.
+        """
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "buckets": {str(b): self.buckets[b] for b in sorted(self.buckets)},
+        }
+
+class ConvergenceMetrics:
+    """
+    Collects counters and latencies of the routing core, while metrics are enabled (see enableMetrics).
+    Every updateNet run is recorded with the topology operations that preceded it,
+    so that the events causing the most expensive convergences can be found.
+
+    Attributes:
+        updateRoutesCalls (dict[int, int]): The number of updateRoutes calls of each node.
+        routesChanged (dict[int, int]): The number of routes set or removed by each node in updateRoutes.
+        routesDeprecated (dict[int, int]): The number of routes each node found deprecated in updateRoutes.
+        routesRemoved (dict[int, int]): The number of deprecated routes each node removed, having no edge to replace them.
+        readRoutesCalls (dict[int, int]): The number of readRoutes calls of each node.
+        convergences (list[dict]): One record for every updateNet run: the operations before it,
+            its ConvergenceStats counters, the longest and mean queue length, and its duration.
+        latency (dict[str, LatencyHistogram]): The durations of each public operation.
+    """
+    def __init__(self):
+        """
+        Constructor to initialize empty metrics.
+        """
+        self.updateRoutesCalls:dict[int, int] = {}
+        self.routesChanged:dict[int, int] = {}
+        self.routesDeprecated:dict[int, int] = {}
+        self.routesRemoved:dict[int, int] = {}
+        self.readRoutesCalls:dict[int, int] = {}
+        self.convergences:list[dict] = []
+        self.latency:dict[str, LatencyHistogram] = {}
+        self.__operations:list[str] = []
+        self.__operationCount:int = 0
+        self.__queueMax:int = 0
+        self.__queueSum:int = 0
+        self.__queuePops:int = 0
+    
+    def recordUpdateRoutes(self, nodeId: int, changed: int, deprecated: int, removed: int):
+        """
+        Records the outcome of an updateRoutes call that got past the sender registration.
+        """
+        if changed:
+            self.routesChanged[nodeId] = self.routesChanged.get(nodeId, 0) + changed
+        if deprecated:
+            self.routesDeprecated[nodeId] = self.routesDeprecated.get(nodeId, 0) + deprecated
+        if removed:
+            self.routesRemoved[nodeId] = self.routesRemoved.get(nodeId, 0) + removed
+    
+    def recordCall(self, operation: str, seconds: float, nodeId: int = None):
+        """
+        Records the duration of a public operation, and counts the calls of the per-node ones.
+        """
+        histogram = self.latency.get(operation)
+        if histogram == None:
+            histogram = self.latency[operation] = LatencyHistogram()
+        histogram.observe(seconds)
+        if operation == "updateRoutes":
+            self.updateRoutesCalls[nodeId] = self.updateRoutesCalls.get(nodeId, 0) + 1
+        elif operation == "readRoutes":
+            self.readRoutesCalls[nodeId] = self.readRoutesCalls.get(nodeId, 0) + 1
+    
+    def recordOperation(self, operation: str, args: tuple):
+        """
+        Records a topology operation, attributed to the next updateNet run.
+        Only the first few operations of a batch are kept, together with their number.
+        """
+        self.__operationCount += 1
+        if len(self.__operations) < 5:
+            self.__operations.append(f"{operation}({', '.join(str(a) for a in args)})")
+    
+    def observeQueue(self, length: int):
+        """
+        Records the length of the updateNet worklist when a node is taken from it.
+        """
+        self.__queuePops += 1
+        self.__queueSum += length
+        if length > self.__queueMax:
+            self.__queueMax = length
+    
+    def recordConvergence(self, stats: ConvergenceStats, seconds: float):
+        """
+        Records an updateNet run, with the operations and the queue lengths observed since the previous one.
+        """
+        self.convergences.append({
+            "operations": self.__operations,
+            "operationCount": self.__operationCount,
+            **stats.counters(),
+            "maxQueue": self.__queueMax,
+            "meanQueue": self.__queueSum / self.__queuePops if self.__queuePops else 0.0,
+            "seconds": seconds,
+        })
+        self.__operations = []
+        self.__operationCount = self.__queueMax = self.__queueSum = self.__queuePops = 0
+    
+    def storms(self, count: int = 10) -> list[dict]:
+        """
+        Returns the most expensive updateNet runs, by number of updateRoutes calls.
+
+        Args:
+            count (int): The number of runs to return.
+
+        Returns:
+            list[dict]: The records of the runs, from the most expensive.
+        """
+        return sorted(self.convergences, key=lambda c: c["messages"], reverse=True)[:count]
+    
+    def toDict(self) -> dict:
+        """
+        Returns all the metrics as a dictionary, suitable for JSON.
+
+        Returns:
+            dict: The metrics, with the per-node counters indexed by node identifier.
+        """
+        return {
+            "updateRoutesCalls": self.updateRoutesCalls,
+            "routesChanged": self.routesChanged,
+            "routesDeprecated": self.routesDeprecated,
+            "routesRemoved": self.routesRemoved,
+            "readRoutesCalls": self.readRoutesCalls,
+            "convergences": self.convergences,
+            "latency": {k: h.toDict() for k, h in self.latency.items()},
+        }
+    
+    def dump(self, path: str):
+        """
+        Writes all the metrics to a JSON file.
+
+        Args:
+            path (str): The path of the file.
+        """
+        with open(path, 'w') as file:
+            json.dump(self.toDict(), file, indent=1)
+    
+    def __str__(self):
+        """
+        Converts the metrics to a summary: the totals, the latency of each operation and the worst convergences.
+
+        Returns:
+            str: A formatted string showing the metrics.
+        """
+        totals = [
+            ["updateRoutes calls", sum(self.updateRoutesCalls.values())],
+            ["routes changed", sum(self.routesChanged.values())],
+            ["routes deprecated", sum(self.routesDeprecated.values())],
+            ["routes removed", sum(self.routesRemoved.values())],
+            ["readRoutes calls", sum(self.readRoutesCalls.values())],
+            ["updateNet runs", len(self.convergences)],
+        ]
+        latency = [
+            [k, h.count, f"{h.total / h.count * 1e6:.1f}", f"{h.percentile(99) * 1e6:.0f}", f"{h.max * 1e6:.0f}"]
+            for k, h in sorted(self.latency.items())
+        ]
+        storms = [
+            [", ".join(c["operations"]) + (" ..." if c["operationCount"] > len(c["operations"]) else ""), c["rounds"], c["messages"], c["maxQueue"], f"{c['seconds']:.3f}"]
+            for c in self.storms(5)
+        ]
+        return (tabulate(totals, headers=["Counter", "Total"], tablefmt="simple") + "\n\n"
+                + tabulate(latency, headers=["Operation", "Calls", "Mean (us)", "p99 (us)", "Max (us)"], tablefmt="simple", disable_numparse=True) + "\n\n"
+                + tabulate(storms, headers=["Operations", "Rounds", "Messages", "Max queue", "Seconds"], tablefmt="simple") + "\n")
+
+#The metrics being collected, None while they are disabled
+metrics:ConvergenceMetrics = None
+
+#The operations timed while metrics are enabled: their class (None for module functions) and name
+TIMED_OPERATIONS = [
+    (WebNode, "updateRoutes"),
+    (WebNode, "readRoutes"),
+    (EdgesMap, "addEdge"),
+    (EdgesMap, "removeEdge"),
+    (EdgesMap, "addNode"),
+    (EdgesMap, "removeNode"),
+    (EdgesMap, "commit"),
+    (None, "updateNet"),
+]
+
+#The topology operations attributed to the following updateNet run
+TOPOLOGY_OPERATIONS = ("addEdge", "removeEdge", "addNode", "removeNode")
+
+def timedOperation(name: str, function):
+    """
+    Wraps an operation so that every call is recorded in the metrics.
+
+    Args:
+        name (str): The name of the operation.
+        function (Callable): The original operation.
+
+    Returns:
+        Callable: The wrapped operation.
+    """
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        if metrics == None:
+            return result
+        if name == "updateNet":
+            metrics.recordConvergence(result, seconds)
+        elif name in TOPOLOGY_OPERATIONS:
+            #Only the node identifiers, without the EdgesMap and the NodeList
+            metrics.recordOperation(name, tuple(a for a in args[1:] if isinstance(a, int)))
+        metrics.recordCall(name, seconds, args[0].getId() if isinstance(args[0], WebNode) else None)
+        return result
+    timed.original = function
+    timed.__name__ = function.__name__
+    timed.__doc__ = function.__doc__
+    return timed
+
+def enableMetrics() -> ConvergenceMetrics:
+    """
+    Starts collecting metrics, discarding the previous ones.
+    The public operations are replaced with timed wrappers only while metrics are enabled,
+    so that disabled metrics cost nothing but a few checks.
+
+    Returns:
+        ConvergenceMetrics: The metrics being collected.
+    """
+    global metrics
+    if metrics == None:
+        module = globals()
+        for cls, name in TIMED_OPERATIONS:
+            owner = cls.__dict__ if cls != None else module
+            wrapped = timedOperation(name, owner[name])
+            if cls != None:
+                setattr(cls, name, wrapped)
+            else:
+                module[name] = wrapped
+    metrics = ConvergenceMetrics()
+    return metrics
+
+def disableMetrics() -> ConvergenceMetrics:
+    """
+    Stops collecting metrics, restoring the original operations.
+
+    Returns:
+        ConvergenceMetrics: The metrics collected, or None if they were not enabled.
+    """
+    global metrics
+    collected = metrics
+    if metrics != None:
+        module = globals()
+        for cls, name in TIMED_OPERATIONS:
+            owner = cls.__dict__ if cls != None else module
+            original = owner[name].original
+            if cls != None:
+                setattr(cls, name, original)
+            else:
+                module[name] = original
+        metrics = None
+    return collected
+
+def getMetrics() -> ConvergenceMetrics:
+    """
+    Returns the metrics being collected.
+
+    Returns:
+        ConvergenceMetrics: The metrics, or None if they are disabled.
+    """
+    return metrics
+
+def actionLog(message: str, *args):
     """
     Logs an action to a log file, formatting the message with separators.
+    If args are given, the message is formatted printf-style with them, but only
+    if actions are logged, so that a disabled log costs no formatting.
     
     Args:
         message (str): The message to log.
+        *args: The values to format the message with.
     """
+    if DVR_log.sink.level < DVR_log.LOG_ACTIONS:
+        return
+    if args:
+        message = message % args
     maxLen = 60 - len(message)
     sep = "-" * (maxLen // 2)
-    with open('log.txt', 'a') as log:
-        log.write(f"\n{sep} {message} {sep}\n")
+    DVR_log.sink.write(f"\n{sep} {message} {sep}\n")
             
-def messageLog(message: str):
+def messageLog(message: str, *args):
     """
     Logs a message to a log file.
+    If args are given, the message is formatted printf-style with them, but only
+    if messages are logged, so that a disabled log costs no formatting.
     
     Args:
         message (str): The message to log.
+        *args: The values to format the message with.
     """
-    with open('log.txt', 'a') as log:
-        log.write(f"{message}\n")
-
-#Test code for the algorithm. Uncomment this and the code in printRoutingTables() to test the algorithm.
-
-# def dijkstra(graph: dict[int, list[EdgeMapEntry]], start: int) -> dict[int, int]:
-#     distances = {node: float('infinity') for node in graph}
-#     distances[start] = 0
-#     priority_queue = [(0, start)]
-    
-#     while priority_queue:
-#         current_distance, current_node = heapq.heappop(priority_queue)
-        
-#         if current_distance > distances[current_node]:
-#             continue
-        
-#         for edge in graph[current_node]:
-#             distance = current_distance + edge.w
-            
-#             if distance < distances[edge.dst]:
-#                 distances[edge.dst] = distance
-#                 heapq.heappush(priority_queue, (distance, edge.dst))
-    
-#     return distances
-
-# def is_minimum_distance(graph: dict[int, list[EdgeMapEntry]], node1: int, node2: int, distance: int) -> bool:
-#     distances = dijkstra(graph, node1)
-#     return distances[node2] == distance
\ No newline at end of file
+    if DVR_log.sink.level < DVR_log.LOG_MESSAGES:
+        return
+    if args:
+        message = message % args
+    DVR_log.sink.write(f"{message}\n")
@@ -0,0 +1,273 @@
+import numpy as np
+import DVR_logic
+
+NO_HOP = -1
+
+class MatrixNet:
+    """
+    Represents a whole network as arrays, for simulating large topologies.
+    The edges are stored as a CSR weight matrix, and the routing tables of all nodes as one
+    distance matrix and one next-hop matrix, where row i is the routing table of the i-th node.
+    Distance vectors are exchanged in synchronous rounds: in each round every node recomputes its
+    whole table from the tables its neighbors had at the end of the previous round (Bellman-Ford),
+    with vectorized min-plus relaxations instead of one updateRoutes call per neighbor.
+
+    Attributes:
+        ids (list[int]): The identifier of the node of each row.
+        index (dict[int, int]): The row of each node identifier.
+        indptr (np.ndarray): CSR row pointers: the edges of row i are in indptr[i]:indptr[i+1].
+        indices (np.ndarray): CSR column of each edge, that is the row of the node at the other end.
+        weights (np.ndarray): CSR weight of each edge.
+        dist (np.ndarray): The distance matrix, inf where a destination is unknown.
+        nextHop (np.ndarray): The next-hop matrix, holding rows (not identifiers), NO_HOP where a destination is unknown.
+            It is brought up to date by getNextHops.
+    """
+    def __init__(self, ids: list[int], edges: dict[int, list[DVR_logic.EdgeMapEntry]]):
+        """
+        Constructor to initialize the network, with empty routing tables.
+
+        Args:
+            ids (list[int]): The identifiers of the nodes.
+            edges (dict[int, list[EdgeMapEntry]]): The edges of each node.
+        """
+        self.ids: list[int] = list(ids)
+        self.index: dict[int, int] = {id: i for i, id in enumerate(self.ids)}
+
+        n = len(self.ids)
+        degrees = [len(edges.get(id, [])) for id in self.ids]
+        self.indptr: np.ndarray = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(degrees, out=self.indptr[1:])
+        self.indices: np.ndarray = np.empty(self.indptr[-1], dtype=np.int64)
+        self.weights: np.ndarray = np.empty(self.indptr[-1], dtype=np.float64)
+        for i, id in enumerate(self.ids):
+            start = self.indptr[i]
+            for j, e in enumerate(edges.get(id, [])):
+                self.indices[start + j] = self.index[e.dst]
+                self.weights[start + j] = e.w
+
+        self.dist: np.ndarray = None
+        self.nextHop: np.ndarray = None
+        self.__active: np.ndarray = None
+        self.__staleHops: bool = False
+        self.reset()
+
+    @classmethod
+    def fromEdgesMap(cls, NetManager: DVR_logic.EdgesMap) -> 'MatrixNet':
+        """
+        Builds the matrix representation of the network described by an EdgesMap.
+
+        Args:
+            NetManager (EdgesMap): The network's edge manager.
+
+        Returns:
+            MatrixNet: The network, with empty routing tables.
+        """
+        return cls(NetManager.getNodesId(), NetManager.getMap())
+
+    def size(self) -> int:
+        """
+        Returns the number of nodes in the network.
+
+        Returns:
+            int: The number of nodes.
+        """
+        return len(self.ids)
+
+    def weightMatrix(self) -> np.ndarray:
+        """
+        Returns the dense weight matrix of the network.
+
+        Returns:
+            np.ndarray: The n x n weight matrix, inf where there is no edge.
+        """
+        n = self.size()
+        w = np.full((n, n), np.inf)
+        rows = np.repeat(np.arange(n), np.diff(self.indptr))
+        w[rows, self.indices] = self.weights
+        return w
+
+    def reset(self):
+        """
+        Empties the routing tables: every node only knows itself, at distance 0.
+        """
+        n = self.size()
+        self.dist = np.full((n, n), np.inf)
+        np.fill_diagonal(self.dist, 0)
+        self.nextHop = np.full((n, n), NO_HOP, dtype=np.int64)
+        np.fill_diagonal(self.nextHop, np.arange(n))
+        self.__active = np.arange(n)
+        self.__staleHops = False
+
+    def step(self) -> bool:
+        """
+        Runs one synchronous round: every node rebuilds its distances from its neighbors' previous ones.
+        Neighbors are visited by rank (the r-th neighbor of every node at once), so each relaxation
+        is a single vectorized operation on all the rows. Only the rows with a neighbor that changed
+        in the previous round are recomputed, since the others would be rebuilt from the same distances.
+        Next hops do not affect distances, so they are derived from the distances only when read.
+
+        Returns:
+            bool: True if any routing table changed, False otherwise.
+        """
+        active = self.__active
+        if active.size == 0:
+            return False
+        degrees = np.diff(self.indptr)
+
+        dist = np.full((active.size, self.size()), np.inf)
+        dist[np.arange(active.size), active] = 0
+
+        for r in range(int(degrees[active].max())):
+            pos = np.flatnonzero(degrees[active] > r)
+            edge = self.indptr[active[pos]] + r
+
+            candidate = self.dist[self.indices[edge]]
+            candidate += self.weights[edge][:, None]
+            if pos.size == active.size:
+                np.minimum(dist, candidate, out=dist)
+            else:
+                dist[pos] = np.minimum(dist[pos], candidate, out=candidate)
+
+        changed = np.any(dist != self.dist[active], axis=1)
+        self.dist[active] = dist
+        self.__staleHops = True
+
+        changedRows = active[changed]
+        self.__active = self.__neighborsOf(changedRows)
+        return changedRows.size > 0
+
+    def getNextHops(self) -> np.ndarray:
+        """
+        Returns the next-hop matrix: for every row and destination, the first neighbor, in edge order,
+        through which the destination is at the distance in the distance matrix.
+
+        Returns:
+            np.ndarray: The next-hop matrix, holding rows (not identifiers), NO_HOP where a destination is unknown.
+        """
+        if not self.__staleHops:
+            return self.nextHop
+        n = self.size()
+        rows = np.arange(n)
+        degrees = np.diff(self.indptr)
+
+        nextHop = np.full((n, n), NO_HOP, dtype=np.int64)
+        nextHop[rows, rows] = rows
+        for r in range(int(degrees.max()) if n > 0 else 0):
+            src = rows[degrees > r]
+            edge = self.indptr[src] + r
+            nb = self.indices[edge]
+
+            candidate = self.dist[nb]
+            candidate += self.weights[edge][:, None]
+            hops = nextHop[src]
+            match = (hops == NO_HOP) & (candidate == self.dist[src]) & np.isfinite(candidate)
+            np.copyto(hops, np.broadcast_to(nb[:, None], hops.shape), where=match)
+            nextHop[src] = hops
+
+        self.nextHop = nextHop
+        self.__staleHops = False
+        return nextHop
+
+    def __neighborsOf(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Returns the rows adjacent to the given ones, that is the nodes that read their tables.
+
+        Args:
+            rows (np.ndarray): The rows.
+
+        Returns:
+            np.ndarray: The sorted rows of their neighbors.
+        """
+        if rows.size == 0:
+            return rows
+        starts = self.indptr[rows]
+        counts = self.indptr[rows + 1] - starts
+        edge = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return np.unique(self.indices[edge])
+
+    def converge(self, maxRounds: int = None) -> int:
+        """
+        Runs synchronous rounds until no routing table changes.
+
+        Args:
+            maxRounds (int, optional): The maximum number of rounds to run, by default one more than the number of nodes.
+
+        Returns:
+            int: The number of rounds run, including the last one, which changes nothing.
+        """
+        if maxRounds == None:
+            maxRounds = self.size() + 1
+        rounds = 0
+        while rounds < maxRounds:
+            rounds += 1
+            if not self.step():
+                break
+        return rounds
+
+    def getRoutingMap(self, nodeId: int) -> dict[int, DVR_logic.RoutingMapEntry]:
+        """
+        Returns the routing table of a node, in the format used by WebNode.
+
+        Args:
+            nodeId (int): The identifier of the node.
+
+        Returns:
+            dict[int, RoutingMapEntry]: The routing table of the node.
+        """
+        i = self.index[nodeId]
+        nextHop = self.getNextHops()
+        known = np.flatnonzero(np.isfinite(self.dist[i]))
+        return {
+            self.ids[j]: DVR_logic.RoutingMapEntry(int(self.dist[i, j]), self.ids[nextHop[i, j]])
+            for j in known if j != i
+        }
+
+    def readRoutingMaps(self, NodeList: list[DVR_logic.WebNode]):
+        """
+        Loads the routing tables of the given WebNodes into the matrices.
+
+        Args:
+            NodeList (list[WebNode]): The WebNodes whose tables are loaded.
+        """
+        self.reset()
+        for node in NodeList:
+            i = self.index[node.getId()]
+            for k, e in node.getRoutingMap().items():
+                self.dist[i, self.index[k]] = e.dist
+                self.nextHop[i, self.index[k]] = self.index[e.nextHop]
+
+    def writeRoutingMaps(self, NodeList: list[DVR_logic.WebNode]):
+        """
+        Replaces the routing tables of the given WebNodes with the ones in the matrices.
+
+        Args:
+            NodeList (list[WebNode]): The WebNodes whose tables are replaced.
+        """
+        for node in NodeList:
+            node.setRoutingMap(self.getRoutingMap(node.getId()))
+
+    def compare(self, NodeList: list[DVR_logic.WebNode], checkNextHop: bool = False) -> list[tuple[int, int, tuple[int, int], tuple[int, int]]]:
+        """
+        Compares the routing tables in the matrices with the ones of the given WebNodes, entry by entry.
+
+        Args:
+            NodeList (list[WebNode]): The WebNodes to compare.
+            checkNextHop (bool): Whether routes with the same distance but a different next hop are mismatches.
+                Equal-cost routes can legitimately differ in their next hop.
+
+        Returns:
+            list[tuple[int, int, tuple[int, int], tuple[int, int]]]: The mismatching entries, as
+            (nodeId, destinationId, (dist, nextHop) in the matrices, (dist, nextHop) in the WebNode),
+            where a missing route is None.
+        """
+        mismatches = []
+        for node in NodeList:
+            expected = self.getRoutingMap(node.getId())
+            actual = node.getRoutingMap()
+            for k in expected.keys() | actual.keys():
+                e, a = expected.get(k), actual.get(k)
+                e = (e.dist, e.nextHop) if e != None else None
+                a = (a.dist, a.nextHop) if a != None else None
+                if e == None or a == None or e[0] != a[0] or (checkNextHop and e[1] != a[1]):
+                    mismatches.append((node.getId(), k, e, a))
+        return mismatches
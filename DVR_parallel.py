@@ -0,0 +1,403 @@
+import argparse
+import multiprocessing
+import os
+import time
+from collections import deque
+import DVR_log
+import DVR_logic
+
+#Graphs with fewer nodes are converged sequentially, where the cost of the processes is not worth it
+MIN_PARALLEL_NODES = 20000
+
+def encodeRoutes(routingMap: dict[int, DVR_logic.RoutingMapEntry]) -> dict[int, tuple[int, int]]:
+    """
+    Converts a routing table to plain tuples, which are much cheaper to pickle.
+
+    Args:
+        routingMap (dict[int, RoutingMapEntry]): The routing table.
+
+    Returns:
+        dict[int, tuple[int, int]]: The (distance, next hop) of every destination.
+    """
+    return {k: (e.dist, e.nextHop) for k, e in routingMap.items()}
+
+def decodeRoutes(routes: dict[int, tuple[int, int]]) -> dict[int, DVR_logic.RoutingMapEntry]:
+    """
+    Converts a routing table encoded by encodeRoutes back to RoutingMapEntry objects.
+
+    Args:
+        routes (dict[int, tuple[int, int]]): The (distance, next hop) of every destination.
+
+    Returns:
+        dict[int, RoutingMapEntry]: The routing table.
+    """
+    return {k: DVR_logic.RoutingMapEntry(d, nh) for k, (d, nh) in routes.items()}
+
+class Partition:
+    """
+    Represents a subset of the nodes of the network, converged by a single process.
+    Routing tables are exchanged in synchronous rounds: in each round, every node reads the tables
+    that its neighbors had at the end of the previous round, if they changed in that round.
+    Tables of neighbors owned by other partitions are received from the coordinator.
+    Every node reads the part of a table the sender would advertise to it in the update mode,
+    and does not learn routes longer than the distance bound, as with the ConvergenceEngine.
+    A node that removed or lengthened a route reads again, in the next round, the tables of all its neighbors,
+    since one of them may still offer a valid route that it had already read.
+
+    Attributes:
+        nodes (dict[int, WebNode]): The nodes of the partition.
+        edges (dict[int, list[EdgeMapEntry]]): The edges of each node of the partition.
+        boundary (set[int]): The nodes of the partition with a neighbor in another partition.
+        mode (int): The update mode, UPDATE_FULL, UPDATE_SPLIT_HORIZON or UPDATE_POISON_REVERSE.
+        maxDist (int): The longest route that can be learned, see EdgesMap.getDistanceBound.
+        external (dict[int, dict[int, RoutingMapEntry]]): The last received table of each neighbor in another partition.
+        changed (list[int]): The nodes of the partition whose table changed in the last round.
+        worsened (list[int]): The nodes of the partition that removed or lengthened a route in the last round.
+    """
+    def __init__(self, nodes: list[DVR_logic.WebNode], edges: dict[int, list[DVR_logic.EdgeMapEntry]], boundary: set[int],
+                 mode: int = DVR_logic.UPDATE_FULL, maxDist: int = DVR_logic.INFINITY, external: dict[int, dict[int, tuple[int, int]]] = None):
+        """
+        Constructor to initialize a partition.
+
+        Args:
+            nodes (list[WebNode]): The nodes of the partition.
+            edges (dict[int, list[EdgeMapEntry]]): The edges of each node of the partition.
+            boundary (set[int]): The nodes of the partition with a neighbor in another partition.
+            mode (int): The update mode.
+            maxDist (int): The longest route that can be learned.
+            external (dict[int, dict[int, tuple[int, int]]], optional): The encoded tables of the neighbors
+                in other partitions, read again by the nodes that worsened.
+        """
+        self.nodes: dict[int, DVR_logic.WebNode] = {n.getId(): n for n in nodes}
+        self.edges: dict[int, list[DVR_logic.EdgeMapEntry]] = edges
+        self.boundary: set[int] = boundary
+        self.mode: int = mode
+        self.maxDist: int = maxDist
+        self.external: dict[int, dict[int, DVR_logic.RoutingMapEntry]] = {id: decodeRoutes(routes) for id, routes in (external or {}).items()}
+        self.changed: list[int] = []
+        self.worsened: list[int] = []
+        self.__readers: dict[int, list[int]] = {}
+        for id, edgeList in edges.items():
+            for e in edgeList:
+                self.__readers.setdefault(e.dst, []).append(id)
+
+    def seed(self, nodesId: list[int]):
+        """
+        Marks nodes of the partition as changed, so that they send their tables in the next round,
+        and as worsened, since they may have removed routes while reading the network.
+
+        Args:
+            nodesId (list[int]): The identifiers of the nodes.
+        """
+        self.changed.extend(id for id in nodesId if id in self.nodes)
+        self.worsened.extend(id for id in nodesId if id in self.nodes)
+
+    def runRound(self, received: dict[int, dict[int, tuple[int, int]]]) -> tuple[dict[int, dict[int, tuple[int, int]]], list[int], int, int]:
+        """
+        Runs one synchronous round.
+
+        Args:
+            received (dict[int, dict[int, tuple[int, int]]]): The encoded tables of the neighbors in other
+            partitions that changed in the previous round.
+
+        Returns:
+            tuple: The encoded tables of the boundary nodes that changed in this round, the nodes that changed,
+            the number of updateRoutes calls and the number of them that changed a table.
+        """
+        senders: dict[int, dict[int, DVR_logic.RoutingMapEntry]] = {}
+        for id in self.changed:
+            #Entries are updated in place, so the table is copied before the receivers change theirs
+            senders[id] = self.nodes[id].copyRoutingMap()
+        for id, routes in received.items():
+            self.external[id] = decodeRoutes(routes)
+            senders[id] = self.external[id]
+
+        pending: dict[int, list[int]] = {}
+        for s in senders:
+            for r in self.__readers.get(s, []):
+                pending.setdefault(r, []).append(s)
+        for r in self.worsened:
+            rSenders = pending.setdefault(r, [])
+            for e in self.edges[r]:
+                if e.dst in senders:
+                    if e.dst not in rSenders:
+                        rSenders.append(e.dst)
+                elif e.dst in self.nodes:
+                    senders[e.dst] = self.nodes[e.dst].copyRoutingMap()
+                    rSenders.append(e.dst)
+                elif e.dst in self.external:
+                    senders[e.dst] = self.external[e.dst]
+                    rSenders.append(e.dst)
+
+        advertiseRoutes = DVR_logic.advertiseRoutes
+        mode, maxDist = self.mode, self.maxDist
+        messages = updates = 0
+        changed = []
+        worsened = []
+        for r, rSenders in pending.items():
+            node = self.nodes[r]
+            nodeChanged = False
+            worsenedVersion = node.getWorsenedVersion()
+            for s in rSenders:
+                messages += 1
+                if node.updateRoutes(s, advertiseRoutes(senders[s], r, mode), self.edges[r], maxDist):
+                    updates += 1
+                    nodeChanged = True
+            if nodeChanged:
+                changed.append(r)
+                if node.getWorsenedVersion() != worsenedVersion:
+                    worsened.append(r)
+
+        self.changed = changed
+        self.worsened = worsened
+        out = {id: encodeRoutes(self.nodes[id].getRoutingMap()) for id in changed if id in self.boundary}
+        return out, changed, messages, updates
+
+    def collect(self) -> dict[int, dict[int, tuple[int, int]]]:
+        """
+        Returns the encoded tables of all the nodes of the partition.
+
+        Returns:
+            dict[int, dict[int, tuple[int, int]]]: The encoded table of every node.
+        """
+        return {id: encodeRoutes(n.getRoutingMap()) for id, n in self.nodes.items()}
+
+def partitionWorker(conn, partition: Partition):
+    """
+    Body of a worker process: runs the rounds of a partition as requested by the coordinator.
+    Every reply is an (error, result) pair: if a command raises, the exception is sent instead of
+    the result, to be raised again by the coordinator, and the worker exits.
+    Logging is disabled, since several processes cannot share the log file.
+
+    Args:
+        conn (Connection): The pipe to the coordinator.
+        partition (Partition): The partition owned by the worker.
+    """
+    DVR_log.setLogLevel(DVR_log.LOG_OFF)
+    while True:
+        command, arg = conn.recv()
+        try:
+            if command == "round":
+                reply = partition.runRound(arg)
+            elif command == "seed":
+                partition.seed(arg)
+                continue
+            elif command == "collect":
+                reply = partition.collect()
+            else:
+                conn.close()
+                return
+        except Exception as e:
+            try:
+                conn.send((e, None))
+            except Exception:
+                #The exception cannot be pickled
+                conn.send((RuntimeError(repr(e)), None))
+            conn.close()
+            return
+        conn.send((None, reply))
+
+def receive(conn):
+    """
+    Receives the reply of a worker, raising again the exception the worker raised, if any.
+
+    Args:
+        conn (Connection): The pipe to the worker.
+
+    Returns:
+        The result of the command.
+    """
+    error, reply = conn.recv()
+    if error != None:
+        raise error
+    return reply
+
+def splitNodes(NetManager: DVR_logic.EdgesMap, parts: int) -> list[list[int]]:
+    """
+    Splits the nodes of the network into partitions of similar size.
+    Nodes are taken in breadth-first order, so that neighbors tend to fall in the same
+    partition and few routing tables have to be exchanged between processes.
+
+    Args:
+        NetManager (EdgesMap): The network's edge manager.
+        parts (int): The number of partitions.
+
+    Returns:
+        list[list[int]]: The identifiers of the nodes of each partition.
+    """
+    order = []
+    visited = set()
+    for start in NetManager.getNodesId():
+        if start in visited:
+            continue
+        visited.add(start)
+        queue = deque([start])
+        while queue:
+            id = queue.popleft()
+            order.append(id)
+            for nb in NetManager.getNeighborsId(id):
+                if nb not in visited:
+                    visited.add(nb)
+                    queue.append(nb)
+
+    size = -(-len(order) // parts)
+    return [order[i:i + size] for i in range(0, len(order), size)]
+
+def updateNetParallel(NodeList: list[DVR_logic.WebNode], NetManager: DVR_logic.EdgesMap, priorityNodesId: list[int], workers: int = None,
+                      minNodes: int = MIN_PARALLEL_NODES, mode: int = None, progress=None) -> DVR_logic.ConvergenceStats:
+    """
+    Updates the network's routing tables like updateNet, splitting the nodes among worker processes.
+    The routing tables are exchanged in synchronous rounds, and only the tables of the boundary nodes
+    that changed are sent between processes. Graphs smaller than minNodes, or a single worker,
+    fall back to the sequential updateNet. The update mode and the distance bound are the ones of updateNet.
+
+    Args:
+        NodeList (list[WebNode]): The list of WebNodes in the network.
+        NetManager (EdgesMap): The network's edge manager.
+        priorityNodesId (list[int]): The list of node identifiers whose tables changed.
+        workers (int, optional): The number of worker processes, by default the number of CPUs.
+        minNodes (int): The minimum number of nodes to converge in parallel.
+        mode (int): The update mode, by default the one set with DVR_logic.setUpdateMode.
+        progress (Callable[[ConvergenceStats], bool], optional): Called after every round, with the statistics so far;
+            returning False stops the convergence, leaving the nodes that changed in the last round
+            in the pending list of the statistics, as with updateNet.
+
+    Returns:
+        ConvergenceStats: The number of rounds and messages needed to converge.
+
+    Raises:
+        Exception: The exception raised in a worker process, raised again.
+    """
+    nodes = DVR_logic.asRegistry(NodeList)
+    if workers == None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(nodes) < max(minNodes, 2):
+        return DVR_logic.updateNet(NodeList, NetManager, priorityNodesId, mode, progress)
+    if mode == None:
+        mode = DVR_logic.updateMode
+    maxDist = NetManager.getDistanceBound()
+
+    parts = splitNodes(NetManager, workers)
+    owner = {id: p for p, ids in enumerate(parts) for id in ids}
+    #The partitions that must receive each boundary node's table
+    targets: dict[int, set[int]] = {}
+    for id, p in owner.items():
+        for nb in NetManager.getNeighborsId(id):
+            if owner[nb] != p:
+                targets.setdefault(id, set()).add(owner[nb])
+
+    ctx = multiprocessing.get_context()
+    conns = []
+    procs = []
+    for p, ids in enumerate(parts):
+        external = {nb: encodeRoutes(nodes[nb].getRoutingMap()) for id in ids for nb in NetManager.getNeighborsId(id) if owner[nb] != p}
+        partition = Partition([nodes[id] for id in ids], {id: NetManager.getEdges(id) for id in ids}, {id for id in ids if id in targets}, mode, maxDist, external)
+        parent, child = ctx.Pipe()
+        proc = ctx.Process(target=partitionWorker, args=(child, partition), daemon=True)
+        proc.start()
+        child.close()
+        conns.append(parent)
+        procs.append(proc)
+
+    stats = DVR_logic.ConvergenceStats()
+    try:
+        priority = [id for id in priorityNodesId if id in owner]
+        inbox: list[dict[int, dict[int, tuple[int, int]]]] = [{} for _ in parts]
+        for id in priority:
+            for q in targets.get(id, ()):
+                inbox[q][id] = encodeRoutes(nodes[id].getRoutingMap())
+        for conn in conns:
+            conn.send(("seed", priority))
+
+        changed = priority
+        while changed:
+            stats.rounds += 1
+            for p, conn in enumerate(conns):
+                conn.send(("round", inbox[p]))
+            inbox = [{} for _ in parts]
+
+            changed = []
+            for conn in conns:
+                out, partChanged, messages, updates = receive(conn)
+                stats.messages += messages
+                stats.updates += updates
+                changed += partChanged
+                for id, routes in out.items():
+                    for q in targets[id]:
+                        inbox[q][id] = routes
+            if changed and progress != None and not progress(stats):
+                stats.pending = changed
+                break
+
+        for conn in conns:
+            conn.send(("collect", None))
+        for conn in conns:
+            for id, routes in receive(conn).items():
+                nodes[id].setRoutingMap(decodeRoutes(routes))
+    finally:
+        for conn in conns:
+            try:
+                conn.send(("stop", None))
+            except OSError:
+                #The worker already exited, after an error
+                pass
+            conn.close()
+        for proc in procs:
+            proc.join()
+
+    return stats
+
+def buildGrid(side: int) -> tuple[DVR_logic.NodeRegistry, DVR_logic.EdgesMap]:
+    """
+    Builds a side x side grid network with deterministic weights, without converging it.
+
+    Args:
+        side (int): The number of nodes on each side of the grid.
+
+    Returns:
+        tuple[NodeRegistry, EdgesMap]: The nodes and the edges of the grid.
+    """
+    NodeList = DVR_logic.NodeRegistry()
+    NetManager = DVR_logic.EdgesMap()
+    for id in range(side * side):
+        NodeList.append(NetManager.addNode(id))
+    for r in range(side):
+        for c in range(side):
+            id = r * side + c
+            if c + 1 < side:
+                NetManager.addEdge(id, id + 1, 1 + (id * 7) % 5, NodeList)
+            if r + 1 < side:
+                NetManager.addEdge(id, id + side, 1 + (id * 3) % 5, NodeList)
+    return NodeList, NetManager
+
+def main():
+    """
+    Benchmarks updateNetParallel against updateNet on a grid, starting from the tables
+    the nodes get by reading their own edges, and checks that the distances are the same.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark of the parallel convergence against updateNet")
+    parser.add_argument("--side", type=int, default=30, help="side of the grid (default: 30, that is 900 nodes)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--update-mode", choices=DVR_logic.UPDATE_MODES, default="full", help="routing tables sent to the neighbors (default: full)")
+    args = parser.parse_args()
+
+    DVR_log.setLogLevel(DVR_log.LOG_OFF)
+    DVR_logic.setUpdateMode(DVR_logic.UPDATE_MODES[args.update_mode])
+    results = {}
+    for name in ("updateNet", "parallel"):
+        NodeList, NetManager = buildGrid(args.side)
+        ids = NetManager.getNodesId()
+        start = time.perf_counter()
+        if name == "updateNet":
+            stats = DVR_logic.updateNet(NodeList, NetManager, ids)
+        else:
+            stats = updateNetParallel(NodeList, NetManager, ids, workers=args.workers, minNodes=0)
+        elapsed = time.perf_counter() - start
+        results[name] = (elapsed, {n.getId(): {k: e.dist for k, e in n.getRoutingMap().items()} for n in NodeList})
+        print(f"{name:>10}: {elapsed:8.2f}s  {stats}")
+
+    print(f"   speedup: {results['updateNet'][0] / results['parallel'][0]:.2f}x with {args.workers} workers")
+    print(f"same distances: {results['updateNet'][1] == results['parallel'][1]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import DVR_logic
+
+#Outcomes of a path query
+#Ok: the next hops reach the destination. No route: the source has no route to the destination.
+#Black hole: a node along the path has no route to the destination. Loop: the next hops go around a loop.
+#Broken: a next hop is not a neighbor of its node, as in a table that missed a topology change.
+PATH_OK = "ok"
+PATH_NO_ROUTE = "no route"
+PATH_BLACK_HOLE = "black hole"
+PATH_LOOP = "loop"
+PATH_BROKEN = "broken"
+
+#The outcomes reported by PathQuery.failures
+FAILURES = (PATH_BLACK_HOLE, PATH_LOOP, PATH_BROKEN)
+
+class Path:
+    """
+    Represents the path followed by a packet from a node to a destination, hop by hop through the routing tables.
+
+    Attributes:
+        srcId (int): The identifier of the source.
+        dstId (int): The identifier of the destination.
+        status (str): The outcome of the path, one of the PATH_ constants.
+        nodes (list[int]): The nodes visited, from the source to the destination, or to the node where the path fails.
+            A loop ends with the first node visited twice.
+        cost (int): The sum of the weights of the edges followed, None if the destination is not reached.
+        dist (int): The distance to the destination in the source's routing table, None if it has no route.
+    """
+    def __init__(self, srcId: int, dstId: int, status: str, nodes: list[int], cost: int, dist: int):
+        """
+        Constructor to initialize a path.
+
+        Args:
+            srcId (int): The identifier of the source.
+            dstId (int): The identifier of the destination.
+            status (str): The outcome of the path.
+            nodes (list[int]): The nodes visited.
+            cost (int): The sum of the weights of the edges followed, None if the destination is not reached.
+            dist (int): The distance in the source's routing table, None if it has no route.
+        """
+        self.srcId: int = srcId
+        self.dstId: int = dstId
+        self.status: str = status
+        self.nodes: list[int] = nodes
+        self.cost: int = cost
+        self.dist: int = dist
+
+    def __str__(self):
+        hops = " -> ".join(str(n) for n in self.nodes)
+        return f"{hops} (cost {self.cost})" if self.status == PATH_OK else f"{hops} ({self.status})"
+
+class PathQuery:
+    """
+    Answers queries on the full paths of the network, following the next hops of the routing tables.
+    The outcome and cost of the path from every node to a destination are memoized: a path ends in the path
+    of its second node, so the suffixes shared by many paths are followed once, and all the paths to a
+    destination are resolved in O(nodes) instead of O(nodes * hops).
+    The cache is dropped when the routing tables change, which updateNet, makeNodesReadNet and
+    WebNode.setRoutingMap record with DVR_logic.tablesChanged, and when the edges change, as recorded by
+    EdgesMap.getGeneration, since a next hop can stop being a neighbor before the tables are updated,
+    for example inside a transaction. Tables changed in other ways require invalidate.
+
+    Attributes:
+        NodeList (NodeRegistry): The nodes of the network.
+        NetManager (EdgesMap): The network's edge manager.
+        resolved (int): The number of (node, destination) outcomes computed so far.
+        invalidated (int): The number of times the cache was dropped.
+    """
+    def __init__(self, NodeList: list[DVR_logic.WebNode], NetManager: DVR_logic.EdgesMap):
+        """
+        Constructor to initialize a query layer with an empty cache.
+
+        Args:
+            NodeList (list[WebNode]): The nodes of the network. A NodeRegistry is used as is,
+                so that the nodes added or removed later are seen; a list is indexed once.
+            NetManager (EdgesMap): The network's edge manager.
+        """
+        self.NodeList: DVR_logic.NodeRegistry = DVR_logic.asRegistry(NodeList)
+        self.NetManager: DVR_logic.EdgesMap = NetManager
+        self.resolved: int = 0
+        self.invalidated: int = 0
+        #The outcome and cost of the path from every node, by destination
+        self.__cache: dict[int, dict[int, tuple[str, int]]] = {}
+        self.__generation: tuple[int, int] = (DVR_logic.getTablesGeneration(), NetManager.getGeneration())
+
+    def invalidate(self):
+        """
+        Drops the cache, for routing tables changed without DVR_logic.tablesChanged.
+        """
+        self.__cache = {}
+        self.invalidated += 1
+
+    def __check(self, *nodesId: int):
+        """
+        Drops the cache if the routing tables or the edges changed since it was built, and checks that the nodes exist.
+
+        Raises:
+            ValueError: If a node is not in the network.
+        """
+        generation = (DVR_logic.getTablesGeneration(), self.NetManager.getGeneration())
+        if generation != self.__generation:
+            self.__generation = generation
+            self.invalidate()
+        for id in nodesId:
+            if id not in self.NodeList:
+                raise ValueError(f"Node {id} is not in the network")
+
+    def __resolve(self, srcId: int, dstId: int) -> tuple[str, int]:
+        """
+        Returns the outcome and cost of the path from a node to a destination, following the next hops
+        until a node whose outcome is known, and recording the outcome of every node followed.
+        """
+        known = self.__cache.get(dstId)
+        if known == None:
+            known = self.__cache[dstId] = {dstId: (PATH_OK, 0)}
+        result = known.get(srcId)
+        if result != None:
+            return result
+
+        nodes = self.NodeList
+        getEdge = self.NetManager.getEdge
+        #The nodes followed, with the weight of the edge to their next hop
+        followed: list[tuple[int, int]] = []
+        onPath: set[int] = set()
+        node = srcId
+        while True:
+            result = known.get(node)
+            if result != None:
+                break
+            if node in onPath:
+                #Every node followed is on the loop or leads to it
+                result = (PATH_LOOP, None)
+                break
+            route = nodes[node].getRoutingMap().get(dstId)
+            if route == None:
+                result = (PATH_NO_ROUTE, None)
+                known[node] = result
+                self.resolved += 1
+                break
+            edge = getEdge(node, route.nextHop) if route.nextHop in nodes else None
+            if edge == None:
+                result = (PATH_BROKEN, None)
+                known[node] = result
+                self.resolved += 1
+                break
+            onPath.add(node)
+            followed.append((node, edge.w))
+            node = route.nextHop
+
+        status, cost = result
+        if status == PATH_NO_ROUTE:
+            status = PATH_BLACK_HOLE
+        for node, w in reversed(followed):
+            if status == PATH_OK:
+                cost += w
+            result = (status, cost)
+            known[node] = result
+        self.resolved += len(followed)
+        return result
+
+    def status(self, srcId: int, dstId: int) -> str:
+        """
+        Returns the outcome of the path from a node to a destination.
+
+        Args:
+            srcId (int): The identifier of the source.
+            dstId (int): The identifier of the destination.
+
+        Returns:
+            str: One of the PATH_ constants.
+
+        Raises:
+            ValueError: If a node is not in the network.
+        """
+        self.__check(srcId, dstId)
+        return self.__resolve(srcId, dstId)[0]
+
+    def cost(self, srcId: int, dstId: int) -> int:
+        """
+        Returns the sum of the weights of the edges followed from a node to a destination.
+
+        Args:
+            srcId (int): The identifier of the source.
+            dstId (int): The identifier of the destination.
+
+        Returns:
+            int: The cost of the path, None if the destination is not reached.
+
+        Raises:
+            ValueError: If a node is not in the network.
+        """
+        self.__check(srcId, dstId)
+        return self.__resolve(srcId, dstId)[1]
+
+    def path(self, srcId: int, dstId: int) -> Path:
+        """
+        Returns the full path from a node to a destination. The outcome and cost come from the cache,
+        and the nodes are listed following the next hops, in O(hops).
+
+        Args:
+            srcId (int): The identifier of the source.
+            dstId (int): The identifier of the destination.
+
+        Returns:
+            Path: The path.
+
+        Raises:
+            ValueError: If a node is not in the network.
+        """
+        self.__check(srcId, dstId)
+        status, cost = self.__resolve(srcId, dstId)
+        nodes = self.NodeList
+        route = nodes[srcId].getRoutingMap().get(dstId)
+        dist = 0 if srcId == dstId else (route.dist if route != None else None)
+
+        visited = [srcId]
+        seen = {srcId}
+        node = srcId
+        while node != dstId:
+            route = nodes[node].getRoutingMap().get(dstId)
+            if route == None or route.nextHop not in nodes or self.NetManager.getEdge(node, route.nextHop) == None:
+                break
+            node = route.nextHop
+            visited.append(node)
+            if node in seen:
+                break
+            seen.add(node)
+        return Path(srcId, dstId, status, visited, cost, dist)
+
+    def pathsTo(self, dstId: int) -> dict[int, tuple[str, int]]:
+        """
+        Returns the outcome and cost of the paths from every node to a destination, resolving each suffix once.
+
+        Args:
+            dstId (int): The identifier of the destination.
+
+        Returns:
+            dict[int, tuple[str, int]]: The outcome and cost of the path from every node, including the destination itself.
+
+        Raises:
+            ValueError: If the destination is not in the network.
+        """
+        self.__check(dstId)
+        return {id: self.__resolve(id, dstId) for id in self.NodeList.ids()}
+
+    def reachability(self) -> dict[int, set[int]]:
+        """
+        Returns, for every node, the destinations its packets reach by following the next hops.
+
+        Returns:
+            dict[int, set[int]]: The destinations reached from every node, itself included.
+        """
+        self.__check()
+        reached = {id: set() for id in self.NodeList.ids()}
+        for dstId in reached:
+            for id, (status, _) in self.pathsTo(dstId).items():
+                if status == PATH_OK:
+                    reached[id].add(dstId)
+        return reached
+
+    def failures(self) -> list[Path]:
+        """
+        Returns the paths of all pairs of nodes that end in a black hole, a loop or a broken next hop.
+        A source without a route is not a failure, since the destination may be unreachable.
+
+        Returns:
+            list[Path]: The failed paths, by destination.
+        """
+        self.__check()
+        failed = []
+        for dstId in self.NodeList.ids():
+            for id, (status, _) in self.pathsTo(dstId).items():
+                if status in FAILURES:
+                    failed.append(self.path(id, dstId))
+        return failed
@@ -0,0 +1,299 @@
+import argparse
+import json
+import sys
+import time
+import DVR_export
+import DVR_log
+import DVR_logic
+import DVR_snapshot
+
+#Number of arguments of each scenario command
+COMMANDS = {"node": 1, "edge": 3, "remove-node": 1, "remove-edge": 2}
+
+LOG_LEVELS = {"off": DVR_log.LOG_OFF, "actions": DVR_log.LOG_ACTIONS, "messages": DVR_log.LOG_MESSAGES}
+
+class BatchStats:
+    """
+    Represents the outcome of a batch of events, that is all the events with the same time.
+
+    Attributes:
+        time (float): The time of the events.
+        events (int): The number of events in the batch.
+        nodes (int): The number of nodes in the network after the batch.
+        seconds (float): The real time spent applying the events and converging, in seconds.
+        convergence (ConvergenceStats): The cost of the convergence.
+    """
+    def __init__(self, time: float):
+        """
+        Constructor to initialize an empty batch.
+
+        Args:
+            time (float): The time of the events.
+        """
+        self.time: float = time
+        self.events: int = 0
+        self.nodes: int = 0
+        self.seconds: float = 0.0
+        self.convergence: DVR_logic.ConvergenceStats = None
+
+    def toDict(self) -> dict:
+        """
+        Returns the statistics as a dictionary, suitable for JSON.
+
+        Returns:
+            dict: The statistics of the batch.
+        """
+        return {"time": self.time, "events": self.events, "nodes": self.nodes, "seconds": round(self.seconds, 6),
+                **self.convergence.counters()}
+
+    def __str__(self):
+        return f"t={self.time:g}: {self.events} events, {self.nodes} nodes, {self.seconds:.3f}s, {self.convergence}"
+
+def readScenario(lines, name: str = "<scenario>", start: float = 0.0):
+    """
+    Parses scenario lines one at a time, so that files of any size can be streamed.
+    Every line holds one command, optionally preceded by its time:
+
+        [time] node <id>
+        [time] edge <src> <dst> <weight>
+        [time] remove-node <id>
+        [time] remove-edge <src> <dst>
+
+    A line without a time happens at the time of the previous line. Times cannot decrease.
+    Empty lines and text after '#' are ignored.
+
+    Args:
+        lines (Iterable[str]): The lines of the scenario.
+        name (str): The name of the scenario, used in error messages.
+        start (float): The time of the lines before the first timed one.
+
+    Yields:
+        tuple[float, str, list[int]]: The time, the command and the arguments of every line.
+
+    Raises:
+        ValueError: If a line is not valid.
+    """
+    now = start
+    for lineNo, line in enumerate(lines, 1):
+        tokens = line.split("#", 1)[0].split()
+        if not tokens:
+            continue
+
+        at = now
+        if tokens[0] not in COMMANDS:
+            try:
+                at = float(tokens[0])
+            except ValueError:
+                raise ValueError(f"{name}:{lineNo}: unknown command '{tokens[0]}'")
+            tokens = tokens[1:]
+            if at < now:
+                raise ValueError(f"{name}:{lineNo}: time {at:g} is before {now:g}")
+
+        if not tokens or tokens[0] not in COMMANDS:
+            raise ValueError(f"{name}:{lineNo}: expected one of {', '.join(COMMANDS)}")
+        command = tokens[0]
+        if len(tokens) - 1 != COMMANDS[command]:
+            raise ValueError(f"{name}:{lineNo}: '{command}' takes {COMMANDS[command]} arguments")
+        if not all(t.isdigit() for t in tokens[1:]):
+            raise ValueError(f"{name}:{lineNo}: identifiers and weights must be integers")
+        args = [int(t) for t in tokens[1:]]
+        if command in ("edge", "remove-edge") and args[0] == args[1]:
+            raise ValueError(f"{name}:{lineNo}: invalid nodes")
+        if command == "edge" and args[2] <= 0:
+            raise ValueError(f"{name}:{lineNo}: invalid weight")
+
+        now = at
+        yield at, command, args
+
+def readScenarioFiles(paths: list[str]):
+    """
+    Streams the commands of several scenario files, one after the other, as if they were a single file.
+    The path '-' reads the standard input.
+
+    Args:
+        paths (list[str]): The paths of the files.
+
+    Yields:
+        tuple[float, str, list[int]]: The time, the command and the arguments of every line.
+    """
+    now = 0.0
+    for path in paths:
+        file = sys.stdin if path == "-" else open(path)
+        try:
+            for at, command, args in readScenario(file, path, now):
+                now = at
+                yield at, command, args
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+def readTopology(path: str) -> dict[int, list[DVR_logic.EdgeMapEntry]]:
+    """
+    Reads a topology from a scenario file: its node and edge commands, ignoring the times, as an edge map
+    for EdgesMap.loadMap. As with EdgesMap.addEdge, a repeated edge keeps its first weight.
+
+    Args:
+        path (str): The path of the file, '-' for the standard input.
+
+    Returns:
+        dict[int, list[EdgeMapEntry]]: The edges of every node, in the order the nodes first appear.
+
+    Raises:
+        ValueError: If a line is not valid, or removes a node or an edge.
+    """
+    edgeMap: dict[int, dict[int, DVR_logic.EdgeMapEntry]] = {}
+    for _, command, args in readScenarioFiles([path]):
+        if command != "node" and command != "edge":
+            raise ValueError(f"{path}: '{command}' is not allowed in a topology")
+        for id in args[:1] if command == "node" else args[:2]:
+            if id not in edgeMap:
+                edgeMap[id] = {}
+        if command == "edge" and args[1] not in edgeMap[args[0]]:
+            edgeMap[args[0]][args[1]] = DVR_logic.EdgeMapEntry(args[1], args[2])
+            edgeMap[args[1]][args[0]] = DVR_logic.EdgeMapEntry(args[0], args[2])
+    return {id: list(edges.values()) for id, edges in edgeMap.items()}
+
+def applyEvent(command: str, args: list[int], NodeList: DVR_logic.NodeRegistry, NetManager: DVR_logic.EdgesMap):
+    """
+    Applies a scenario command to the network. The nodes of a new edge are added if they do not exist.
+
+    Args:
+        command (str): The command, one of COMMANDS.
+        args (list[int]): The arguments of the command.
+        NodeList (NodeRegistry): The nodes of the network.
+        NetManager (EdgesMap): The network's edge manager.
+    """
+    if command == "node" or command == "edge":
+        for id in args[:1] if command == "node" else args[:2]:
+            node = NetManager.addNode(id)
+            if node != None:
+                NodeList.append(node)
+        if command == "edge":
+            NetManager.addEdge(args[0], args[1], args[2], NodeList)
+    elif command == "remove-node":
+        NetManager.removeNode(args[0], NodeList)
+    else:
+        NetManager.removeEdge(args[0], args[1], NodeList)
+
+def runScenario(events, NodeList: DVR_logic.NodeRegistry, NetManager: DVR_logic.EdgesMap):
+    """
+    Applies a stream of events to the network. The events with the same time are applied
+    in a single EdgesMap transaction, so the network converges once per time.
+
+    Args:
+        events (Iterable[tuple[float, str, list[int]]]): The events, as yielded by readScenario.
+        NodeList (NodeRegistry): The nodes of the network.
+        NetManager (EdgesMap): The network's edge manager.
+
+    Yields:
+        BatchStats: The statistics of every batch, once it has converged.
+    """
+    batch = None
+    start = 0.0
+    for at, command, args in events:
+        if batch != None and at != batch.time:
+            batch.convergence = NetManager.commit()
+            batch.seconds = time.perf_counter() - start
+            batch.nodes = len(NodeList)
+            yield batch
+            batch = None
+        if batch == None:
+            batch = BatchStats(at)
+            start = time.perf_counter()
+            NetManager.transaction(NodeList)
+        applyEvent(command, args, NodeList, NetManager)
+        batch.events += 1
+
+    if batch != None:
+        batch.convergence = NetManager.commit()
+        batch.seconds = time.perf_counter() - start
+        batch.nodes = len(NodeList)
+        yield batch
+
+def writeRoutingTables(path: str, NodeList: DVR_logic.NodeRegistry, format: str = "text"):
+    """
+    Writes the routing tables of all nodes to a file, one node at a time, with DVR_export.
+    The text format is the one of the GUI.
+
+    Args:
+        path (str): The path of the file, '-' for the standard output.
+        NodeList (NodeRegistry): The nodes of the network.
+        format (str): One of DVR_export.FORMATS.
+    """
+    DVR_export.exportNetwork(path, NodeList, format=format)
+
+def main():
+    """
+    Runs scenario files without the GUI: applies their events to an empty network, or to one loaded
+    from a snapshot, then writes the routing tables, the statistics of every batch and, if requested, the metrics.
+    """
+    parser = argparse.ArgumentParser(description="Headless runner of distance vector routing scenarios")
+    parser.add_argument("scenario", nargs="*", help="scenario files, read in order ('-' for the standard input)")
+    parser.add_argument("--load", default="", help="snapshot of the network to start from, instead of an empty one")
+    parser.add_argument("--save", default="", help="file for a snapshot of the final network")
+    parser.add_argument("--tables", default="RoutingTables.txt", help="file for the final routing tables ('-' for the standard output, '' to skip)")
+    parser.add_argument("--edges", default="", help="file for the edges of the final network ('-' for the standard output)")
+    parser.add_argument("--format", choices=DVR_export.FORMATS, default="text", help="format of --tables and --edges: text, csv or JSON lines (default: text)")
+    parser.add_argument("--stats", default="", help="file for the statistics of every batch, as JSON lines ('-' for the standard output)")
+    parser.add_argument("--metrics", default="", help="file for the metrics of the routing core, as JSON (collected only if given)")
+    parser.add_argument("--update-mode", choices=DVR_logic.UPDATE_MODES, default="full", help="routing tables sent to the neighbors (default: full)")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="off", help="verbosity of log.txt (default: off)")
+    parser.add_argument("--quiet", action="store_true", help="do not print a line for every batch")
+    args = parser.parse_args()
+    if not args.scenario and not args.load:
+        parser.error("a scenario file or --load is required")
+
+    DVR_log.setLogLevel(LOG_LEVELS[args.log_level])
+    DVR_logic.setUpdateMode(DVR_logic.UPDATE_MODES[args.update_mode])
+    if args.log_level != "off":
+        DVR_log.sink.reset()
+
+    if args.metrics:
+        DVR_logic.enableMetrics()
+
+    NodeList = DVR_logic.NodeRegistry()
+    NetManager = DVR_logic.EdgesMap()
+    if args.load:
+        try:
+            NodeList, NetManager, _ = DVR_snapshot.loadSnapshot(args.load)
+        except (OSError, ValueError) as e:
+            sys.exit(f"Error: {e}")
+    statsFile = None
+    if args.stats:
+        statsFile = sys.stdout if args.stats == "-" else open(args.stats, 'w')
+
+    total = DVR_logic.ConvergenceStats()
+    batches = events = 0
+    start = time.perf_counter()
+    try:
+        for batch in runScenario(readScenarioFiles(args.scenario), NodeList, NetManager):
+            batches += 1
+            events += batch.events
+            for k, v in batch.convergence.counters().items():
+                setattr(total, k, getattr(total, k) + v)
+            if statsFile != None:
+                statsFile.write(json.dumps(batch.toDict()) + "\n")
+            if not args.quiet:
+                print(batch, file=sys.stderr)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Error: {e}")
+    finally:
+        if statsFile != None and statsFile is not sys.stdout:
+            statsFile.close()
+    elapsed = time.perf_counter() - start
+
+    if args.metrics:
+        metrics = DVR_logic.disableMetrics()
+        metrics.dump(args.metrics)
+        if not args.quiet:
+            print(metrics, file=sys.stderr)
+    if args.tables:
+        writeRoutingTables(args.tables, NodeList, args.format)
+    if args.edges:
+        DVR_export.exportNetwork(args.edges, NetManager=NetManager, format=args.format)
+    if args.save:
+        DVR_snapshot.saveSnapshot(args.save, NodeList, NetManager)
+    print(f"{events} events in {batches} batches, {len(NodeList)} nodes: {elapsed:.3f}s, {total}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
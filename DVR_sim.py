@@ -0,0 +1,340 @@
+import heapq
+import time
+import DVR_logic
+
+class SimulationStats:
+    """
+    Represents the outcome of a simulation run.
+
+    Attributes:
+        events (int): The number of events processed: deliveries, sendings and topology changes.
+        messages (int): The number of routing tables delivered, that is the number of updateRoutes calls.
+        updates (int): The number of messages that changed the receiver's routing table.
+        dropped (int): The number of messages lost because their link or receiver was removed while in flight.
+        convergenceTime (float): The simulated time of the last routing table change.
+        endTime (float): The simulated time of the last event.
+        wallTime (float): The real time spent running the simulation, in seconds.
+    """
+    def __init__(self):
+        """
+        Constructor to initialize empty statistics.
+        """
+        self.events: int = 0
+        self.messages: int = 0
+        self.updates: int = 0
+        self.dropped: int = 0
+        self.convergenceTime: float = 0.0
+        self.endTime: float = 0.0
+        self.wallTime: float = 0.0
+
+    def eventsPerSecond(self) -> float:
+        """
+        Returns the number of events processed per second of real time.
+
+        Returns:
+            float: The event rate.
+        """
+        return self.events / self.wallTime if self.wallTime > 0 else 0.0
+
+    def __str__(self):
+        return (f"events: {self.events}, messages: {self.messages}, updates: {self.updates}, dropped: {self.dropped}, "
+                f"convergence time: {self.convergenceTime:g}, wall time: {self.wallTime:.3f}s ({self.eventsPerSecond():.0f} events/s)")
+
+class EventSimulator:
+    """
+    Simulates the network in time, with a discrete-event engine.
+    Every routing table sent over a link is delivered after the latency of that link: events are kept
+    in a heap ordered by simulated time, and ties are broken by the order in which they were scheduled.
+    Each node sends its table to all its neighbors whenever the table changes (triggered updates),
+    and the receivers process it with WebNode.updateRoutes, as in updateNet: each neighbor receives the part
+    of the table of the update mode, and routes longer than EdgesMap.getDistanceBound are not learned.
+    A node that removes or lengthens a route makes its neighbors send their tables again, since one of them
+    may still offer a valid route, as the ConvergenceEngine does. The sending is itself an
+    event, scheduled advertiseDelay after the change: further changes before it are sent together.
+    Topology changes can be scheduled too, and are applied through the EdgesMap.
+
+    Attributes:
+        nodes (NodeRegistry): The nodes of the network.
+        NetManager (EdgesMap): The network's edge manager.
+        defaultLatency (float): The latency of the links without an explicit one.
+        advertiseDelay (float): The time between a routing table change and its sending.
+        mode (int): The update mode of the tables sent.
+        now (float): The current simulated time.
+    """
+    #Event kinds
+    DELIVERY = 0
+    ADVERTISE = 1
+    TOPOLOGY = 2
+
+    def __init__(self, NodeList: list[DVR_logic.WebNode], NetManager: DVR_logic.EdgesMap, defaultLatency: float = 1.0, advertiseDelay: float = 0.0,
+                 mode: int = None):
+        """
+        Constructor to initialize the simulator, with no pending events.
+
+        Args:
+            NodeList (list[WebNode]): The list of WebNodes in the network.
+            NetManager (EdgesMap): The network's edge manager.
+            defaultLatency (float): The latency of the links without an explicit one.
+            advertiseDelay (float): The time between a routing table change and its sending.
+            mode (int): The update mode, by default the one set with setUpdateMode.
+        """
+        self.nodes: DVR_logic.NodeRegistry = DVR_logic.asRegistry(NodeList)
+        self.NetManager: DVR_logic.EdgesMap = NetManager
+        self.defaultLatency: float = defaultLatency
+        self.advertiseDelay: float = advertiseDelay
+        self.mode: int = mode if mode != None else DVR_logic.updateMode
+        self.now: float = 0.0
+        self.__advertising: set[int] = set()
+        self.__latency: dict[tuple[int, int], float] = {}
+        self.__events: list[tuple] = []
+        self.__seq: int = 0
+        self.__stats: SimulationStats = SimulationStats()
+
+    def setLatency(self, srcId: int, dstId: int, latency: float):
+        """
+        Sets the latency of the link between two nodes, in both directions.
+
+        Args:
+            srcId (int): The identifier of one end of the link.
+            dstId (int): The identifier of the other end of the link.
+            latency (float): The time a routing table takes to cross the link.
+        """
+        self.__latency[(srcId, dstId)] = latency
+        self.__latency[(dstId, srcId)] = latency
+
+    def getLatency(self, srcId: int, dstId: int) -> float:
+        """
+        Returns the latency of the link between two nodes.
+
+        Args:
+            srcId (int): The identifier of one end of the link.
+            dstId (int): The identifier of the other end of the link.
+
+        Returns:
+            float: The time a routing table takes to cross the link.
+        """
+        return self.__latency.get((srcId, dstId), self.defaultLatency)
+
+    def pendingEvents(self) -> int:
+        """
+        Returns the number of scheduled events not processed yet.
+
+        Returns:
+            int: The number of pending events.
+        """
+        return len(self.__events)
+
+    def advertise(self, nodeId: int):
+        """
+        Makes a node send its current routing table to all its neighbors, each the part of the update mode.
+        Each copy is delivered after the latency of its link: copies arriving at the same time
+        share a single event, which keeps the heap small when many links have the same latency.
+
+        Args:
+            nodeId (int): The identifier of the sending node.
+        """
+        #Entries are updated in place, so the table in flight must be a copy
+        routes = self.nodes[nodeId].copyRoutingMap()
+        advertiseRoutes = DVR_logic.advertiseRoutes
+        mode = self.mode
+        latency = self.__latency
+        default = self.defaultLatency
+        now = self.now
+        arrivals: dict[float, list[int]] = {}
+        payloads: dict[int, dict[int, DVR_logic.RoutingMapEntry]] = {}
+        for nb in self.NetManager.getNeighborsId(nodeId):
+            payloads[nb] = advertiseRoutes(routes, nb, mode)
+            at = now + latency.get((nodeId, nb), default)
+            receivers = arrivals.get(at)
+            if receivers == None:
+                arrivals[at] = [nb]
+            else:
+                receivers.append(nb)
+        for at, receivers in arrivals.items():
+            self.__seq += 1
+            heapq.heappush(self.__events, (at, self.__seq, self.DELIVERY, receivers, nodeId, payloads))
+
+    def triggerUpdate(self, nodeId: int):
+        """
+        Schedules the sending of a node's routing table, advertiseDelay from now,
+        unless a sending is already scheduled: the table is read when it is sent.
+
+        Args:
+            nodeId (int): The identifier of the node whose routing table changed.
+        """
+        if nodeId in self.__advertising:
+            return
+        self.__advertising.add(nodeId)
+        self.__seq += 1
+        heapq.heappush(self.__events, (self.now + self.advertiseDelay, self.__seq, self.ADVERTISE, nodeId, None, None))
+
+    def schedule(self, at: float, action):
+        """
+        Schedules a topology change. The action is called at the given simulated time
+        and returns the nodes that must advertise their tables afterwards.
+
+        Args:
+            at (float): The simulated time of the change.
+            action (Callable[[], list[int]]): The change to apply.
+        """
+        self.__seq += 1
+        heapq.heappush(self.__events, (at, self.__seq, self.TOPOLOGY, None, None, action))
+
+    def scheduleAddEdge(self, at: float, srcId: int, dstId: int, weight: int, latency: float = None):
+        """
+        Schedules the addition of an edge.
+
+        Args:
+            at (float): The simulated time of the change.
+            srcId (int): The identifier of the source node.
+            dstId (int): The identifier of the destination node.
+            weight (int): The weight of the edge.
+            latency (float, optional): The latency of the new link, by default defaultLatency.
+        """
+        def action():
+            if latency != None:
+                self.setLatency(srcId, dstId, latency)
+            self.NetManager.addEdge(srcId, dstId, weight, self.nodes)
+            return [srcId, dstId]
+        self.schedule(at, action)
+
+    def scheduleRemoveEdge(self, at: float, srcId: int, dstId: int):
+        """
+        Schedules the removal of an edge.
+
+        Args:
+            at (float): The simulated time of the change.
+            srcId (int): The identifier of the source node.
+            dstId (int): The identifier of the destination node.
+        """
+        def action():
+            self.NetManager.removeEdge(srcId, dstId, self.nodes)
+            return [srcId, dstId]
+        self.schedule(at, action)
+
+    def scheduleAddNode(self, at: float, nodeId: int):
+        """
+        Schedules the addition of a node, with no edges: its links are added with scheduleAddEdge.
+
+        Args:
+            at (float): The simulated time of the change.
+            nodeId (int): The identifier of the node to add.
+        """
+        def action():
+            node = self.NetManager.addNode(nodeId)
+            if node == None:
+                return []
+            self.nodes.append(node)
+            return [nodeId]
+        self.schedule(at, action)
+
+    def scheduleRemoveNode(self, at: float, nodeId: int):
+        """
+        Schedules the removal of a node.
+
+        Args:
+            at (float): The simulated time of the change.
+            nodeId (int): The identifier of the node to remove.
+        """
+        def action():
+            if not self.NetManager.doExistsNode(nodeId):
+                return []
+            neighbors = self.NetManager.getNeighborsId(nodeId)
+            self.NetManager.removeNode(nodeId, self.nodes)
+            return neighbors
+        self.schedule(at, action)
+
+    def run(self, priorityNodesId: list[int] = None, until: float = None, maxEvents: int = None) -> SimulationStats:
+        """
+        Processes the scheduled events in order of simulated time, until there are none left.
+
+        Args:
+            priorityNodesId (list[int], optional): Nodes that advertise their tables at the current time before starting.
+            until (float, optional): Stops before the first event scheduled after this time.
+            maxEvents (int, optional): Stops once this many events have been processed, counting
+                each receiver of a delivery: the receivers not reached yet are processed by the next run.
+
+        Returns:
+            SimulationStats: The statistics accumulated by all the runs of this simulator.
+        """
+        stats = self.__stats
+        start = time.perf_counter()
+
+        for id in priorityNodesId or []:
+            if id in self.nodes:
+                self.triggerUpdate(id)
+
+        events = self.__events
+        heappop = heapq.heappop
+        nodes = self.nodes
+        NetManager = self.NetManager
+        DELIVERY = self.DELIVERY
+        ADVERTISE = self.ADVERTISE
+        advertising = self.__advertising
+        triggerUpdate = self.triggerUpdate
+        maxDist = NetManager.getDistanceBound()
+        until = float("inf") if until == None else until
+        maxEvents = float("inf") if maxEvents == None else maxEvents
+        #Receiver, edges and neighbors of each node, valid until the next topology change
+        links: dict[int, tuple[DVR_logic.WebNode, list[DVR_logic.EdgeMapEntry], set[int]]] = {}
+        processed = messages = updates = dropped = 0
+        while events and events[0][0] <= until and processed < maxEvents:
+            at, _, kind, target, senderId, payload = heappop(events)
+            self.now = at
+
+            if kind == DELIVERY:
+                for i, receiverId in enumerate(target):
+                    if processed >= maxEvents:
+                        #Same time and sequence number, so the rest is delivered first by the next run
+                        heapq.heappush(events, (at, _, kind, target[i:], senderId, payload))
+                        break
+                    processed += 1
+                    link = links.get(receiverId)
+                    if link == None:
+                        receiver = nodes.get(receiverId)
+                        if receiver == None:
+                            dropped += 1
+                            continue
+                        edges = NetManager.getEdges(receiverId)
+                        link = links[receiverId] = (receiver, edges, {e.dst for e in edges})
+                    receiver, edges, neighbors = link
+                    #The link may have failed while the table was in flight
+                    if senderId not in neighbors:
+                        dropped += 1
+                        continue
+                    messages += 1
+                    worsened = receiver.getWorsenedVersion()
+                    if receiver.updateRoutes(senderId, payload[receiverId], edges, maxDist):
+                        updates += 1
+                        stats.convergenceTime = at
+                        triggerUpdate(receiverId)
+                        if receiver.getWorsenedVersion() != worsened:
+                            for nb in neighbors:
+                                triggerUpdate(nb)
+                continue
+
+            processed += 1
+            if kind == ADVERTISE:
+                advertising.discard(target)
+                if target in nodes:
+                    self.advertise(target)
+            else:
+                links.clear()
+                changed = payload()
+                maxDist = NetManager.getDistanceBound()
+                stats.convergenceTime = at
+                #The changed nodes may have removed routes while reading the network
+                for id in changed:
+                    if id in nodes:
+                        triggerUpdate(id)
+                        for nb in NetManager.getNeighborsId(id):
+                            triggerUpdate(nb)
+
+        stats.messages += messages
+        stats.updates += updates
+        stats.dropped += dropped
+        stats.events += processed
+        stats.endTime = self.now
+        stats.wallTime += time.perf_counter() - start
+        DVR_logic.tablesChanged()
+        return stats
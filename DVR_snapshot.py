@@ -0,0 +1,287 @@
+import math
+import mmap
+import struct
+import sys
+from array import array
+import DVR_logic
+
+MAGIC = b"DVRS"
+VERSION = 1
+
+#Magic, version, flags, number of nodes, of edge entries (each edge is stored at both ends) and of routes
+HEADER = struct.Struct("<4sIIxxxxQQQ")
+
+#Flags of the header
+HAS_COORDINATES = 1
+
+def toBytes(values: array) -> bytes:
+    """
+    Converts an array to little-endian bytes, the byte order of snapshot files.
+    """
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def saveSnapshot(path: str, NodeList: list[DVR_logic.WebNode], NetManager: DVR_logic.EdgesMap, coordinates: dict[int, tuple[float, float]] = None):
+    """
+    Saves the state of a network to a binary file, that can be memory-mapped by Snapshot.
+    After a fixed header, the file holds flat arrays of 64-bit values: the node identifiers, the edges and
+    the routes of every node in CSR form (where the entries of the i-th node start and their destinations,
+    weights, distances and next hops), and optionally the coordinates of the nodes.
+    Edges and routes keep their order, which the routing algorithm depends on.
+
+    Args:
+        path (str): The path of the file.
+        NodeList (list[WebNode]): The list of WebNodes in the network.
+        NetManager (EdgesMap): The network's edge manager.
+        coordinates (dict[int, tuple[float, float]], optional): The (x, y) position of the nodes, for example
+            taken from the nodeVisuals of the GUI. Nodes without a position are saved with NaN.
+    """
+    nodes = DVR_logic.asRegistry(NodeList)
+    ids = array("q", NetManager.getNodesId())
+
+    edgeStart, edgeDst, edgeWeight = array("q", [0]), array("q"), array("q")
+    routeStart, routeDst, routeDist, routeHop = array("q", [0]), array("q"), array("q"), array("q")
+    for id in ids:
+        for e in NetManager.getEdges(id):
+            edgeDst.append(e.dst)
+            edgeWeight.append(e.w)
+        edgeStart.append(len(edgeDst))
+        node = nodes.get(id)
+        if node != None:
+            for k, route in node.getRoutingMap().items():
+                routeDst.append(k)
+                routeDist.append(route.dist)
+                routeHop.append(route.nextHop)
+        routeStart.append(len(routeDst))
+
+    sections = [ids, edgeStart, edgeDst, edgeWeight, routeStart, routeDst, routeDist, routeHop]
+    flags = 0
+    if coordinates != None:
+        flags |= HAS_COORDINATES
+        xy = array("d")
+        for id in ids:
+            x, y = coordinates.get(id, (math.nan, math.nan))
+            xy.append(x)
+            xy.append(y)
+        sections.append(xy)
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, flags, len(ids), len(edgeDst), len(routeDst)))
+        for section in sections:
+            file.write(toBytes(section))
+
+class Snapshot:
+    """
+    Represents a network state saved by saveSnapshot. The file is memory-mapped and its arrays are read
+    in place, so opening it costs nothing and single routing tables can be read without restoring the network.
+    Used as a context manager, the file is closed when the block exits.
+
+    Attributes:
+        path (str): The path of the file.
+        nodeCount (int): The number of nodes.
+        edgeCount (int): The number of edge entries, each edge being stored at both its ends.
+        routeCount (int): The number of routes, in all the routing tables.
+        ids (memoryview): The node identifiers.
+        edgeStart (memoryview): The edges of the i-th node are at positions edgeStart[i]:edgeStart[i+1] of the edge arrays.
+        edgeDst (memoryview): The node at the other end of every edge.
+        edgeWeight (memoryview): The weight of every edge.
+        routeStart (memoryview): The routes of the i-th node are at positions routeStart[i]:routeStart[i+1] of the route arrays.
+        routeDst (memoryview): The destination of every route.
+        routeDist (memoryview): The distance of every route.
+        routeNextHop (memoryview): The next hop of every route.
+        coordinates (memoryview): The x and y of every node, one after the other, None if they were not saved.
+    """
+    def __init__(self, path: str):
+        """
+        Constructor to open and map a snapshot file.
+
+        Args:
+            path (str): The path of the file.
+
+        Raises:
+            ValueError: If the file is not a snapshot, or was saved by an unsupported version.
+        """
+        self.path: str = path
+        self.__file = None
+        self.__map: mmap.mmap = None
+        self.__view: memoryview = None
+        self.__index: dict[int, int] = None
+        try:
+            self.__file = open(path, "rb")
+            #An empty file cannot be mapped
+            if self.__file.seek(0, 2) < HEADER.size:
+                raise ValueError(f"{path} is not a network snapshot")
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.__view = memoryview(self.__map)
+            if len(self.__view) < HEADER.size:
+                raise ValueError(f"{path} is not a network snapshot")
+            magic, version, flags, n, edges, routes = HEADER.unpack_from(self.__view)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a network snapshot")
+            if version != VERSION:
+                raise ValueError(f"{path} has snapshot version {version}, only version {VERSION} is supported")
+            self.nodeCount: int = n
+            self.edgeCount: int = edges
+            self.routeCount: int = routes
+
+            self.__offset = HEADER.size
+            self.ids: memoryview = self.__section("q", n)
+            self.edgeStart: memoryview = self.__section("q", n + 1)
+            self.edgeDst: memoryview = self.__section("q", edges)
+            self.edgeWeight: memoryview = self.__section("q", edges)
+            self.routeStart: memoryview = self.__section("q", n + 1)
+            self.routeDst: memoryview = self.__section("q", routes)
+            self.routeDist: memoryview = self.__section("q", routes)
+            self.routeNextHop: memoryview = self.__section("q", routes)
+            self.coordinates: memoryview = self.__section("d", 2 * n) if flags & HAS_COORDINATES else None
+        except Exception:
+            self.close()
+            raise
+
+    def __section(self, typecode: str, count: int) -> memoryview:
+        """
+        Returns the next array of the file, without copying it where the byte order allows.
+        """
+        start, end = self.__offset, self.__offset + 8 * count
+        if end > len(self.__view):
+            raise ValueError(f"{self.path} is truncated")
+        self.__offset = end
+        if sys.byteorder == "little":
+            return self.__view[start:end].cast(typecode)
+        values = array(typecode, self.__view[start:end].tobytes())
+        values.byteswap()
+        return memoryview(values)
+
+    def close(self):
+        """
+        Releases the memory map and closes the file, as far as they were opened. The arrays cannot be used afterwards.
+        """
+        for name in ("ids", "edgeStart", "edgeDst", "edgeWeight", "routeStart", "routeDst", "routeDist", "routeNextHop", "coordinates"):
+            view = self.__dict__.pop(name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        if self.__view != None:
+            self.__view.release()
+            self.__view = None
+        if self.__map != None:
+            self.__map.close()
+            self.__map = None
+        if self.__file != None:
+            self.__file.close()
+            self.__file = None
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, excType, exc, tb):
+        self.close()
+        return False
+
+    def indexOf(self, nodeId: int) -> int:
+        """
+        Returns the position of a node in the arrays.
+
+        Args:
+            nodeId (int): The identifier of the node.
+
+        Returns:
+            int: The position of the node, None if it is not in the snapshot.
+        """
+        if self.__index == None:
+            self.__index = {id: i for i, id in enumerate(self.ids)}
+        return self.__index.get(nodeId)
+
+    def getEdges(self, nodeId: int) -> list[DVR_logic.EdgeMapEntry]:
+        """
+        Returns the edges of a node.
+
+        Args:
+            nodeId (int): The identifier of the node.
+
+        Returns:
+            list[EdgeMapEntry]: The edges of the node.
+        """
+        i = self.indexOf(nodeId)
+        s, e = self.edgeStart[i], self.edgeStart[i + 1]
+        return list(map(DVR_logic.EdgeMapEntry, self.edgeDst[s:e], self.edgeWeight[s:e]))
+
+    def getRoutingMap(self, nodeId: int) -> dict[int, DVR_logic.RoutingMapEntry]:
+        """
+        Returns the routing table of a node, reading only that table.
+
+        Args:
+            nodeId (int): The identifier of the node.
+
+        Returns:
+            dict[int, RoutingMapEntry]: The routing table of the node.
+        """
+        return self.__routingMapAt(self.indexOf(nodeId))
+
+    def __routingMapAt(self, i: int) -> dict[int, DVR_logic.RoutingMapEntry]:
+        """
+        Returns the routing table of the node at the given position.
+        """
+        s, e = self.routeStart[i], self.routeStart[i + 1]
+        return dict(zip(self.routeDst[s:e], map(DVR_logic.RoutingMapEntry, self.routeDist[s:e], self.routeNextHop[s:e])))
+
+    def getCoordinates(self) -> dict[int, tuple[float, float]]:
+        """
+        Returns the saved position of the nodes.
+
+        Returns:
+            dict[int, tuple[float, float]]: The (x, y) of every node that has one, empty if none were saved.
+        """
+        if self.coordinates == None:
+            return {}
+        xy = self.coordinates
+        return {id: (xy[2 * i], xy[2 * i + 1]) for i, id in enumerate(self.ids) if not math.isnan(xy[2 * i])}
+
+    def restore(self, NetManager: DVR_logic.EdgesMap = None, routes: bool = True) -> tuple[DVR_logic.NodeRegistry, DVR_logic.EdgesMap]:
+        """
+        Rebuilds the network. The routing tables are restored as saved, so updateNet does not have to run.
+        Unlike opening the file, this is not lazy: every edge and route becomes a Python object, in O(nodes + edges + routes),
+        which takes seconds for networks of hundreds of thousands of edges. Without routes, only the edges are built.
+
+        Args:
+            NetManager (EdgesMap, optional): The edge manager to load the edges into, replacing its content,
+                so that its listeners are told; by default a new one.
+            routes (bool): Whether to restore the routing tables, otherwise they are left empty.
+
+        Returns:
+            tuple[NodeRegistry, EdgesMap]: The nodes and the edges of the network.
+        """
+        EdgeMapEntry = DVR_logic.EdgeMapEntry
+        edgeStart, edgeDst, edgeWeight = self.edgeStart, self.edgeDst, self.edgeWeight
+        edgeMap = {}
+        for i, id in enumerate(self.ids):
+            s, e = edgeStart[i], edgeStart[i + 1]
+            edgeMap[id] = list(map(EdgeMapEntry, edgeDst[s:e], edgeWeight[s:e]))
+
+        if NetManager == None:
+            NetManager = DVR_logic.EdgesMap()
+        NetManager.loadMap(edgeMap)
+
+        NodeList = DVR_logic.NodeRegistry()
+        for i, id in enumerate(self.ids):
+            node = DVR_logic.WebNode(id)
+            if routes:
+                node.setRoutingMap(self.__routingMapAt(i), copy=False)
+            NodeList.append(node)
+        return NodeList, NetManager
+
+def loadSnapshot(path: str, NetManager: DVR_logic.EdgesMap = None) -> tuple[DVR_logic.NodeRegistry, DVR_logic.EdgesMap, dict[int, tuple[float, float]]]:
+    """
+    Restores a network saved by saveSnapshot, building all of it, see Snapshot.restore.
+
+    Args:
+        path (str): The path of the file.
+        NetManager (EdgesMap, optional): The edge manager to load the edges into, by default a new one.
+
+    Returns:
+        tuple[NodeRegistry, EdgesMap, dict[int, tuple[float, float]]]: The nodes, the edges and the saved positions of the nodes.
+    """
+    with Snapshot(path) as snapshot:
+        NodeList, NetManager = snapshot.restore(NetManager)
+        return NodeList, NetManager, snapshot.getCoordinates()
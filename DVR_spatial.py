@@ -0,0 +1,256 @@
+import math
+
+#Side of the cells of the grid, in canvas pixels
+CELL_SIZE = 50
+
+def pointDistance(px: float, py: float, x: float, y: float) -> float:
+    """
+    Returns the Euclidean distance between two points.
+    """
+    return math.hypot(px - x, py - y)
+
+def segmentDistance(px: float, py: float, x1: float, y1: float, x2: float, y2: float) -> float:
+    """
+    Returns the distance of a point from a segment: from its projection on the segment,
+    or from the closest end if the projection falls outside.
+
+    Args:
+        px (float): The x-coordinate of the point.
+        py (float): The y-coordinate of the point.
+        x1 (float): The x-coordinate of the first end of the segment.
+        y1 (float): The y-coordinate of the first end of the segment.
+        x2 (float): The x-coordinate of the second end of the segment.
+        y2 (float): The y-coordinate of the second end of the segment.
+
+    Returns:
+        float: The distance of the point from the segment.
+    """
+    dx, dy = x2 - x1, y2 - y1
+    length = dx * dx + dy * dy
+    if length == 0:
+        return pointDistance(px, py, x1, y1)
+    t = max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / length))
+    return pointDistance(px, py, x1 + t * dx, y1 + t * dy)
+
+class SpatialIndex:
+    """
+    Represents a uniform grid over the canvas, indexing points (the nodes, with their radius) and segments
+    (the edges) by the cells they cross, so that the closest item to a click is found by looking only
+    at the cells around it, in rings of growing distance, instead of at every item.
+    Each item is identified by a key, chosen by the caller.
+
+    Attributes:
+        cellSize (float): The side of the cells.
+    """
+    def __init__(self, cellSize: float = CELL_SIZE):
+        """
+        Constructor to initialize an empty index.
+
+        Args:
+            cellSize (float): The side of the cells.
+        """
+        self.cellSize: float = cellSize
+        self.__cells: dict[tuple[int, int], set] = {}
+        self.__items: dict = {}
+        #The columns and rows that held items, never shrunk on removal: no item is outside them
+        self.__bounds: list[int] = None
+
+    def __len__(self) -> int:
+        return len(self.__items)
+
+    def __contains__(self, key) -> bool:
+        return key in self.__items
+
+    def __cell(self, x: float, y: float) -> tuple[int, int]:
+        """
+        Returns the cell containing a point.
+        """
+        return (math.floor(x / self.cellSize), math.floor(y / self.cellSize))
+
+    def __segmentCells(self, x1: float, y1: float, x2: float, y2: float) -> list[tuple[int, int]]:
+        """
+        Returns the cells crossed by a segment: for every column of cells it spans,
+        the rows between the lowest and highest point of the segment inside the column.
+        """
+        if x1 > x2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        c1, c2 = math.floor(x1 / self.cellSize), math.floor(x2 / self.cellSize)
+        slope = (y2 - y1) / (x2 - x1) if x2 != x1 else 0.0
+        cells = []
+        for c in range(c1, c2 + 1):
+            left, right = max(x1, c * self.cellSize), min(x2, (c + 1) * self.cellSize)
+            ya, yb = y1 + (left - x1) * slope, y1 + (right - x1) * slope
+            if x2 == x1:
+                ya, yb = y1, y2
+            for r in range(math.floor(min(ya, yb) / self.cellSize), math.floor(max(ya, yb) / self.cellSize) + 1):
+                cells.append((c, r))
+        return cells
+
+    def __insert(self, key, cells: list[tuple[int, int]], shape: tuple):
+        """
+        Stores an item in the given cells, replacing the item with the same key.
+        """
+        if key in self.__items:
+            self.remove(key)
+        if self.__bounds == None:
+            self.__bounds = [cells[0][0], cells[0][0], cells[0][1], cells[0][1]]
+        bounds = self.__bounds
+        for cell in cells:
+            bounds[0], bounds[1] = min(bounds[0], cell[0]), max(bounds[1], cell[0])
+            bounds[2], bounds[3] = min(bounds[2], cell[1]), max(bounds[3], cell[1])
+            bucket = self.__cells.get(cell)
+            if bucket == None:
+                bucket = self.__cells[cell] = set()
+            bucket.add(key)
+        self.__items[key] = (cells, shape)
+
+    def addPoint(self, key, x: float, y: float, radius: float = 0.0):
+        """
+        Adds a point, or a disc: clicks inside the radius are at distance 0.
+
+        Args:
+            key (Hashable): The key of the item.
+            x (float): The x-coordinate of the point.
+            y (float): The y-coordinate of the point.
+            radius (float): The radius of the disc.
+        """
+        r = radius
+        c1, r1 = self.__cell(x - r, y - r)
+        c2, r2 = self.__cell(x + r, y + r)
+        self.__insert(key, [(c, rr) for c in range(c1, c2 + 1) for rr in range(r1, r2 + 1)], (x, y, radius))
+
+    def addSegment(self, key, x1: float, y1: float, x2: float, y2: float):
+        """
+        Adds a segment.
+
+        Args:
+            key (Hashable): The key of the item.
+            x1 (float): The x-coordinate of the first end.
+            y1 (float): The y-coordinate of the first end.
+            x2 (float): The x-coordinate of the second end.
+            y2 (float): The y-coordinate of the second end.
+        """
+        self.__insert(key, self.__segmentCells(x1, y1, x2, y2), (x1, y1, x2, y2))
+
+    def remove(self, key):
+        """
+        Removes an item, if it is in the index.
+
+        Args:
+            key (Hashable): The key of the item.
+        """
+        item = self.__items.pop(key, None)
+        if item == None:
+            return
+        for cell in item[0]:
+            bucket = self.__cells[cell]
+            bucket.discard(key)
+            if not bucket:
+                del self.__cells[cell]
+
+    def clear(self):
+        """
+        Removes all the items.
+        """
+        self.__cells = {}
+        self.__items = {}
+        self.__bounds = None
+
+    def distance(self, key, x: float, y: float) -> float:
+        """
+        Returns the distance of a point from an item.
+
+        Args:
+            key (Hashable): The key of the item.
+            x (float): The x-coordinate of the point.
+            y (float): The y-coordinate of the point.
+
+        Returns:
+            float: The distance, 0 inside the radius of a point.
+        """
+        shape = self.__items[key][1]
+        if len(shape) == 3:
+            return max(0.0, pointDistance(x, y, shape[0], shape[1]) - shape[2])
+        return segmentDistance(x, y, *shape)
+
+    def nearest(self, x: float, y: float, prefer=None) -> tuple:
+        """
+        Finds the item closest to a point, looking at the rings of cells around it until
+        no item in a farther ring can be closer than the closest found so far.
+
+        Args:
+            x (float): The x-coordinate of the point.
+            y (float): The y-coordinate of the point.
+            prefer (Callable[[Hashable], bool], optional): The items winning a tie at the same distance,
+                for example the nodes over the edges that reach them.
+
+        Returns:
+            tuple[Hashable, float]: The key of the closest item and its distance, (None, None) if the index is empty.
+        """
+        if not self.__items:
+            return (None, None)
+        cx, cy = self.__cell(x, y)
+        #No ring beyond the one reaching the farthest column or row that held items can hold any
+        minC, maxC, minR, maxR = self.__bounds
+        farthest = max(abs(cx - minC), abs(cx - maxC), abs(cy - minR), abs(cy - maxR))
+        best, bestDist = None, None
+        seen = set()
+        ring = 0
+        while ring <= farthest:
+            for cell in self.__ring(cx, cy, ring):
+                for key in self.__cells.get(cell, ()):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    dist = self.distance(key, x, y)
+                    if best == None or dist < bestDist or (dist == bestDist and prefer != None and prefer(key) and not prefer(best)):
+                        best, bestDist = key, dist
+            #The cells of the next ring are at least this far from the point
+            if best != None and bestDist < ring * self.cellSize:
+                break
+            ring += 1
+        return (best, bestDist)
+
+    def query(self, x1: float, y1: float, x2: float, y2: float) -> set:
+        """
+        Finds the items that may cross a rectangle: the ones in the cells it overlaps.
+
+        Args:
+            x1 (float): The left side of the rectangle.
+            y1 (float): The top side of the rectangle.
+            x2 (float): The right side of the rectangle.
+            y2 (float): The bottom side of the rectangle.
+
+        Returns:
+            set[Hashable]: The keys of the items.
+        """
+        c1, r1 = self.__cell(x1, y1)
+        c2, r2 = self.__cell(x2, y2)
+        found = set()
+        if (c2 - c1 + 1) * (r2 - r1 + 1) > len(self.__cells):
+            #A rectangle wider than the network: checking the occupied cells is faster
+            for (c, r), bucket in self.__cells.items():
+                if c1 <= c <= c2 and r1 <= r <= r2:
+                    found.update(bucket)
+        else:
+            for c in range(c1, c2 + 1):
+                for r in range(r1, r2 + 1):
+                    bucket = self.__cells.get((c, r))
+                    if bucket != None:
+                        found.update(bucket)
+        return found
+
+    @staticmethod
+    def __ring(cx: int, cy: int, ring: int):
+        """
+        Yields the cells at Chebyshev distance ring from a cell.
+        """
+        if ring == 0:
+            yield (cx, cy)
+            return
+        for c in range(cx - ring, cx + ring + 1):
+            yield (c, cy - ring)
+            yield (c, cy + ring)
+        for r in range(cy - ring + 1, cy + ring):
+            yield (cx - ring, r)
+            yield (cx + ring, r)
@@ -0,0 +1,470 @@
+import argparse
+import gc
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import sys
+import tempfile
+import time
+import DVR_log
+import DVR_logic
+import DVR_parallel
+import DVR_run
+import DVR_snapshot
+
+#The commands allowed in a failure
+FAILURE_COMMANDS = ("remove-node", "remove-edge")
+
+class FailureResult:
+    """
+    Represents the outcome of a what-if failure: the cost of the convergence after it and the routes it changed.
+
+    Attributes:
+        failure (list[tuple[str, list[int]]]): The commands of the failure, applied in a single transaction.
+        stats (ConvergenceStats): The cost of the convergence, None if the failure raised an error.
+            If the convergence was stopped, the nodes still to send are in its pending list.
+        seconds (float): The real time spent applying the failure and converging, in seconds.
+        routes (list[tuple[int, int, tuple[int, int], tuple[int, int]]]): The changed routes, as (node, destination,
+            before, after), where before and after are (distance, next hop) pairs, None if there is no route.
+            The routes of the removed nodes are left out. Empty if the convergence did not complete,
+            since the tables of a stopped convergence are not the routes the failure leads to.
+        error (str): The error raised by the failure, None if there was none.
+    """
+    def __init__(self, failure: list[tuple[str, list[int]]]):
+        """
+        Constructor to initialize the result of a failure not run yet.
+
+        Args:
+            failure (list[tuple[str, list[int]]]): The commands of the failure.
+        """
+        self.failure: list[tuple[str, list[int]]] = failure
+        self.stats: DVR_logic.ConvergenceStats = None
+        self.seconds: float = 0.0
+        self.routes: list[tuple[int, int, tuple[int, int], tuple[int, int]]] = []
+        self.error: str = None
+
+    def name(self) -> str:
+        """
+        Returns the failure as scenario commands, for example "remove-edge 3 4".
+
+        Returns:
+            str: The commands, separated by '; '.
+        """
+        return "; ".join(" ".join([command, *map(str, args)]) for command, args in self.failure)
+
+    def converged(self) -> bool:
+        """
+        Checks if the network converged after the failure, within the messages allowed.
+
+        Returns:
+            bool: True if the convergence completed, False if it was stopped or the failure raised an error.
+        """
+        return self.stats != None and not self.stats.pending
+
+    def changedNodes(self) -> int:
+        """
+        Returns the number of nodes whose routing table changed.
+
+        Returns:
+            int: The number of nodes.
+        """
+        return len({r[0] for r in self.routes})
+
+    def lostRoutes(self) -> int:
+        """
+        Returns the number of routes removed by the failure, to destinations no longer reachable.
+
+        Returns:
+            int: The number of routes.
+        """
+        return sum(1 for r in self.routes if r[3] == None)
+
+    def toDict(self, routes: bool = False) -> dict:
+        """
+        Returns the result as a dictionary, suitable for JSON.
+        The changed routes are given only if the convergence completed, that is if "converged" is True.
+
+        Args:
+            routes (bool): Whether to include the changed routes, besides their number.
+
+        Returns:
+            dict: The result of the failure.
+        """
+        result = {"failure": self.name(), "converged": self.converged(), "seconds": round(self.seconds, 6)}
+        if self.converged():
+            result.update(changedRoutes=len(self.routes), changedNodes=self.changedNodes(), lostRoutes=self.lostRoutes())
+        if self.stats != None:
+            result.update(self.stats.counters())
+        if self.error != None:
+            result["error"] = self.error
+        if routes and self.converged():
+            result["routes"] = [{"node": n, "destination": k, "before": before, "after": after} for n, k, before, after in self.routes]
+        return result
+
+    def __str__(self):
+        if self.error != None:
+            return f"{self.name()}: {self.error}"
+        if not self.converged():
+            return f"{self.name()}: {self.seconds:.3f}s, stopped before converging, routes not valid, {self.stats}"
+        return (f"{self.name()}: {self.seconds:.3f}s, {len(self.routes)} routes changed in {self.changedNodes()} nodes, "
+                f"{self.lostRoutes()} lost, {self.stats}")
+
+def singleFailures(NetManager: DVR_logic.EdgesMap, edges: bool = True, nodes: bool = True) -> list[list[tuple[str, list[int]]]]:
+    """
+    Lists every single-edge and single-node failure of a network.
+
+    Args:
+        NetManager (EdgesMap): The network's edge manager.
+        edges (bool): Whether to list the failures of the edges, each edge once.
+        nodes (bool): Whether to list the failures of the nodes.
+
+    Returns:
+        list[list[tuple[str, list[int]]]]: The failures, each a list of one command.
+    """
+    failures = []
+    if edges:
+        failures += [[("remove-edge", [src, dst])] for src, dst, _ in NetManager.iterEdges()]
+    if nodes:
+        failures += [[("remove-node", [id])] for id in NetManager.getNodesId()]
+    return failures
+
+def readFailures(paths: list[str]) -> list[list[tuple[str, list[int]]]]:
+    """
+    Reads failures from scenario files. The commands with the same time form a single failure,
+    as they would be a single batch in DVR_run, so shared risks are failed together.
+
+    Args:
+        paths (list[str]): The paths of the files, '-' for the standard input.
+
+    Returns:
+        list[list[tuple[str, list[int]]]]: The failures, in the order of the files.
+
+    Raises:
+        ValueError: If a line is not valid, or adds a node or an edge.
+    """
+    failures = []
+    now = None
+    for at, command, args in DVR_run.readScenarioFiles(paths):
+        if command not in FAILURE_COMMANDS:
+            raise ValueError(f"'{command}' is not allowed in a failure")
+        if at != now or not failures:
+            failures.append([])
+            now = at
+        failures[-1].append((command, args))
+    return failures
+
+def runFailure(failure: list[tuple[str, list[int]]], NodeList: DVR_logic.NodeRegistry, NetManager: DVR_logic.EdgesMap, maxMessages: int = None, mode: int = None) -> tuple[DVR_logic.ConvergenceStats, float, dict[int, tuple[bool, dict[int, tuple[int, int]]]]]:
+    """
+    Applies a failure to the network and converges it once, changing the network in place.
+    Outside a transaction the commands only make the touched nodes read the network,
+    so the convergence is started here, where it can be stopped.
+
+    Args:
+        failure (list[tuple[str, list[int]]]): The commands of the failure.
+        NodeList (NodeRegistry): The nodes of the network.
+        NetManager (EdgesMap): The network's edge manager.
+        maxMessages (int, optional): The number of messages after which the convergence is stopped,
+            leaving the nodes still to send in the pending list of the statistics. By default there is no limit.
+        mode (int, optional): The update mode of the convergence, by default the one set with setUpdateMode.
+
+    Returns:
+        tuple[ConvergenceStats, float, dict[int, tuple[bool, dict[int, tuple[int, int]]]]]: The cost of the convergence,
+        the seconds it took and, for every node whose table changed, whether the whole table is given
+        and the new (distance, next hop) of its changed destinations, None if removed.
+    """
+    versions = {n.getId(): n.getVersion() for n in NodeList}
+    start = time.perf_counter()
+    touched = []
+    for command, args in failure:
+        if command == "remove-edge":
+            touched += args
+        elif NetManager.doExistsNode(args[0]):
+            touched += NetManager.getNeighborsId(args[0])
+        DVR_run.applyEvent(command, args, NodeList, NetManager)
+    progress = (lambda stats: stats.messages < maxMessages) if maxMessages != None else None
+    stats = DVR_logic.updateNet(NodeList, NetManager, list(dict.fromkeys(touched)), mode=mode, progress=progress)
+    seconds = time.perf_counter() - start
+
+    changes = {}
+    for node in NodeList:
+        version = versions.get(node.getId())
+        if version == None or node.getVersion() == version:
+            continue
+        routingMap = node.getRoutingMap()
+        changed = node.changesSince(version)
+        if changed == None:
+            changes[node.getId()] = (True, DVR_parallel.encodeRoutes(routingMap))
+        else:
+            routes = {}
+            for k in changed:
+                e = routingMap.get(k)
+                routes[k] = (e.dist, e.nextHop) if e != None else None
+            changes[node.getId()] = (False, routes)
+    return stats, seconds, changes
+
+def diffRoutes(NodeList: DVR_logic.NodeRegistry, changes: dict[int, tuple[bool, dict[int, tuple[int, int]]]]) -> list[tuple[int, int, tuple[int, int], tuple[int, int]]]:
+    """
+    Compares the tables returned by runFailure with the ones of the network before the failure.
+    A route that changed and then changed back is not reported.
+
+    Args:
+        NodeList (NodeRegistry): The nodes of the network before the failure.
+        changes (dict[int, tuple[bool, dict[int, tuple[int, int]]]]): The changed tables, as returned by runFailure.
+
+    Returns:
+        list[tuple[int, int, tuple[int, int], tuple[int, int]]]: The changed routes, see FailureResult.
+    """
+    routes = []
+    for id, (whole, after) in changes.items():
+        before = NodeList[id].getRoutingMap()
+        dsts = list(before.keys() | after.keys()) if whole else after
+        for k in dsts:
+            old = before.get(k)
+            old = (old.dist, old.nextHop) if old != None else None
+            new = after.get(k)
+            if old != new:
+                routes.append((id, k, old, new))
+    return routes
+
+#The network, the failures and the message limit of the running sweep, inherited by the forked workers
+sweepState: tuple[DVR_logic.NodeRegistry, DVR_logic.EdgesMap, list[list[tuple[str, list[int]]]], int] = None
+
+def forkFailure(failure: list[tuple[str, list[int]]], NodeList: DVR_logic.NodeRegistry, NetManager: DVR_logic.EdgesMap, maxMessages: int = None, mode: int = None) -> FailureResult:
+    """
+    Runs a failure in a child process forked from the calling one, so that it starts from a copy-on-write
+    copy of the network and its changes are discarded with it. The calling process keeps the network
+    as it was, and compares the changed tables with it.
+
+    Args:
+        failure (list[tuple[str, list[int]]]): The commands of the failure.
+        NodeList (NodeRegistry): The nodes of the network.
+        NetManager (EdgesMap): The network's edge manager.
+        maxMessages (int, optional): The number of messages after which the convergence is stopped, see runFailure.
+        mode (int, optional): The update mode of the convergence, see runFailure.
+
+    Returns:
+        FailureResult: The outcome of the failure.
+    """
+    result = FailureResult(failure)
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        try:
+            data = pickle.dumps((None, runFailure(failure, NodeList, NetManager, maxMessages, mode)))
+        except BaseException as e:
+            data = pickle.dumps((repr(e), None))
+        with os.fdopen(w, "wb") as file:
+            file.write(data)
+        os._exit(0)
+
+    os.close(w)
+    with os.fdopen(r, "rb") as file:
+        data = file.read()
+    os.waitpid(pid, 0)
+    if not data:
+        result.error = "the process of the failure exited without a result"
+        return result
+    result.error, outcome = pickle.loads(data)
+    if outcome != None:
+        result.stats, result.seconds, changes = outcome
+        if result.converged():
+            result.routes = diffRoutes(NodeList, changes)
+    return result
+
+def sweepWorker(conn):
+    """
+    Body of a worker process: runs the failures requested by the coordinator, each in its own forked child,
+    on the network inherited from the coordinator in sweepState. The worker never changes the network,
+    so every failure starts from the same state. Logging is disabled, since several processes cannot share the log file.
+
+    Args:
+        conn (Connection): The pipe to the coordinator.
+    """
+    DVR_log.setLogLevel(DVR_log.LOG_OFF)
+    NodeList, NetManager, failures, maxMessages, mode = sweepState
+    while True:
+        i = conn.recv()
+        if i == None:
+            conn.close()
+            return
+        conn.send((i, forkFailure(failures[i], NodeList, NetManager, maxMessages, mode)))
+
+def sweepSequential(NodeList: DVR_logic.NodeRegistry, NetManager: DVR_logic.EdgesMap, failures: list[list[tuple[str, list[int]]]], maxMessages: int = None, mode: int = None) -> list[FailureResult]:
+    """
+    Runs the failures one after the other in the calling process, each on a copy of the network
+    restored from a snapshot, where fork is not available. The network is not changed.
+    The restored nodes have not processed any table yet, so the convergence can cost more than after a fork.
+
+    Args:
+        NodeList (NodeRegistry): The nodes of the network.
+        NetManager (EdgesMap): The network's edge manager.
+        failures (list[list[tuple[str, list[int]]]]): The failures.
+        maxMessages (int, optional): The number of messages after which a convergence is stopped, see runFailure.
+        mode (int, optional): The update mode of the convergences, see runFailure.
+
+    Returns:
+        list[FailureResult]: The outcome of every failure, in the same order.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "network.dvr")
+        DVR_snapshot.saveSnapshot(path, NodeList, NetManager)
+        with DVR_snapshot.Snapshot(path) as snapshot:
+            for failure in failures:
+                result = FailureResult(failure)
+                nodes, edges = snapshot.restore()
+                try:
+                    result.stats, result.seconds, changes = runFailure(failure, nodes, edges, maxMessages, mode)
+                    if result.converged():
+                        result.routes = diffRoutes(NodeList, changes)
+                except Exception as e:
+                    result.error = repr(e)
+                results.append(result)
+    return results
+
+def sweepFailures(NodeList: list[DVR_logic.WebNode], NetManager: DVR_logic.EdgesMap, failures: list[list[tuple[str, list[int]]]] = None, workers: int = None, maxMessages: int = None, mode: int = None) -> list[FailureResult]:
+    """
+    Runs what-if failures on a converged network, in parallel, without changing it.
+    The worker processes are forked from the calling one, and every failure runs in a child forked from
+    a worker, so it starts from a copy-on-write copy of the network: nothing is copied or rebuilt
+    up front, and only the pages a failure writes are duplicated. Every failure converges from the same
+    state, so its cost does not depend on the failures run before it. Without fork, the failures run
+    one after the other with sweepSequential.
+
+    Args:
+        NodeList (list[WebNode]): The nodes of the network, with converged routing tables.
+        NetManager (EdgesMap): The network's edge manager.
+        failures (list[list[tuple[str, list[int]]]], optional): The failures, each a list of scenario commands
+            removing nodes or edges, as returned by readFailures. By default every single-edge and single-node failure.
+        workers (int, optional): The number of worker processes, by default the number of CPUs.
+        maxMessages (int, optional): The number of messages after which a convergence is stopped, so that a failure
+            counting to infinity does not hold a worker. By default there is no limit.
+        mode (int, optional): The update mode of the convergences, by default the one set with setUpdateMode.
+
+    Returns:
+        list[FailureResult]: The outcome of every failure, in the same order.
+    """
+    global sweepState
+    NodeList = DVR_logic.asRegistry(NodeList)
+    if failures == None:
+        failures = singleFailures(NetManager)
+    if not failures:
+        return []
+    if mode == None:
+        mode = DVR_logic.updateMode
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return sweepSequential(NodeList, NetManager, failures, maxMessages, mode)
+    if workers == None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(failures)))
+
+    ctx = multiprocessing.get_context("fork")
+    results: list[FailureResult] = [None] * len(failures)
+    conns = []
+    procs = []
+    sweepState = (NodeList, NetManager, failures, maxMessages, mode)
+    #The objects of the network are moved out of the reach of the garbage collector,
+    #which would otherwise write to all of them, and copy their pages, in every process
+    gc.freeze()
+    try:
+        for _ in range(workers):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=sweepWorker, args=(child,), daemon=True)
+            proc.start()
+            child.close()
+            conns.append(parent)
+            procs.append(proc)
+    finally:
+        gc.unfreeze()
+        sweepState = None
+
+    try:
+        sent = 0
+        for conn in conns:
+            conn.send(sent)
+            sent += 1
+        busy = list(conns)
+        while busy:
+            for conn in multiprocessing.connection.wait(busy):
+                i, result = conn.recv()
+                results[i] = result
+                if sent < len(failures):
+                    conn.send(sent)
+                    sent += 1
+                else:
+                    busy.remove(conn)
+    finally:
+        for conn in conns:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            conn.close()
+        for proc in procs:
+            proc.join()
+    return results
+
+def main():
+    """
+    Sweeps the failures of a network loaded from a snapshot, or of a converged grid, and prints the costliest ones.
+    """
+    parser = argparse.ArgumentParser(description="What-if failure sweep of a distance vector routing network")
+    parser.add_argument("snapshot", nargs="?", default="", help="snapshot of a converged network (default: a grid, see --side)")
+    parser.add_argument("--side", type=int, default=20, help="side of the grid swept without a snapshot (default: 20, that is 400 nodes)")
+    parser.add_argument("--failures", nargs="*", default=None, help="scenario files of the failures, the commands with the same time failing together "
+                        "(default: every single edge and node)")
+    parser.add_argument("--no-edges", action="store_true", help="do not sweep the single-edge failures")
+    parser.add_argument("--no-nodes", action="store_true", help="do not sweep the single-node failures")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--max-messages", type=int, default=1000000, help="messages after which a convergence is stopped, 0 for no limit (default: 1000000)")
+    parser.add_argument("--sequential", action="store_true", help="restore the network for every failure in this process, instead of forking")
+    parser.add_argument("--output", default="", help="file for the result of every failure, as JSON lines ('-' for the standard output)")
+    parser.add_argument("--routes", action="store_true", help="write the changed routes in --output, besides their number")
+    parser.add_argument("--top", type=int, default=10, help="number of costliest failures printed (default: 10)")
+    parser.add_argument("--update-mode", choices=DVR_logic.UPDATE_MODES, default="full", help="routing tables sent to the neighbors (default: full)")
+    args = parser.parse_args()
+
+    DVR_log.setLogLevel(DVR_log.LOG_OFF)
+    mode = DVR_logic.UPDATE_MODES[args.update_mode]
+    try:
+        if args.snapshot:
+            NodeList, NetManager, _ = DVR_snapshot.loadSnapshot(args.snapshot)
+        else:
+            NodeList, NetManager = DVR_parallel.buildGrid(args.side)
+            DVR_logic.updateNet(NodeList, NetManager, NetManager.getNodesId(), mode=mode)
+        if args.failures != None:
+            failures = readFailures(args.failures)
+        else:
+            failures = singleFailures(NetManager, not args.no_edges, not args.no_nodes)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Error: {e}")
+
+    maxMessages = args.max_messages if args.max_messages > 0 else None
+    start = time.perf_counter()
+    if args.sequential:
+        results = sweepSequential(NodeList, NetManager, failures, maxMessages, mode)
+    else:
+        results = sweepFailures(NodeList, NetManager, failures, args.workers, maxMessages, mode)
+    elapsed = time.perf_counter() - start
+
+    if args.output:
+        file = sys.stdout if args.output == "-" else open(args.output, 'w')
+        try:
+            for result in results:
+                file.write(json.dumps(result.toDict(args.routes)) + "\n")
+        finally:
+            if file is not sys.stdout:
+                file.close()
+    ranked = sorted(results, key=lambda r: r.stats.messages if r.stats != None else -1, reverse=True)
+    for result in ranked[:args.top]:
+        print(result, file=sys.stderr)
+    errors = sum(1 for r in results if r.error != None)
+    stopped = sum(1 for r in results if r.error == None and not r.converged())
+    print(f"{len(results)} failures of {len(NodeList)} nodes in {elapsed:.3f}s "
+          f"({len(results) / elapsed if elapsed > 0 else 0:.1f} per second), {stopped} stopped, {errors} errors", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,856 @@
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import struct
+import sys
+import time
+from array import array
+import DVR_log
+import DVR_logic
+import DVR_parallel
+import DVR_snapshot
+import DVR_verify
+
+MAGIC = b"DV"
+VERSION = 1
+
+#Magic, version, sender, sequence number of the table, index of the datagram in the table and number of datagrams of the table
+HEADER = struct.Struct("<2sBxIIHH")
+
+#Routes sent in a single datagram, as (destination, distance) pairs of 32-bit integers: 32 KB, well below the limit of UDP
+ROUTES_PER_DATAGRAM = 4000
+
+#Distance of a poisoned route in a datagram
+WIRE_INFINITY = 0xFFFFFFFF
+
+#Address of all the routers
+LOCALHOST = "127.0.0.1"
+
+#Receive buffer requested for every router socket, so that bursts of tables are not dropped by the kernel
+RECEIVE_BUFFER = 1 << 22
+
+#Seconds without datagrams after which the network is checked for convergence
+QUIET_TIME = 0.2
+
+def encodeTable(senderId: int, seq: int, routingMap: dict[int, DVR_logic.RoutingMapEntry]) -> list[bytes]:
+    """
+    Encodes a routing table into datagrams: each is a HEADER followed by up to ROUTES_PER_DATAGRAM
+    (destination, distance) pairs of little-endian unsigned 32-bit integers, in the order of the table.
+    The next hops are not sent, since updateRoutes does not read them. An empty table is a single datagram.
+
+    Args:
+        senderId (int): The identifier of the sending node.
+        seq (int): The sequence number of the table.
+        routingMap (dict[int, RoutingMapEntry]): The table to send.
+
+    Returns:
+        list[bytes]: The datagrams.
+
+    Raises:
+        OverflowError: If an identifier or a distance does not fit in 32 bits.
+    """
+    pairs = array("I")
+    for k, e in routingMap.items():
+        pairs.append(k)
+        pairs.append(e.dist if e.dist != DVR_logic.INFINITY else WIRE_INFINITY)
+    payload = DVR_snapshot.toBytes(pairs)
+    size = ROUTES_PER_DATAGRAM * 2 * pairs.itemsize
+    chunks = max(1, -(-len(payload) // size))
+    return [HEADER.pack(MAGIC, VERSION, senderId, seq, i, chunks) + payload[i * size:(i + 1) * size] for i in range(chunks)]
+
+def decodeTable(payloads: list[bytes]) -> dict[int, DVR_logic.RoutingMapEntry]:
+    """
+    Decodes the routes of the datagrams of a table, without their headers, back to a routing table.
+
+    Args:
+        payloads (list[bytes]): The routes of every datagram, in order.
+
+    Returns:
+        dict[int, RoutingMapEntry]: The routing table, with no next hops.
+    """
+    pairs = array("I")
+    for p in payloads:
+        pairs.frombytes(p)
+    if sys.byteorder != "little":
+        pairs.byteswap()
+    entry = DVR_logic.RoutingMapEntry
+    infinity = DVR_logic.INFINITY
+    it = iter(pairs)
+    return {k: entry(d if d != WIRE_INFINITY else infinity, None) for k, d in zip(it, it)}
+
+class UdpStats:
+    """
+    Represents the outcome of a convergence of routers exchanging their tables over UDP.
+
+    Attributes:
+        messages (int): The number of routing tables sent.
+        datagrams (int): The number of datagrams sent.
+        bytes (int): The bytes of the datagrams sent, headers included.
+        received (int): The number of routing tables received whole and processed with updateRoutes.
+        updates (int): The number of received tables that changed the receiver's table.
+        dropped (int): The number of datagrams discarded by the receivers: from a node that is no longer a neighbor,
+            older than the last table processed, or part of a table superseded before all its datagrams arrived.
+        lost (int): The number of datagrams sent but never received, dropped by the kernel or sent to a removed router.
+        resent (int): The number of tables sent again because a neighbor had not processed the latest one.
+        convergenceTime (float): The seconds from the start to the last routing table change.
+        activeTime (float): The seconds from the start to the last datagram.
+        wallTime (float): The seconds until the convergence was detected, including the quiet time.
+    """
+    def __init__(self):
+        """
+        Constructor to initialize empty statistics.
+        """
+        self.messages: int = 0
+        self.datagrams: int = 0
+        self.bytes: int = 0
+        self.received: int = 0
+        self.updates: int = 0
+        self.dropped: int = 0
+        self.lost: int = 0
+        self.resent: int = 0
+        self.convergenceTime: float = 0.0
+        self.activeTime: float = 0.0
+        self.wallTime: float = 0.0
+
+    def messagesPerSecond(self) -> float:
+        """
+        Returns the number of routing tables sent per second while the routers were active.
+
+        Returns:
+            float: The message rate.
+        """
+        return self.messages / self.activeTime if self.activeTime > 0 else 0.0
+
+    def bytesPerSecond(self) -> float:
+        """
+        Returns the number of bytes sent per second while the routers were active.
+
+        Returns:
+            float: The byte rate.
+        """
+        return self.bytes / self.activeTime if self.activeTime > 0 else 0.0
+
+    def toDict(self) -> dict:
+        """
+        Returns the statistics as a dictionary, suitable for JSON.
+
+        Returns:
+            dict: The statistics, with the rates.
+        """
+        return {**vars(self), "messagesPerSecond": self.messagesPerSecond(), "bytesPerSecond": self.bytesPerSecond()}
+
+    def __str__(self):
+        return (f"messages: {self.messages}, datagrams: {self.datagrams}, bytes: {self.bytes}, updates: {self.updates}, "
+                f"dropped: {self.dropped}, lost: {self.lost}, resent: {self.resent}, convergence time: {self.convergenceTime:.3f}s "
+                f"({self.messagesPerSecond():.0f} messages/s, {self.bytesPerSecond() / 1e6:.1f} MB/s)")
+
+class Router(asyncio.DatagramProtocol):
+    """
+    Represents a WebNode running as a router, with its own UDP socket on localhost.
+    Received tables are processed with WebNode.updateRoutes, as in updateNet. Whenever its table changes,
+    or its links change, the router sends its table to all its neighbors (triggered updates): the sending is
+    scheduled on the event loop, so the changes caused by all the datagrams read in the meantime are sent together.
+    A table larger than a datagram is split, and processed once all its datagrams have arrived.
+
+    Attributes:
+        node (WebNode): The node run by the router.
+        edges (list[EdgeMapEntry]): The links of the node.
+        neighbors (set[int]): The identifiers of the neighbors.
+        host (RouterHost): The host running the router.
+        transport (DatagramTransport): The socket of the router.
+        seq (int): The sequence number of the last table sent.
+        processed (dict[int, int]): The sequence number of the last table processed from every neighbor.
+    """
+    def __init__(self, node: DVR_logic.WebNode, edges: list[DVR_logic.EdgeMapEntry], host: 'RouterHost'):
+        """
+        Constructor to initialize a router, whose socket is opened by the host.
+
+        Args:
+            node (WebNode): The node run by the router.
+            edges (list[EdgeMapEntry]): The links of the node.
+            host (RouterHost): The host running the router.
+        """
+        self.node: DVR_logic.WebNode = node
+        self.edges: list[DVR_logic.EdgeMapEntry] = edges
+        self.neighbors: set[int] = {e.dst for e in edges}
+        self.host: RouterHost = host
+        self.transport: asyncio.DatagramTransport = None
+        self.seq: int = 0
+        self.processed: dict[int, int] = {}
+        #The sequence number and the datagrams received so far of the tables still incomplete, by sender
+        self.__partial: dict[int, tuple[int, list[bytes]]] = {}
+        self.__scheduled: bool = False
+
+    def connection_made(self, transport: asyncio.DatagramTransport):
+        self.transport = transport
+        try:
+            transport.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+        except OSError:
+            pass
+
+    def setEdges(self, edges: list[DVR_logic.EdgeMapEntry]):
+        """
+        Makes the node read its changed links, as makeNodesReadNet, then send its table.
+
+        Args:
+            edges (list[EdgeMapEntry]): The links of the node.
+        """
+        self.edges = edges
+        self.neighbors = {e.dst for e in edges}
+        #A node added again with the identifier of a removed neighbor starts its sequence numbers anew
+        for k in [k for k in self.processed if k not in self.neighbors]:
+            del self.processed[k]
+        for k in [k for k in self.__partial if k not in self.neighbors]:
+            del self.__partial[k]
+        version = self.node.getVersion()
+        self.node.readRoutes(edges)
+        if self.node.getVersion() != version:
+            self.host.changed()
+        self.triggerUpdate()
+
+    def triggerUpdate(self):
+        """
+        Schedules the sending of the table, unless it is already scheduled.
+        """
+        if not self.__scheduled:
+            self.__scheduled = True
+            self.host.scheduled += 1
+            loop = asyncio.get_running_loop()
+            if self.host.advertiseDelay > 0:
+                loop.call_later(self.host.advertiseDelay, self.advertise)
+            else:
+                loop.call_soon(self.advertise)
+
+    def advertise(self):
+        """
+        Sends the table to all the neighbors, with a new sequence number. In full mode it is encoded once for all of them.
+        """
+        host = self.host
+        self.__scheduled = False
+        host.scheduled -= 1
+        if self.transport == None or self.transport.is_closing():
+            return
+        self.seq += 1
+        id = self.node.getId()
+        ports = host.ports
+        mode = host.mode
+        shared = None
+        for e in self.edges:
+            port = ports.get(e.dst)
+            if port == None:
+                continue
+            if mode == DVR_logic.UPDATE_FULL:
+                if shared == None:
+                    shared = encodeTable(id, self.seq, self.node.getRoutingMap())
+                datagrams = shared
+            else:
+                datagrams = encodeTable(id, self.seq, self.node.advertise(e.dst, mode))
+            for d in datagrams:
+                self.transport.sendto(d, (LOCALHOST, port))
+                host.bytes += len(d)
+            host.datagrams += len(datagrams)
+            host.messages += 1
+        host.lastActivity = time.monotonic()
+
+    def datagram_received(self, data: bytes, addr):
+        host = self.host
+        host.datagramsReceived += 1
+        host.lastActivity = time.monotonic()
+        if len(data) < HEADER.size:
+            host.dropped += 1
+            return
+        magic, version, senderId, seq, index, chunks = HEADER.unpack_from(data)
+        #The link may have failed while the table was in flight
+        if magic != MAGIC or version != VERSION or index >= chunks or senderId not in self.neighbors or seq <= self.processed.get(senderId, 0):
+            host.dropped += 1
+            return
+
+        if chunks == 1:
+            payloads = [data[HEADER.size:]]
+        else:
+            partial = self.__partial.get(senderId)
+            if partial == None or partial[0] < seq:
+                if partial != None:
+                    host.dropped += sum(p != None for p in partial[1])
+                partial = self.__partial[senderId] = (seq, [None] * chunks)
+            elif partial[0] > seq:
+                host.dropped += 1
+                return
+            payloads = partial[1]
+            payloads[index] = data[HEADER.size:]
+            if None in payloads:
+                return
+            del self.__partial[senderId]
+
+        self.processed[senderId] = seq
+        host.received += 1
+        if self.node.updateRoutes(senderId, decodeTable(payloads), self.edges, host.maxDist):
+            host.updates += 1
+            host.changed()
+            self.triggerUpdate()
+
+    def close(self):
+        """
+        Closes the socket of the router.
+        """
+        if self.transport != None:
+            self.transport.close()
+
+class RouterHost:
+    """
+    Runs a set of routers in an asyncio event loop, and the commands sent to them by the controller.
+    Every worker process runs one; without processes, the controller's loop runs a single one for all the routers.
+
+    Attributes:
+        routers (dict[int, Router]): The routers of the host.
+        ports (dict[int, int]): The UDP port of every router of the network, including the ones of other hosts.
+        mode (int): The update mode of the tables sent.
+        maxDist (int): The longest route learned, see updateRoutes.
+        advertiseDelay (float): The seconds between a table change and its sending.
+        scheduled (int): The number of routers with a sending scheduled.
+        lastActivity (float): The time.monotonic() of the last datagram sent or received.
+        lastChange (float): The time.monotonic() of the last routing table change.
+        messages, datagrams, bytes, datagramsReceived, received, updates, dropped (int): The counters of the routers, see UdpStats.
+    """
+    #The counters summed by the controller
+    COUNTERS = ("messages", "datagrams", "bytes", "datagramsReceived", "received", "updates", "dropped")
+
+    def __init__(self, mode: int = DVR_logic.UPDATE_FULL, advertiseDelay: float = 0.0):
+        """
+        Constructor to initialize a host without routers.
+
+        Args:
+            mode (int): The update mode of the tables sent.
+            advertiseDelay (float): The seconds between a table change and its sending.
+        """
+        self.routers: dict[int, Router] = {}
+        self.ports: dict[int, int] = {}
+        self.mode: int = mode
+        self.maxDist: int = DVR_logic.INFINITY
+        self.advertiseDelay: float = advertiseDelay
+        self.scheduled: int = 0
+        self.lastActivity: float = 0.0
+        self.lastChange: float = 0.0
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+
+    def changed(self):
+        """
+        Records a routing table change.
+        """
+        self.lastChange = time.monotonic()
+
+    async def handle(self, command: str, arg=None):
+        """
+        Runs a command of the controller:
+
+        - "bind": creates the routers of (identifier, table encoded by DVR_parallel.encodeRoutes, (neighbor, weight) pairs)
+          triples, and returns the ports of their sockets;
+        - "ports": updates the ports of the network, None for a removed router;
+        - "links": sets the maximum distance and the links of the given routers, None to remove one;
+        - "advertise": makes the given routers send their tables;
+        - "status": returns the counters, the times and the number of sendings scheduled;
+        - "state": returns the last sequence number sent and processed by every router;
+        - "collect": returns the table of every router, encoded by DVR_parallel.encodeRoutes.
+
+        Args:
+            command (str): The command.
+            arg (Any): The argument of the command.
+
+        Returns:
+            Any: The result of the command, None for the commands without one.
+
+        Raises:
+            ValueError: If the command is not valid.
+        """
+        if command == "bind":
+            loop = asyncio.get_running_loop()
+            ports = {}
+            for id, routes, edges in arg:
+                node = DVR_logic.WebNode(id)
+                node.setRoutingMap(DVR_parallel.decodeRoutes(routes), copy=False)
+                router = Router(node, [DVR_logic.EdgeMapEntry(d, w) for d, w in edges], self)
+                transport, _ = await loop.create_datagram_endpoint(lambda: router, local_addr=(LOCALHOST, 0))
+                self.routers[id] = router
+                ports[id] = self.ports[id] = transport.get_extra_info("sockname")[1]
+            return ports
+        if command == "ports":
+            for id, port in arg.items():
+                if port == None:
+                    self.ports.pop(id, None)
+                else:
+                    self.ports[id] = port
+            return None
+        if command == "links":
+            links, self.maxDist = arg
+            for id, edges in links.items():
+                router = self.routers.get(id)
+                if router == None:
+                    continue
+                if edges == None:
+                    router.close()
+                    del self.routers[id]
+                else:
+                    router.setEdges([DVR_logic.EdgeMapEntry(d, w) for d, w in edges])
+            return None
+        if command == "advertise":
+            for id in arg:
+                if id in self.routers:
+                    self.routers[id].triggerUpdate()
+            return None
+        if command == "status":
+            return {**{name: getattr(self, name) for name in self.COUNTERS},
+                    "scheduled": self.scheduled, "lastActivity": self.lastActivity, "lastChange": self.lastChange}
+        if command == "state":
+            return {id: (r.seq, dict(r.processed)) for id, r in self.routers.items()}
+        if command == "collect":
+            return {id: DVR_parallel.encodeRoutes(r.node.getRoutingMap()) for id, r in self.routers.items()}
+        raise ValueError(f"Invalid command {command}")
+
+    def close(self):
+        """
+        Closes the sockets of all the routers.
+        """
+        for router in self.routers.values():
+            router.close()
+        self.routers = {}
+
+def hostWorker(conn, options: dict):
+    """
+    Body of a worker process: runs a RouterHost, with the commands read from the pipe to the controller.
+    Logging is disabled, since several processes cannot share the log file.
+
+    Args:
+        conn (Connection): The pipe to the controller.
+        options (dict): The arguments of the RouterHost.
+    """
+    DVR_log.setLogLevel(DVR_log.LOG_OFF)
+    asyncio.run(serveHost(conn, options))
+
+async def serveHost(conn, options: dict):
+    """
+    Runs a RouterHost in the event loop of a worker process, until the controller sends "stop".
+    Every reply is an (exception, result) pair.
+
+    Args:
+        conn (Connection): The pipe to the controller.
+        options (dict): The arguments of the RouterHost.
+    """
+    host = RouterHost(**options)
+    loop = asyncio.get_running_loop()
+    stopped = loop.create_future()
+
+    def reply(task: asyncio.Task):
+        error = task.exception()
+        conn.send((error, None) if error != None else (None, task.result()))
+
+    def readable():
+        command, arg = conn.recv()
+        if command == "stop":
+            loop.remove_reader(conn.fileno())
+            stopped.set_result(None)
+        else:
+            loop.create_task(host.handle(command, arg)).add_done_callback(reply)
+
+    loop.add_reader(conn.fileno(), readable)
+    try:
+        await stopped
+    finally:
+        host.close()
+        conn.close()
+
+class HostProxy:
+    """
+    Represents a RouterHost as seen by the controller: run in the controller's own event loop,
+    or in a worker process reached through a pipe.
+    """
+    def __init__(self, options: dict, process: bool):
+        """
+        Constructor to initialize the host, starting its process if requested.
+
+        Args:
+            options (dict): The arguments of the RouterHost.
+            process (bool): Whether to run the host in a worker process.
+        """
+        self.__host: RouterHost = None
+        self.__conn = None
+        self.__proc = None
+        if process:
+            ctx = multiprocessing.get_context()
+            self.__conn, child = ctx.Pipe()
+            self.__proc = ctx.Process(target=hostWorker, args=(child, options), daemon=True)
+            self.__proc.start()
+            child.close()
+        else:
+            self.__host = RouterHost(**options)
+
+    async def call(self, command: str, arg=None):
+        """
+        Runs a command on the host, see RouterHost.handle. A host runs one command at a time.
+
+        Args:
+            command (str): The command.
+            arg (Any): The argument of the command.
+
+        Returns:
+            Any: The result of the command.
+        """
+        if self.__host != None:
+            return await self.__host.handle(command, arg)
+        self.__conn.send((command, arg))
+        error, result = await asyncio.get_running_loop().run_in_executor(None, self.__conn.recv)
+        if error != None:
+            raise error
+        return result
+
+    async def close(self):
+        """
+        Closes the routers of the host, and stops its process.
+        """
+        if self.__host != None:
+            self.__host.close()
+            return
+        self.__conn.send(("stop", None))
+        self.__conn.close()
+        await asyncio.get_running_loop().run_in_executor(None, self.__proc.join)
+
+class UdpNetwork:
+    """
+    Runs a network as routers exchanging their tables over localhost UDP, and acts as their controller:
+    it starts the routers from the nodes and edges of the network, applies topology changes to the EdgesMap
+    and sends the new links to the routers involved, detects the convergence and collects the tables.
+    The routers run in the controller's event loop, or split among worker processes as in updateNetParallel.
+
+    The network has converged when no router has a sending scheduled, no datagram was sent for quietTime
+    seconds, and every router processed the last table sent by each of its neighbors; the tables lost
+    by UDP are sent again until then. Used as an asynchronous context manager, it is started and closed with the block.
+
+    Attributes:
+        NodeList (NodeRegistry): The nodes of the network. Their tables are the ones the routers start from,
+            and are replaced by the routers' ones by collect.
+        NetManager (EdgesMap): The network's edge manager.
+        processes (int): The number of worker processes, 0 to run the routers in the controller's loop.
+        mode (int): The update mode of the tables sent.
+        quietTime (float): The seconds without datagrams after which the convergence is checked.
+    """
+    def __init__(self, NodeList: list[DVR_logic.WebNode], NetManager: DVR_logic.EdgesMap, processes: int = 0,
+                 mode: int = None, advertiseDelay: float = 0.0, quietTime: float = QUIET_TIME):
+        """
+        Constructor to initialize the controller, without starting the routers.
+
+        Args:
+            NodeList (list[WebNode]): The nodes of the network.
+            NetManager (EdgesMap): The network's edge manager.
+            processes (int): The number of worker processes, 0 to run the routers in the controller's loop.
+            mode (int): The update mode, by default the one set with setUpdateMode.
+            advertiseDelay (float): The seconds between a table change and its sending.
+            quietTime (float): The seconds without datagrams after which the convergence is checked.
+        """
+        self.NodeList: DVR_logic.NodeRegistry = DVR_logic.asRegistry(NodeList)
+        self.NetManager: DVR_logic.EdgesMap = NetManager
+        self.processes: int = processes
+        self.mode: int = mode if mode != None else DVR_logic.updateMode
+        self.quietTime: float = quietTime
+        self.__options: dict = {"mode": self.mode, "advertiseDelay": advertiseDelay}
+        self.__hosts: list[HostProxy] = []
+        self.__owner: dict[int, int] = {}
+        #The time and the counters of the first topology change not yet converged
+        self.__since: float = None
+        self.__before: dict = None
+
+    async def __aenter__(self) -> 'UdpNetwork':
+        await self.start()
+        return self
+
+    async def __aexit__(self, excType, exc, tb):
+        await self.close()
+        return False
+
+    def __maxDist(self) -> int:
+        """
+        Returns the longest route learned, as in ConvergenceEngine.
+        """
+        return self.NetManager.getDistanceBound()
+
+    async def __broadcast(self, command: str, arg=None) -> list:
+        """
+        Runs a command on all the hosts at the same time.
+        """
+        return await asyncio.gather(*(h.call(command, arg) for h in self.__hosts))
+
+    async def start(self):
+        """
+        Starts the hosts and their routers, one for every node, with the node's table and links.
+        No table is sent until converge, or a topology change.
+        """
+        parts = DVR_parallel.splitNodes(self.NetManager, max(self.processes, 1))
+        self.__hosts = [HostProxy(self.__options, self.processes > 0) for _ in parts]
+        binds = []
+        for p, ids in enumerate(parts):
+            binds.append([])
+            for id in ids:
+                self.__owner[id] = p
+                node = self.NodeList.get(id)
+                routes = DVR_parallel.encodeRoutes(node.getRoutingMap()) if node != None else {}
+                binds[p].append((id, routes, [(e.dst, e.w) for e in self.NetManager.getEdges(id)]))
+        ports = {}
+        for result in await asyncio.gather(*(h.call("bind", b) for h, b in zip(self.__hosts, binds))):
+            ports.update(result)
+        await self.__broadcast("ports", ports)
+        await self.__broadcast("links", ({}, self.__maxDist()))
+
+    async def close(self):
+        """
+        Closes the routers and stops the hosts.
+        """
+        await asyncio.gather(*(h.close() for h in self.__hosts))
+        self.__hosts = []
+        self.__owner = {}
+
+    async def __links(self, nodesId: list[int], removedId: int = None):
+        """
+        Sends the links of the given nodes to their routers, and the new maximum distance to all the routers.
+        """
+        if self.__since == None:
+            self.__since = time.monotonic()
+            self.__before = await self.__status()
+        links = [{} for _ in self.__hosts]
+        for id in nodesId:
+            if id in self.__owner:
+                links[self.__owner[id]][id] = [(e.dst, e.w) for e in self.NetManager.getEdges(id)]
+        if removedId != None:
+            links[self.__owner.pop(removedId)][removedId] = None
+        maxDist = self.__maxDist()
+        await asyncio.gather(*(h.call("links", (l, maxDist)) for h, l in zip(self.__hosts, links)))
+
+    async def addNode(self, nodeId: int):
+        """
+        Adds a node to the network, with a new router on the host with the fewest.
+
+        Args:
+            nodeId (int): The identifier of the node.
+        """
+        node = self.NetManager.addNode(nodeId)
+        if node == None:
+            return
+        self.NodeList.append(node)
+        counts = [0] * len(self.__hosts)
+        for p in self.__owner.values():
+            counts[p] += 1
+        p = counts.index(min(counts))
+        self.__owner[nodeId] = p
+        ports = await self.__hosts[p].call("bind", [(nodeId, {}, [])])
+        await self.__broadcast("ports", ports)
+
+    async def removeNode(self, nodeId: int):
+        """
+        Removes a node from the network, closing its router; its neighbors read their links.
+
+        Args:
+            nodeId (int): The identifier of the node.
+        """
+        if not self.NetManager.doExistsNode(nodeId):
+            return
+        neighbors = self.NetManager.getNeighborsId(nodeId)
+        self.NetManager.removeNode(nodeId, self.NodeList)
+        await self.__links(neighbors, nodeId)
+        await self.__broadcast("ports", {nodeId: None})
+
+    async def addEdge(self, srcId: int, dstId: int, weight: int):
+        """
+        Adds an edge to the network; its ends read their links.
+
+        Args:
+            srcId (int): The identifier of one end.
+            dstId (int): The identifier of the other end.
+            weight (int): The weight of the edge.
+        """
+        if self.NetManager.doExistsEdge(srcId, dstId):
+            return
+        self.NetManager.addEdge(srcId, dstId, weight, self.NodeList)
+        if self.NetManager.doExistsEdge(srcId, dstId):
+            await self.__links([srcId, dstId])
+
+    async def removeEdge(self, srcId: int, dstId: int):
+        """
+        Removes an edge from the network; its ends read their links.
+
+        Args:
+            srcId (int): The identifier of one end.
+            dstId (int): The identifier of the other end.
+        """
+        if not self.NetManager.doExistsEdge(srcId, dstId):
+            return
+        self.NetManager.removeEdge(srcId, dstId, self.NodeList)
+        await self.__links([srcId, dstId])
+
+    async def __status(self) -> dict:
+        """
+        Returns the counters of all the hosts summed, the latest times and the number of sendings scheduled.
+        """
+        total = {name: 0 for name in RouterHost.COUNTERS}
+        total.update(scheduled=0, lastActivity=0.0, lastChange=0.0)
+        for status in await self.__broadcast("status"):
+            for name in RouterHost.COUNTERS + ("scheduled",):
+                total[name] += status[name]
+            total["lastActivity"] = max(total["lastActivity"], status["lastActivity"])
+            total["lastChange"] = max(total["lastChange"], status["lastChange"])
+        return total
+
+    async def __stale(self) -> list[int]:
+        """
+        Returns the routers whose last table was not processed by some neighbor.
+        """
+        state = {}
+        for s in await self.__broadcast("state"):
+            state.update(s)
+        stale = []
+        for id, (seq, _) in state.items():
+            if seq > 0 and any(nb in state and state[nb][1].get(id, 0) != seq for nb in self.NetManager.getNeighborsId(id)):
+                stale.append(id)
+        return stale
+
+    async def __advertise(self, nodesId: list[int]):
+        """
+        Makes the routers of the given nodes send their tables.
+        """
+        ids = [[] for _ in self.__hosts]
+        for id in nodesId:
+            if id in self.__owner:
+                ids[self.__owner[id]].append(id)
+        await asyncio.gather(*(h.call("advertise", i) for h, i in zip(self.__hosts, ids)))
+
+    async def converge(self, priorityNodesId: list[int] = None) -> UdpStats:
+        """
+        Makes the given routers send their tables, as updateNet, and waits for the network to converge.
+        The time and the traffic are measured from the first topology change since the last convergence, if any.
+
+        Args:
+            priorityNodesId (list[int], optional): The nodes that send their tables first.
+
+        Returns:
+            UdpStats: The traffic and the time of the convergence.
+        """
+        if self.__since == None:
+            self.__since = time.monotonic()
+            self.__before = await self.__status()
+        start, before = self.__since, self.__before
+        stats = UdpStats()
+        await self.__advertise(priorityNodesId or [])
+        while True:
+            await asyncio.sleep(self.quietTime / 4)
+            status = await self.__status()
+            if status["scheduled"] > 0 or time.monotonic() - status["lastActivity"] < self.quietTime:
+                continue
+            stale = await self.__stale()
+            if not stale:
+                break
+            stats.resent += len(stale)
+            await self.__advertise(stale)
+        self.__since = None
+
+        for name in ("messages", "datagrams", "bytes", "received", "updates", "dropped"):
+            setattr(stats, name, status[name] - before[name])
+        stats.lost = stats.datagrams - (status["datagramsReceived"] - before["datagramsReceived"])
+        stats.convergenceTime = max(0.0, status["lastChange"] - start)
+        stats.activeTime = max(0.0, status["lastActivity"] - start)
+        stats.wallTime = time.monotonic() - start
+        return stats
+
+    async def collect(self):
+        """
+        Replaces the tables of the nodes with the ones of their routers.
+        """
+        for tables in await self.__broadcast("collect"):
+            for id, routes in tables.items():
+                node = self.NodeList.get(id)
+                if node != None:
+                    node.setRoutingMap(DVR_parallel.decodeRoutes(routes), copy=False)
+
+def updateNetUdp(NodeList: list[DVR_logic.WebNode], NetManager: DVR_logic.EdgesMap, priorityNodesId: list[int], processes: int = 0,
+                 mode: int = None, advertiseDelay: float = 0.0) -> UdpStats:
+    """
+    Updates the network's routing tables like updateNet, with the nodes running as routers over localhost UDP,
+    and copies the converged tables back to the nodes. It runs its own event loop, so it cannot be called from a running one.
+
+    Args:
+        NodeList (list[WebNode]): The list of WebNodes in the network.
+        NetManager (EdgesMap): The network's edge manager.
+        priorityNodesId (list[int]): The list of node identifiers to process first.
+        processes (int): The number of worker processes, 0 to run the routers in the calling process.
+        mode (int): The update mode, by default the one set with setUpdateMode.
+        advertiseDelay (float): The seconds between a table change and its sending.
+
+    Returns:
+        UdpStats: The traffic and the time of the convergence.
+    """
+    async def run() -> UdpStats:
+        async with UdpNetwork(NodeList, NetManager, processes, mode, advertiseDelay) as network:
+            stats = await network.converge(priorityNodesId)
+            await network.collect()
+            return stats
+    return asyncio.run(run())
+
+def distancesOf(NodeList: list[DVR_logic.WebNode]) -> dict[int, dict[int, int]]:
+    """
+    Returns the distances of the routing tables of all the nodes.
+    """
+    return {n.getId(): {k: e.dist for k, e in n.getRoutingMap().items()} for n in NodeList}
+
+async def benchmarkUdp(side: int, failure: tuple[int, int], processes: int, mode: int, advertiseDelay: float) -> tuple[list[UdpStats], dict, int]:
+    """
+    Converges a grid over UDP, then again after the failure of an edge, as main does with updateNet.
+    Returns the statistics of the two convergences, the distances after the first one and the number
+    of routes that are not the shortest after the second one.
+    """
+    NodeList, NetManager = DVR_parallel.buildGrid(side)
+    results = []
+    async with UdpNetwork(NodeList, NetManager, processes, mode, advertiseDelay) as network:
+        results.append(await network.converge(NetManager.getNodesId()))
+        await network.collect()
+        distances = distancesOf(NodeList)
+        await network.removeEdge(*failure)
+        results.append(await network.converge())
+        await network.collect()
+    return results, distances, len(DVR_verify.ShortestPathOracle(NetManager).verify(NodeList))
+
+def main():
+    """
+    Benchmarks the routers over UDP against updateNet on a grid: the first convergence, starting from the tables
+    the nodes get by reading their own edges, then the one after the failure of an edge in the middle.
+    Prints the traffic and the convergence time, and checks that the first convergence reaches the same distances.
+    After a failure the tables of this protocol depend on the order of the messages, so for both the routes
+    that are not the shortest are counted instead.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark of distance vector routers over localhost UDP against updateNet")
+    parser.add_argument("--side", type=int, default=10, help="side of the grid (default: 10, that is 100 routers)")
+    parser.add_argument("--processes", type=int, default=0, help="number of worker processes, 0 to run all the routers in one event loop (default: 0)")
+    parser.add_argument("--update-mode", choices=DVR_logic.UPDATE_MODES, default="full", help="routing tables sent to the neighbors (default: full)")
+    parser.add_argument("--advertise-delay", type=float, default=0.0, help="seconds between a table change and its sending (default: 0)")
+    args = parser.parse_args()
+
+    DVR_log.setLogLevel(DVR_log.LOG_OFF)
+    mode = DVR_logic.UPDATE_MODES[args.update_mode]
+    middle = args.side * (args.side // 2) + args.side // 2 - 1
+    failure = (middle, middle + 1)
+
+    NodeList, NetManager = DVR_parallel.buildGrid(args.side)
+    start = time.perf_counter()
+    stats = DVR_logic.updateNet(NodeList, NetManager, NetManager.getNodesId(), mode)
+    print(f"{'updateNet':>10}: {time.perf_counter() - start:8.3f}s  {stats}")
+    expected = distancesOf(NodeList)
+    NetManager.removeEdge(*failure, NodeList)
+    start = time.perf_counter()
+    stats = DVR_logic.updateNet(NodeList, NetManager, list(failure), mode)
+    print(f"{'failure':>10}: {time.perf_counter() - start:8.3f}s  {stats}")
+    errors = len(DVR_verify.ShortestPathOracle(NetManager).verify(NodeList))
+
+    results, distances, udpErrors = asyncio.run(benchmarkUdp(args.side, failure, args.processes, mode, args.advertise_delay))
+    for name, stats in zip(("udp", "failure"), results):
+        print(f"{name:>10}: {stats.convergenceTime:8.3f}s  {stats}")
+    print(f"same distances: {distances == expected}")
+    print(f"routes not the shortest after the failure: {errors} with updateNet, {udpErrors} over UDP")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+import argparse
+import heapq
+import multiprocessing
+import os
+import random
+import sys
+import DVR_log
+import DVR_logic
+import DVR_run
+
+#Fewer sources than this are computed in the calling process, where the cost of the processes is not worth it
+MIN_PARALLEL_SOURCES = 200
+
+#Changes that once left wrong routing tables, as batches of scenario commands (see DVR_run.COMMANDS) on nodes 1 to 9
+REGRESSIONS = [
+    #A route removed after a failure was not learned again from a neighbor that did not change
+    [[("remove-edge", [7, 1])], [("edge", [9, 8, 7])], [("remove-node", [5])], [("edge", [4, 6, 3])], [("edge", [2, 6, 5])],
+     [("remove-node", [3])], [("edge", [1, 8, 6])], [("edge", [1, 4, 7])], [("edge", [8, 2, 9])], [("edge", [9, 7, 5])],
+     [("edge", [7, 1, 2])], [("remove-edge", [6, 8])], [("remove-edge", [8, 9])]],
+    #A stale route to a removed node was kept
+    [[("edge", [4, 7, 4])], [("edge", [2, 7, 8])], [("edge", [1, 6, 10])], [("edge", [2, 5, 5])], [("remove-edge", [4, 7])],
+     [("remove-edge", [7, 1])], [("edge", [7, 6, 5])], [("edge", [7, 1, 1])], [("edge", [3, 5, 5])], [("edge", [3, 4, 2])],
+     [("remove-edge", [6, 7])], [("remove-edge", [3, 5])], [("remove-edge", [1, 6])], [("edge", [5, 7, 1])], [("remove-node", [7])]],
+]
+
+def dijkstra(adjacency: dict[int, list[tuple[int, int]]], start: int) -> dict[int, int]:
+    """
+    Computes the shortest distances from a node to all the nodes it can reach.
+
+    Args:
+        adjacency (dict[int, list[tuple[int, int]]]): The (neighbor, weight) pairs of every node.
+        start (int): The identifier of the source node.
+
+    Returns:
+        dict[int, int]: The distance of every reachable node, including the source at distance 0.
+    """
+    distances = {start: 0}
+    queue = [(0, start)]
+    while queue:
+        dist, node = heapq.heappop(queue)
+        if dist > distances[node]:
+            continue
+        for nb, w in adjacency[node]:
+            candidate = dist + w
+            if candidate < distances.get(nb, candidate + 1):
+                distances[nb] = candidate
+                heapq.heappush(queue, (candidate, nb))
+    return distances
+
+#The adjacency of the network, set in every worker process by initWorker
+workerAdjacency: dict[int, list[tuple[int, int]]] = None
+
+def initWorker(adjacency: dict[int, list[tuple[int, int]]]):
+    """
+    Initializes a worker process with the adjacency of the network, sent once instead of with every task.
+    """
+    global workerAdjacency
+    workerAdjacency = adjacency
+
+def dijkstraBatch(sourcesId: list[int]) -> list[tuple[int, dict[int, int]]]:
+    """
+    Body of a worker task: computes the distances from several sources.
+    """
+    return [(s, dijkstra(workerAdjacency, s)) for s in sourcesId]
+
+class RouteError:
+    """
+    Represents a routing table entry that does not match the shortest paths of the network.
+
+    Attributes:
+        nodeId (int): The identifier of the node owning the routing table.
+        dstId (int): The identifier of the destination.
+        kind (str): "wrong" if the distance is not the shortest one, "missing" if a reachable destination has no route,
+            "unreachable" if there is a route to a destination that cannot be reached, "next hop" if the next hop
+            is not a neighbor through which the destination is at the given distance.
+        expected (int): The shortest distance, None if the destination is unreachable.
+        actual (RoutingMapEntry): The entry of the routing table, None if missing.
+    """
+    def __init__(self, nodeId: int, dstId: int, kind: str, expected: int, actual: DVR_logic.RoutingMapEntry):
+        """
+        Constructor to initialize a routing error.
+
+        Args:
+            nodeId (int): The identifier of the node owning the routing table.
+            dstId (int): The identifier of the destination.
+            kind (str): The kind of error.
+            expected (int): The shortest distance, None if the destination is unreachable.
+            actual (RoutingMapEntry): The entry of the routing table, None if missing.
+        """
+        self.nodeId: int = nodeId
+        self.dstId: int = dstId
+        self.kind: str = kind
+        self.expected: int = expected
+        self.actual: DVR_logic.RoutingMapEntry = actual
+
+    def __str__(self):
+        actual = f"w:{self.actual.dist}, nh:{self.actual.nextHop}" if self.actual != None else "no route"
+        expected = f"w:{self.expected}" if self.expected != None else "unreachable"
+        return f"{self.nodeId} -> {self.dstId} is {self.kind}: {actual}, expected {expected}"
+
+class ShortestPathOracle:
+    """
+    Verifies routing tables against the shortest paths of the network.
+    The distances from each source are computed once, with Dijkstra, and cached. The oracle listens to the
+    EdgesMap, and a change only invalidates the sources whose distances it can affect:
+    an added edge that shortens a path from them, a removed edge that lies on a shortest path from them,
+    or a removed node they could reach.
+
+    Attributes:
+        NetManager (EdgesMap): The network's edge manager.
+        workers (int): The number of processes computing missing sources, 1 to compute them in the calling process.
+        computed (int): The number of sources computed so far.
+        invalidated (int): The number of cached sources invalidated so far.
+    """
+    def __init__(self, NetManager: DVR_logic.EdgesMap, workers: int = 1):
+        """
+        Constructor to initialize an empty oracle, listening to the changes of the network.
+
+        Args:
+            NetManager (EdgesMap): The network's edge manager.
+            workers (int): The number of processes computing missing sources, None for the number of CPUs.
+        """
+        self.NetManager: DVR_logic.EdgesMap = NetManager
+        self.workers: int = workers if workers != None else (os.cpu_count() or 1)
+        self.computed: int = 0
+        self.invalidated: int = 0
+        self.__cache: dict[int, dict[int, int]] = {}
+        NetManager.addListener(self.onChange)
+
+    def close(self):
+        """
+        Stops listening to the network and empties the cache.
+        """
+        self.NetManager.removeListener(self.onChange)
+        self.__cache = {}
+
+    def cachedSources(self) -> list[int]:
+        """
+        Returns the sources whose distances are cached.
+
+        Returns:
+            list[int]: The identifiers of the sources.
+        """
+        return list(self.__cache.keys())
+
+    def onChange(self, operation: str, srcId: int, dstId: int = None, weight: int = None):
+        """
+        Invalidates the cached sources affected by a change of the network. Called by the EdgesMap.
+
+        Args:
+            operation (str): "addNode", "removeNode", "addEdge", "removeEdge" or "loadMap", which replaces the whole network.
+            srcId (int): The identifier of the node, or of one end of the edge.
+            dstId (int): The identifier of the other end of the edge.
+            weight (int): The weight of the edge.
+        """
+        if operation == "addNode":
+            return
+        if operation == "loadMap":
+            self.invalidated += len(self.__cache)
+            self.__cache = {}
+            return
+        stale = []
+        for s, distances in self.__cache.items():
+            a, b = distances.get(srcId), distances.get(dstId)
+            if operation == "removeNode":
+                affected = a != None
+            elif operation == "addEdge":
+                affected = (a != None and (b == None or a + weight < b)) or (b != None and (a == None or b + weight < a))
+            else:
+                affected = a != None and b != None and abs(a - b) == weight
+            if affected:
+                stale.append(s)
+        if operation == "removeNode" and srcId in self.__cache:
+            stale.append(srcId)
+        for s in stale:
+            self.__cache.pop(s, None)
+        self.invalidated += len(stale)
+
+    def adjacency(self) -> dict[int, list[tuple[int, int]]]:
+        """
+        Returns the (neighbor, weight) pairs of every node, the format used by dijkstra.
+
+        Returns:
+            dict[int, list[tuple[int, int]]]: The adjacency of the network.
+        """
+        return {id: [(e.dst, e.w) for e in self.NetManager.getEdges(id)] for id in self.NetManager.getNodesId()}
+
+    def prepare(self, sourcesId: list[int]):
+        """
+        Computes the distances from the given sources that are not cached yet, in parallel
+        when there are at least MIN_PARALLEL_SOURCES of them and more than one worker.
+
+        Args:
+            sourcesId (list[int]): The identifiers of the sources.
+        """
+        missing = [s for s in sourcesId if s not in self.__cache and self.NetManager.doExistsNode(s)]
+        if not missing:
+            return
+        adjacency = self.adjacency()
+        if self.workers <= 1 or len(missing) < MIN_PARALLEL_SOURCES:
+            for s in missing:
+                self.__cache[s] = dijkstra(adjacency, s)
+        else:
+            size = -(-len(missing) // (self.workers * 4))
+            batches = [missing[i:i + size] for i in range(0, len(missing), size)]
+            with multiprocessing.get_context().Pool(self.workers, initializer=initWorker, initargs=(adjacency,)) as pool:
+                for results in pool.imap_unordered(dijkstraBatch, batches):
+                    self.__cache.update(results)
+        self.computed += len(missing)
+
+    def distances(self, sourceId: int) -> dict[int, int]:
+        """
+        Returns the shortest distances from a source, computing them if they are not cached.
+
+        Args:
+            sourceId (int): The identifier of the source.
+
+        Returns:
+            dict[int, int]: The distance of every reachable node, including the source at distance 0.
+        """
+        self.prepare([sourceId])
+        return self.__cache[sourceId]
+
+    def distance(self, srcId: int, dstId: int) -> int:
+        """
+        Returns the shortest distance between two nodes.
+
+        Args:
+            srcId (int): The identifier of the source.
+            dstId (int): The identifier of the destination.
+
+        Returns:
+            int: The distance, None if the destination is unreachable.
+        """
+        return self.distances(srcId).get(dstId)
+
+    def verifyNode(self, node: DVR_logic.WebNode, checkNextHop: bool = False) -> list[RouteError]:
+        """
+        Compares the routing table of a node with the shortest distances from it.
+
+        Args:
+            node (WebNode): The node to verify.
+            checkNextHop (bool): Whether to check that every next hop is a neighbor through which
+                the destination is at the given distance. It needs the distances from the neighbors too.
+
+        Returns:
+            list[RouteError]: The wrong, missing, unreachable and next hop errors of the table.
+        """
+        id = node.getId()
+        expected = self.distances(id)
+        routingMap = node.getRoutingMap()
+        errors = []
+        for k, route in routingMap.items():
+            dist = expected.get(k)
+            if dist == None:
+                errors.append(RouteError(id, k, "unreachable", None, route))
+            elif route.dist != dist:
+                errors.append(RouteError(id, k, "wrong", dist, route))
+            elif checkNextHop:
+                edge = self.NetManager.getEdge(id, route.nextHop)
+                rest = self.distance(route.nextHop, k) if edge != None else None
+                if rest == None or edge.w + rest != dist:
+                    errors.append(RouteError(id, k, "next hop", dist, route))
+        for k, dist in expected.items():
+            if k != id and k not in routingMap:
+                errors.append(RouteError(id, k, "missing", dist, None))
+        return errors
+
+    def verify(self, NodeList: list[DVR_logic.WebNode], checkNextHop: bool = False) -> list[RouteError]:
+        """
+        Compares the routing tables of the given nodes with the shortest paths of the network.
+        The missing sources are computed first, all together, so that they can be computed in parallel.
+
+        Args:
+            NodeList (list[WebNode]): The nodes to verify.
+            checkNextHop (bool): Whether to check the next hops too, see verifyNode.
+
+        Returns:
+            list[RouteError]: The errors of all the routing tables.
+        """
+        nodes = list(NodeList)
+        sources = [n.getId() for n in nodes]
+        if checkNextHop:
+            sources = list(dict.fromkeys(sources + [nb for n in nodes for nb in self.NetManager.getNeighborsId(n.getId())]))
+        self.prepare(sources)
+        errors = []
+        for node in nodes:
+            errors += self.verifyNode(node, checkNextHop)
+        return errors
+
+def checkChanges(batches: list[list[tuple[str, list[int]]]], nodes: int = 9, mode: int = None, checkNextHop: bool = True) -> tuple[int, list[RouteError]]:
+    """
+    Builds a network of nodes 1 to nodes, without edges, applies each batch of scenario commands in a single
+    EdgesMap transaction, so that the network converges after it, and verifies all the routing tables after every batch.
+
+    Args:
+        batches (list[list[tuple[str, list[int]]]]): The batches of commands, see DVR_run.applyEvent.
+        nodes (int): The number of nodes of the network.
+        mode (int, optional): The update mode, by default the one set with setUpdateMode.
+        checkNextHop (bool): Whether to check the next hops too, see ShortestPathOracle.verifyNode.
+
+    Returns:
+        tuple[int, list[RouteError]]: The index of the first batch after which a table is wrong and its errors,
+        or None and an empty list if all the tables are right after every batch.
+    """
+    previous = DVR_logic.updateMode
+    if mode != None:
+        DVR_logic.setUpdateMode(mode)
+    try:
+        NodeList = DVR_logic.NodeRegistry()
+        NetManager = DVR_logic.EdgesMap()
+        for id in range(1, nodes + 1):
+            NodeList.append(NetManager.addNode(id))
+        oracle = ShortestPathOracle(NetManager)
+        for i, batch in enumerate(batches):
+            with NetManager.transaction(NodeList):
+                for command, args in batch:
+                    DVR_run.applyEvent(command, args, NodeList, NetManager)
+            errors = oracle.verify(NodeList, checkNextHop)
+            if errors:
+                return i, errors
+        return None, []
+    finally:
+        DVR_logic.setUpdateMode(previous)
+
+def randomChanges(rng: random.Random, nodes: int, batches: int) -> list[list[tuple[str, list[int]]]]:
+    """
+    Returns random batches of one to three scenario commands on nodes 1 to nodes: mostly edges added, with weights
+    from 1 to 20, or removed, and sometimes nodes removed, whose identifiers are added again by later edges.
+
+    Args:
+        rng (random.Random): The generator of the changes.
+        nodes (int): The number of nodes.
+        batches (int): The number of batches.
+
+    Returns:
+        list[list[tuple[str, list[int]]]]: The batches of commands.
+    """
+    changes = []
+    for _ in range(batches):
+        batch = []
+        for _ in range(rng.randint(1, 3)):
+            src, dst = rng.sample(range(1, nodes + 1), 2)
+            r = rng.random()
+            if r < 0.55:
+                batch.append(("edge", [src, dst, rng.randint(1, 20)]))
+            elif r < 0.9:
+                batch.append(("remove-edge", [src, dst]))
+            else:
+                batch.append(("remove-node", [src]))
+        changes.append(batch)
+    return changes
+
+def main():
+    """
+    Checks the convergence against the shortest paths: replays the REGRESSIONS and random changes of small networks
+    in every update mode, and exits with status 1 if any routing table is wrong.
+    """
+    parser = argparse.ArgumentParser(description="Check of the routing tables against the shortest paths after random changes")
+    parser.add_argument("--trials", type=int, default=300, help="random networks checked in each update mode (default: 300)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first random network")
+    parser.add_argument("--update-mode", choices=DVR_logic.UPDATE_MODES, default=None, help="update mode checked (default: all)")
+    parser.add_argument("--no-next-hop", action="store_true", help="check only the distances, not the next hops")
+    args = parser.parse_args()
+
+    DVR_log.setLogLevel(DVR_log.LOG_OFF)
+    modes = [args.update_mode] if args.update_mode != None else list(DVR_logic.UPDATE_MODES)
+    failed = 0
+    for name in modes:
+        mode = DVR_logic.UPDATE_MODES[name]
+        cases = [(f"regression {i}", 9, batches) for i, batches in enumerate(REGRESSIONS)]
+        for trial in range(args.seed, args.seed + args.trials):
+            rng = random.Random(trial)
+            nodes = rng.randint(5, 14)
+            cases.append((f"seed {trial}", nodes, randomChanges(rng, nodes, rng.randint(5, 40))))
+        errors = 0
+        for case, nodes, batches in cases:
+            batch, caseErrors = checkChanges(batches, nodes, mode, not args.no_next_hop)
+            if caseErrors:
+                errors += 1
+                print(f"{name}, {case}, after batch {batch}: {'; '.join(map(str, caseErrors[:3]))}", file=sys.stderr)
+        print(f"{name}: {len(cases) - errors} of {len(cases)} networks right")
+        failed += errors
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,189 @@
+import math
+import queue
+import threading
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import filedialog, messagebox, ttk
+import DVR_export
 import DVR_logic
+import DVR_log
+import DVR_run
+import DVR_snapshot
+import DVR_spatial
+import DVR_verify
+
+#Radius of the nodes, in pixels at zoom 1
+NODE_RADIUS = 10
+
+#Zoom below which the identifiers of the nodes and the weights of the edges are not drawn
+LABEL_SCALE = 0.6
+
+#Zoom limits
+MIN_SCALE = 0.02
+MAX_SCALE = 4.0
+
+#Number of canvas items created by a redraw before letting Tk handle the events
+DRAW_BATCH = 2000
 
 class VisualObject:
     """
     Represents a visual object on the canvas, such as a node or an edge.
     VisualObject instances are used in dictionaries, assosiating the object's identifier with its representation.
+    Only the objects in view are drawn: the others keep their position and label, without canvas items.
     
     Attributes:
-        shape (int): The shape identifier on the canvas.
-        text (int): The text identifier on the canvas.
-        x (float): The x-coordinate of the object on the canvas.
-        y (float): The y-coordinate of the object on the canvas.
+        shape (int): The shape identifier on the canvas, None if the object is not drawn.
+        text (int): The text identifier on the canvas, None if the object or its text is not drawn.
+        x (float): The x-coordinate of the object in the network, which is the canvas one at zoom 1.
+        y (float): The y-coordinate of the object in the network, which is the canvas one at zoom 1.
+        label (str): The text of the object.
     """
-    def __init__(self, shape: int, text: int, x: float, y: float):
+    def __init__(self, shape: int, text: int, x: float, y: float, label: str = ""):
         """
         Initializes the visual representation of an object.
         
         Args:
             shape (int): The shape identifier on the canvas.
             text (int): The text identifier on the canvas.
-            x (float): The x-coordinate on the canvas.
-            y (float): The y-coordinate on the canvas.
+            x (float): The x-coordinate in the network.
+            y (float): The y-coordinate in the network.
+            label (str): The text of the object.
         """
         self.shape: int = shape
         self.text: int = text
         self.x: float = x
         self.y: float = y
+        self.label: str = label
+
+class ConvergenceWorker:
+    """
+    Applies the changes made in the GUI to the network, and makes it converge, on a background thread,
+    so that the window keeps responding during long convergences.
+    Changes are queued and applied in order, each followed by its updateNet as in the original GUI;
+    the results are put in a queue, read by the GUI on its own thread.
+    
+    A stopped convergence leaves its unprocessed nodes in the pending list: they are added to the priority
+    nodes of the next convergence, which completes the propagation. The changes queued when the convergence
+    was stopped are applied without converging, and their nodes become pending too.
+    
+    Attributes:
+        NodeList (NodeRegistry): The WebNodes in the network.
+        NetManager (EdgesMap): The network's edge manager.
+        edits (queue.Queue): The changes to apply, as tuples of an operation name and its arguments.
+        results (queue.Queue): The outcome of every change: its kind ("done", "stopped" or "error"), the change,
+            and the ConvergenceStats of its convergence (None if it did not converge) or the exception raised.
+        progress (ConvergenceStats): The statistics of the running convergence, None if nothing is running.
+        pending (list[int]): The nodes left by a stopped convergence.
+    """
+    def __init__(self, NodeList: DVR_logic.NodeRegistry, NetManager: DVR_logic.EdgesMap):
+        """
+        Constructor to initialize the worker and start its thread.
+        
+        Args:
+            NodeList (NodeRegistry): The WebNodes in the network.
+            NetManager (EdgesMap): The network's edge manager.
+        """
+        self.NodeList:DVR_logic.NodeRegistry = NodeList
+        self.NetManager:DVR_logic.EdgesMap = NetManager
+        self.edits:queue.Queue = queue.Queue()
+        self.results:queue.Queue = queue.Queue()
+        self.progress:DVR_logic.ConvergenceStats = None
+        self.pending:list[int] = []
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, name="DVR convergence", daemon=True)
+        self.__thread.start()
+    
+    def submit(self, operation: str, *args):
+        """
+        Queues a change to the network.
+        
+        Args:
+            operation (str): "addNode", "addEdge", "removeNode", "removeEdge",
+                or "readNet" to make a list of nodes read the network and converge from them.
+            *args: The arguments of the operation, without the NodeList.
+        """
+        self.edits.put((operation,) + args)
+    
+    def stop(self):
+        """
+        Stops the running convergence and the ones of the changes queued so far.
+        """
+        self.__stop.set()
+    
+    def resume(self):
+        """
+        Lets the next changes converge again, after stop. Must be called when the queue is empty.
+        """
+        self.__stop.clear()
+    
+    def close(self):
+        """
+        Stops the running convergence and the thread, discarding nothing already applied.
+        """
+        self.__stop.set()
+        self.edits.put(None)
+        self.__thread.join()
+    
+    def apply(self, edit: tuple) -> list[int]:
+        """
+        Applies a change to the network, without converging.
+        
+        Args:
+            edit (tuple): The operation name and its arguments.
+        
+        Returns:
+            list[int]: The nodes that must send their routing tables.
+        """
+        operation, args = edit[0], edit[1:]
+        if operation == "addNode":
+            newNode = self.NetManager.addNode(args[0])
+            if newNode != None:
+                self.NodeList.append(newNode)
+            return []
+        elif operation == "addEdge":
+            self.NetManager.addEdge(args[0], args[1], args[2], self.NodeList)
+            return [args[0], args[1]]
+        elif operation == "removeNode":
+            nbs = self.NetManager.getNeighborsId(args[0])
+            self.NetManager.removeNode(args[0], self.NodeList)
+            return nbs
+        elif operation == "removeEdge":
+            self.NetManager.removeEdge(args[0], args[1], self.NodeList)
+            return [args[0], args[1]]
+        elif operation == "readNet":
+            DVR_logic.makeNodesReadNet(args[0], self.NetManager, self.NodeList)
+            return list(args[0])
+        raise ValueError(f"Invalid operation {operation}")
+    
+    def __converging(self, stats: DVR_logic.ConvergenceStats) -> bool:
+        """
+        Publishes the progress of the running convergence, and tells it whether to go on.
+        """
+        self.progress = stats
+        return not self.__stop.is_set()
+    
+    def __run(self):
+        """
+        Body of the worker thread: applies the queued changes one at a time until closed.
+        """
+        while True:
+            edit = self.edits.get()
+            if edit == None:
+                return
+            try:
+                priority = self.apply(edit)
+                if self.__stop.is_set():
+                    self.pending = list(dict.fromkeys(self.pending + priority))
+                    self.results.put(("stopped", edit, None))
+                elif priority or self.pending:
+                    stats = DVR_logic.updateNet(self.NodeList, self.NetManager, list(dict.fromkeys(self.pending + priority)), progress=self.__converging)
+                    self.pending = stats.pending
+                    self.results.put(("stopped" if stats.pending else "done", edit, stats))
+                else:
+                    self.results.put(("done", edit, None))
+            except Exception as e:
+                self.results.put(("error", edit, e))
+            finally:
+                self.progress = None
 
 class GraphGUI:
     """
@@ -35,10 +192,16 @@ class GraphGUI:
     Attributes:
         root (tk.Tk): The root Tkinter window.
         idCounter (int): Counter for node IDs.
-        NodeList (list): List of WebNode objects in the network.
+        NodeList (NodeRegistry): Indexed collection of WebNode objects in the network.
         NetManager (EdgesMap): Manages edges and nodes in the network.
         nodeVisuals (dict[int, VisualObject]): Stores visual representations of nodes.
         edgeVisuals (dict[tuple[int, int], VisualObject]): Stores visual representations of edges.
+        spatialIndex (SpatialIndex): Indexes the drawn nodes and edges by position, to find the one closest to a click.
+        worker (ConvergenceWorker): Applies the changes to the network and makes it converge in the background.
+        queued (int): The number of changes submitted to the worker and not completed yet.
+        scale (float): The zoom of the canvas.
+        offsetX (float): The x-coordinate in the network of the left side of the canvas.
+        offsetY (float): The y-coordinate in the network of the top side of the canvas.
     """
     def __init__(self, root):
         """
@@ -52,16 +215,32 @@ class GraphGUI:
         
         # Initialize attributes
         self.idCounter = 1
-        self.NodeList:list[DVR_logic.WebNode] = []
+        self.NodeList:DVR_logic.NodeRegistry = DVR_logic.NodeRegistry()
         self.NetManager:DVR_logic.EdgesMap = DVR_logic.EdgesMap()
+        self.oracle:DVR_verify.ShortestPathOracle = DVR_verify.ShortestPathOracle(self.NetManager)
         self.nodeVisuals:dict[int, VisualObject] = {}
         self.edgeVisuals:dict[tuple[int, int], VisualObject] = {}
+        self.spatialIndex:DVR_spatial.SpatialIndex = DVR_spatial.SpatialIndex()
+        self.worker:ConvergenceWorker = ConvergenceWorker(self.NodeList, self.NetManager)
+        self.queued:int = 0
+        self.scale:float = 1.0
+        self.offsetX:float = 0.0
+        self.offsetY:float = 0.0
+        self.__drawn:set = set()
+        self.__generation:int = 0
+        self.__redrawJob = None
+        self.__panFrom:tuple[int, int] = None
         
         # Set up the canvas for graphical display
         self.canvas = tk.Canvas(root, width=600, height=400, bg="white")
         self.canvas.pack(side=tk.LEFT)
         self.canvas.bind("<Button-1>", self.createNode)
         self.canvas.bind("<Button-3>", self.handleRightClick)
+        self.canvas.bind("<MouseWheel>", lambda event: self.zoom(event, 1.25 if event.delta > 0 else 0.8))
+        self.canvas.bind("<Button-4>", lambda event: self.zoom(event, 1.25))
+        self.canvas.bind("<Button-5>", lambda event: self.zoom(event, 0.8))
+        self.canvas.bind("<Button-2>", self.startPan)
+        self.canvas.bind("<B2-Motion>", self.pan)
         
         # Set up control frame for inputs and buttons
         control_frame = tk.Frame(root)
@@ -84,6 +263,30 @@ class GraphGUI:
         
         execute_button = tk.Button(control_frame, text="Print routing tables", command=self.printRoutingTables)
         execute_button.pack(side='bottom', pady=5)
+        
+        load_button = tk.Button(control_frame, text="Load network", command=self.loadNetwork)
+        load_button.pack(side='bottom', pady=5)
+        
+        save_button = tk.Button(control_frame, text="Save network", command=self.saveNetwork)
+        save_button.pack(side='bottom', pady=5)
+        
+        import_button = tk.Button(control_frame, text="Import topology", command=self.importTopology)
+        import_button.pack(side='bottom', pady=5)
+        
+        fit_button = tk.Button(control_frame, text="Fit view", command=self.fitView)
+        fit_button.pack(side='bottom', pady=5)
+        
+        # Reading or replacing the network waits for the convergence
+        self.idle_buttons = [execute_button, load_button, save_button, import_button]
+        
+        self.cancel_button = tk.Button(control_frame, text="Stop convergence", command=self.stopConvergence, state=tk.DISABLED)
+        self.cancel_button.pack(pady=5)
+        self.progress_bar = ttk.Progressbar(control_frame, mode="indeterminate", length=150)
+        self.progress_bar.pack(pady=5)
+        self.status_label = tk.Label(control_frame, text="Network stable", wraplength=150)
+        self.status_label.pack()
+        
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
 
     def createNode(self, event):
         """
@@ -92,16 +295,186 @@ class GraphGUI:
         Args:
             event (tk.Event): The mouse event containing the click location.
         """
-        newNode = self.NetManager.addNode(self.idCounter)
-        if newNode != None:
-            self.NodeList.append(newNode)
-            
-            x, y = event.x, event.y
-            shape = self.canvas.create_oval(x-10, y-10, x+10, y+10, fill="blue")
-            text = self.canvas.create_text(x, y, text=str(self.idCounter), fill="white")
-            
-            self.nodeVisuals[self.idCounter] = VisualObject(shape, text, x, y)
-            self.idCounter += 1
+        x, y = self.toNetwork(event.x, event.y)
+        self.submit("addNode", self.idCounter)
+        self.drawNode(self.idCounter, x, y)
+        self.idCounter += 1
+    
+    def toNetwork(self, x: float, y: float) -> tuple[float, float]:
+        """
+        Converts a point of the canvas to the network coordinates, with the current zoom and scrolling.
+        """
+        return (x / self.scale + self.offsetX, y / self.scale + self.offsetY)
+    
+    def toCanvas(self, x: float, y: float) -> tuple[float, float]:
+        """
+        Converts a point of the network to the canvas coordinates, with the current zoom and scrolling.
+        """
+        return ((x - self.offsetX) * self.scale, (y - self.offsetY) * self.scale)
+    
+    def drawNode(self, id: int, x: float, y: float, render: bool = True):
+        """
+        Draws a node on the canvas and stores its visual representation.
+        
+        Args:
+            id (int): The identifier of the node.
+            x (float): The x-coordinate of the node in the network.
+            y (float): The y-coordinate of the node in the network.
+            render (bool): False to only store the node, when many are added before a redraw.
+        """
+        self.nodeVisuals[id] = VisualObject(None, None, x, y, str(id))
+        self.spatialIndex.addPoint(id, x, y, NODE_RADIUS)
+        if render:
+            self.renderNode(id)
+    
+    def drawEdge(self, src: int, dst: int, w: int, render: bool = True):
+        """
+        Draws an edge between two drawn nodes, below them, and stores its visual representation.
+        
+        Args:
+            src (int): The identifier of the first node.
+            dst (int): The identifier of the second node.
+            w (int): The weight of the edge.
+            render (bool): False to only store the edge, when many are added before a redraw.
+        """
+        x1, y1 = self.nodeVisuals[src].x, self.nodeVisuals[src].y
+        x2, y2 = self.nodeVisuals[dst].x, self.nodeVisuals[dst].y
+        edge = (min(src, dst), max(src, dst))
+        
+        self.edgeVisuals[edge] = VisualObject(None, None, (x1 + x2) / 2, (y1 + y2) / 2, str(w))
+        self.spatialIndex.addSegment(edge, x1, y1, x2, y2)
+        if render:
+            self.renderEdge(edge)
+    
+    def renderNode(self, id: int):
+        """
+        Creates the canvas items of a stored node, its identifier only if the zoom is at least LABEL_SCALE.
+        """
+        visual = self.nodeVisuals[id]
+        x, y = self.toCanvas(visual.x, visual.y)
+        r = max(2, NODE_RADIUS * self.scale)
+        visual.shape = self.canvas.create_oval(x-r, y-r, x+r, y+r, fill="blue")
+        if self.scale >= LABEL_SCALE:
+            visual.text = self.canvas.create_text(x, y, text=visual.label, fill="white")
+        self.__drawn.add(id)
+    
+    def renderEdge(self, edge: tuple[int, int]):
+        """
+        Creates the canvas items of a stored edge, below the nodes, its weight only if the zoom is at least LABEL_SCALE.
+        """
+        visual = self.edgeVisuals[edge]
+        x1, y1 = self.toCanvas(self.nodeVisuals[edge[0]].x, self.nodeVisuals[edge[0]].y)
+        x2, y2 = self.toCanvas(self.nodeVisuals[edge[1]].x, self.nodeVisuals[edge[1]].y)
+        visual.shape = self.canvas.create_line(x1, y1, x2, y2, fill="black")
+        self.canvas.tag_lower(visual.shape)
+        if self.scale >= LABEL_SCALE:
+            visual.text = self.canvas.create_text((x1 + x2) / 2, (y1 + y2) / 2, text=visual.label, fill="red")
+        self.__drawn.add(edge)
+    
+    def erase(self, visual: VisualObject):
+        """
+        Deletes the canvas items of a node or an edge, if it is drawn.
+        """
+        if visual.shape != None:
+            self.canvas.delete(visual.shape)
+        if visual.text != None:
+            self.canvas.delete(visual.text)
+        visual.shape = visual.text = None
+    
+    def redraw(self):
+        """
+        Draws again the nodes and edges in view, found with the spatial index, with the current zoom.
+        The items are created DRAW_BATCH at a time, letting Tk handle the events in between,
+        and a newer redraw abandons the batches of the previous one.
+        """
+        self.__redrawJob = None
+        self.__generation += 1
+        self.canvas.delete("all")
+        for key in self.__drawn:
+            visual = self.edgeVisuals.get(key) if isinstance(key, tuple) else self.nodeVisuals.get(key)
+            if visual != None:
+                visual.shape = visual.text = None
+        self.__drawn = set()
+        
+        width, height = int(self.canvas["width"]), int(self.canvas["height"])
+        x1, y1 = self.toNetwork(0, 0)
+        x2, y2 = self.toNetwork(width, height)
+        # The nodes are drawn after the edges, so they are above them from the first batch
+        visible = sorted(self.spatialIndex.query(x1, y1, x2, y2), key=lambda k: not isinstance(k, tuple))
+        self.drawBatch(self.__generation, visible, 0)
+    
+    def drawBatch(self, generation: int, items: list, start: int):
+        """
+        Creates the canvas items of the next DRAW_BATCH nodes and edges of a redraw, and schedules the following batch.
+        The items deleted or drawn in the meantime are skipped.
+        """
+        if generation != self.__generation:
+            return
+        for key in items[start:start + DRAW_BATCH]:
+            if isinstance(key, tuple):
+                if key in self.edgeVisuals and self.edgeVisuals[key].shape == None:
+                    self.renderEdge(key)
+            elif key in self.nodeVisuals and self.nodeVisuals[key].shape == None:
+                self.renderNode(key)
+        if start + DRAW_BATCH < len(items):
+            self.root.after(1, self.drawBatch, generation, items, start + DRAW_BATCH)
+    
+    def scheduleRedraw(self):
+        """
+        Redraws the canvas shortly, once for a burst of zoom or scroll events.
+        """
+        if self.__redrawJob != None:
+            self.root.after_cancel(self.__redrawJob)
+        self.__redrawJob = self.root.after(30, self.redraw)
+    
+    def zoom(self, event, factor: float):
+        """
+        Zooms the canvas in or out, keeping the point under the mouse still.
+        
+        Args:
+            event (tk.Event): The mouse wheel event.
+            factor (float): The zoom factor, greater than 1 to zoom in.
+        """
+        x, y = self.toNetwork(event.x, event.y)
+        self.scale = min(MAX_SCALE, max(MIN_SCALE, self.scale * factor))
+        self.offsetX, self.offsetY = x - event.x / self.scale, y - event.y / self.scale
+        self.scheduleRedraw()
+    
+    def startPan(self, event):
+        """
+        Starts scrolling the canvas with the middle mouse button.
+        """
+        self.__panFrom = (event.x, event.y)
+    
+    def pan(self, event):
+        """
+        Scrolls the canvas following the mouse: the drawn items are moved at once, and the ones coming into view are drawn by a redraw.
+        """
+        if self.__panFrom == None:
+            return
+        dx, dy = event.x - self.__panFrom[0], event.y - self.__panFrom[1]
+        self.__panFrom = (event.x, event.y)
+        self.canvas.move("all", dx, dy)
+        self.offsetX -= dx / self.scale
+        self.offsetY -= dy / self.scale
+        self.scheduleRedraw()
+    
+    def fitView(self):
+        """
+        Shows the whole network: at zoom 1 and without scrolling if it fits in the canvas, otherwise zoomed out and centered.
+        """
+        width, height = int(self.canvas["width"]), int(self.canvas["height"])
+        self.scale, self.offsetX, self.offsetY = 1.0, 0.0, 0.0
+        if self.nodeVisuals:
+            xs = [v.x for v in self.nodeVisuals.values()]
+            ys = [v.y for v in self.nodeVisuals.values()]
+            minX, maxX, minY, maxY = min(xs), max(xs), min(ys), max(ys)
+            if minX < NODE_RADIUS or minY < NODE_RADIUS or maxX > width - NODE_RADIUS or maxY > height - NODE_RADIUS:
+                margin = 2 * NODE_RADIUS
+                self.scale = max(MIN_SCALE, min(1.0, (width - 2 * margin) / max(maxX - minX, 1), (height - 2 * margin) / max(maxY - minY, 1)))
+                self.offsetX = (minX + maxX) / 2 - width / 2 / self.scale
+                self.offsetY = (minY + maxY) / 2 - height / 2 / self.scale
+        self.redraw()
 
     def addEdge(self):
         """
@@ -125,7 +498,7 @@ class GraphGUI:
             self.w_entry.delete(0, tk.END)
 
             
-            if src == dst or DVR_logic.findNodePos(src, self.NodeList) == None or DVR_logic.findNodePos(dst, self.NodeList) == None:
+            if src == dst or src not in self.nodeVisuals or dst not in self.nodeVisuals:
                 raise ValueError("Invalid nodes")
         
             if w <= 0:
@@ -134,18 +507,8 @@ class GraphGUI:
             if (min(src, dst), max(src, dst)) in self.edgeVisuals.keys():
                 raise ValueError("The edge already exists")
             
-            x1, y1 = self.nodeVisuals[src].x, self.nodeVisuals[src].y
-            x2, y2 = self.nodeVisuals[dst].x, self.nodeVisuals[dst].y
-            
-            shape = self.canvas.create_line(x1, y1, x2, y2, fill="black")
-            self.canvas.tag_lower(shape)
-            x, y = (x1 + x2) / 2, (y1 + y2) / 2
-            text = self.canvas.create_text(x, y, text=str(w), fill="red")
-            
-            self.edgeVisuals[(min(src, dst), max(src, dst))] = VisualObject(shape, text, x, y)
-            self.NetManager.addEdge(src, dst, w, self.NodeList)
-            
-            DVR_logic.updateNet(self.NodeList, self.NetManager, [src, dst])
+            self.drawEdge(src, dst, w)
+            self.submit("addEdge", src, dst, w)
             
         except ValueError as ve:
             messagebox.showerror("Error", ve)
@@ -153,6 +516,8 @@ class GraphGUI:
     def findClosestItem(self, event) -> tuple[int, int]:
         """
         Finds the closest visual object (node or edge) to the given click location.
+        Nodes are discs of radius 10, edges are segments between the nodes: the distance is the Euclidean one
+        from their border, and a node wins a tie with an edge, so clicks on a node never pick the edges reaching it.
         
         Args:
             event (tk.Event): The mouse event containing the click location.
@@ -163,29 +528,14 @@ class GraphGUI:
             - If an edge is closer -> (srcId, dstId)
             - If no objects are found -> (None, None)
         """
-        minDistNode = None
-        minDistEdge = None
-        minNode = None
-        minEdge = None
-        
-        for k in self.nodeVisuals:
-            dist = abs(self.nodeVisuals[k].x - event.x) + abs(self.nodeVisuals[k].y - event.y)
-            if minNode == None or minDistNode > dist:
-                minNode = k
-                minDistNode = dist
-        
-        for k in self.edgeVisuals:
-            dist = abs(self.edgeVisuals[k].x - event.x) + abs(self.edgeVisuals[k].y - event.y)
-            if minEdge == None or minDistEdge > dist:
-                minEdge = k
-                minDistEdge = dist
-        
-        if minEdge == None or minDistNode < minDistEdge:
-            return (minNode, None)
-        elif minNode == None or minDistNode > minDistEdge:
-            return minEdge
-        else:
+        x, y = self.toNetwork(event.x, event.y)
+        key, _ = self.spatialIndex.nearest(x, y, prefer=lambda k: not isinstance(k, tuple))
+        if key == None:
             return (None, None)
+        elif isinstance(key, tuple):
+            return key
+        else:
+            return (key, None)
     
     def handleRightClick(self, event):
         """
@@ -210,21 +560,17 @@ class GraphGUI:
         """
         if messagebox.askyesno("Confirm Deletion", f"Do you want to delete node {id}?"):
             
-            self.canvas.delete(self.nodeVisuals[id].shape)
-            self.canvas.delete(self.nodeVisuals[id].text)
+            self.erase(self.nodeVisuals[id])
             del self.nodeVisuals[id]
+            self.spatialIndex.remove(id)
             
-            nbs = self.NetManager.getNeighborsId(id)
+            # The network may still lack queued changes: the drawn edges are the up-to-date ones
+            for edge in [e for e in self.edgeVisuals if id in e]:
+                self.erase(self.edgeVisuals[edge])
+                del self.edgeVisuals[edge]
+                self.spatialIndex.remove(edge)
             
-            for e in self.NetManager.getEdges(id):
-                edge = (min(id, e.dst), max(id, e.dst))
-                if edge in self.edgeVisuals.keys():
-                    self.canvas.delete(self.edgeVisuals[edge].shape)
-                    self.canvas.delete(self.edgeVisuals[edge].text)
-                    del self.edgeVisuals[edge]
-                    
-            self.NetManager.removeNode(id, self.NodeList)
-            DVR_logic.updateNet(self.NodeList, self.NetManager, nbs)
+            self.submit("removeNode", id)
 
     def deleteEdge(self, edgeIds:tuple[int, int]):
         """
@@ -237,32 +583,193 @@ class GraphGUI:
         
         if edge in self.edgeVisuals.keys():
             if messagebox.askyesno("Confirm Deletion", f"Do you want to delete edge {edge[0]} - {edge[1]}?"):
-                self.canvas.delete(self.edgeVisuals[edge].shape)
-                self.canvas.delete(self.edgeVisuals[edge].text)
+                self.erase(self.edgeVisuals[edge])
                 del self.edgeVisuals[edge]
-                self.NetManager.removeEdge(edge[0], edge[1], self.NodeList)
-                DVR_logic.updateNet(self.NodeList, self.NetManager, [edge[0], edge[1]])
+                self.spatialIndex.remove(edge)
+                self.submit("removeEdge", edge[0], edge[1])
 
+    def submit(self, operation: str, *args):
+        """
+        Queues a change to the network on the worker, and starts following its progress.
+        Changes made while the network converges are applied after the running convergence.
+        
+        Args:
+            operation (str): "addNode", "addEdge", "removeNode" or "removeEdge".
+            *args: The arguments of the operation.
+        """
+        self.worker.submit(operation, *args)
+        self.queued += 1
+        if self.queued == 1:
+            for button in self.idle_buttons:
+                button.config(state=tk.DISABLED)
+            self.cancel_button.config(state=tk.NORMAL)
+            self.progress_bar.start(20)
+            self.root.after(50, self.pollWorker)
+    
+    def pollWorker(self):
+        """
+        Reads the results of the worker on the Tk thread, and updates the progress shown,
+        every 50 ms until the queued changes are completed.
+        """
+        while True:
+            try:
+                kind, edit, result = self.worker.results.get_nowait()
+            except queue.Empty:
+                break
+            self.queued -= 1
+            if kind == "error":
+                messagebox.showerror("Error", result)
+        
+        if self.queued > 0:
+            progress = self.worker.progress
+            waiting = f", {self.queued - 1} changes queued" if self.queued > 1 else ""
+            if progress != None:
+                self.status_label.config(text=f"Converging: round {progress.rounds}, {progress.messages} messages{waiting}")
+            self.root.after(50, self.pollWorker)
+            return
+        
+        self.worker.resume()
+        self.progress_bar.stop()
+        self.cancel_button.config(state=tk.DISABLED)
+        for button in self.idle_buttons:
+            button.config(state=tk.NORMAL)
+        if self.worker.pending:
+            self.status_label.config(text=f"Stopped: {len(self.worker.pending)} nodes will send their tables with the next change")
+        else:
+            self.status_label.config(text="Network stable")
+    
+    def stopConvergence(self):
+        """
+        Stops the running convergence, and the ones of the queued changes, which are still applied.
+        The routing tables are completed by the convergence of the next change.
+        """
+        self.worker.stop()
+        self.status_label.config(text="Stopping...")
+    
     def printRoutingTables(self):
         """
         Writes the routing tables of all nodes to a file and displays a success message.
+        Every table is followed by its entries that do not match the shortest paths of the network.
+        The tables and the edges are streamed to the file by DVR_export, one at a time.
         """
         path = 'RoutingTables.txt'
         
+        errors:dict[int, list[DVR_verify.RouteError]] = {}
+        for e in self.oracle.verify(self.NodeList):
+            errors.setdefault(e.nodeId, []).append(e)
+        
         with open(path, 'w') as file:
+            exporter = DVR_export.Exporter(file)
             for wn in self.NodeList:
-                file.write(str(wn)+"\n")
-                # for e in wn.getRoutingMap().keys():
-                #     if not DVR_logic.is_minimum_distance(self.NetManager.getMap(), wn.getId(), e, wn.getRoutingMap()[e].dist):
-                #         file.write(f"{wn.getId()} -> {e} is wrong\n\n")
-                                    
-            file.write(str(self.NetManager)+"\n")
-                
-        messagebox.showinfo("Routing Tables", f"The routing tables were successfully printed in {path}")
+                exporter.writeRoutingTable(wn)
+                file.write("\n")
+                for e in errors.get(wn.getId(), []):
+                    file.write(f"{e}\n\n")
+            
+            exporter.writeEdges(self.NetManager)
+            file.write("\n")
+        
+        wrong = sum(len(e) for e in errors.values())
+        messagebox.showinfo("Routing Tables", f"The routing tables were successfully printed in {path}" + (f"\n{wrong} entries are wrong" if wrong else ""))
+
+    def saveNetwork(self):
+        """
+        Saves the network, with the routing tables and the position of the nodes, to a snapshot file.
+        """
+        path = filedialog.asksaveasfilename(title="Save network", defaultextension=".dvr", filetypes=[("Network snapshots", "*.dvr")])
+        if not path:
+            return
+        coordinates = {id: (v.x, v.y) for id, v in self.nodeVisuals.items()}
+        DVR_snapshot.saveSnapshot(path, self.NodeList, self.NetManager, coordinates)
+        messagebox.showinfo("Save network", f"The network was successfully saved in {path}")
+    
+    def loadNetwork(self):
+        """
+        Replaces the network with one saved in a snapshot file, routing tables included.
+        Nodes saved without a position are placed on a circle.
+        """
+        path = filedialog.askopenfilename(title="Load network", filetypes=[("Network snapshots", "*.dvr"), ("All files", "*")])
+        if not path:
+            return
+        try:
+            NodeList, _, coordinates = DVR_snapshot.loadSnapshot(path, self.NetManager)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", e)
+            return
+        
+        ids = NodeList.ids()
+        width, height = int(self.canvas["width"]), int(self.canvas["height"])
+        radius = min(width, height) / 2 - 20
+        positions = {}
+        for i, id in enumerate(ids):
+            positions[id] = coordinates.get(id, (width / 2 + radius * math.cos(2 * math.pi * i / len(ids)), height / 2 + radius * math.sin(2 * math.pi * i / len(ids))))
+        self.replaceNetwork(NodeList, positions)
+        DVR_logic.actionLog("Network loaded from %s", path)
+    
+    def importTopology(self):
+        """
+        Replaces the network with the nodes and edges of a topology file, in the scenario format of DVR_run,
+        placing the nodes with DVR_layout.forceLayout, which requires numpy.
+        The nodes then read the network and converge on the worker, like any other change.
+        """
+        path = filedialog.askopenfilename(title="Import topology", filetypes=[("Topologies", "*.txt"), ("All files", "*")])
+        if not path:
+            return
+        try:
+            import DVR_layout
+        except ImportError:
+            messagebox.showerror("Error", "Importing a topology requires numpy")
+            return
+        try:
+            edgeMap = DVR_run.readTopology(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", e)
+            return
+        
+        ids = list(edgeMap)
+        positions = DVR_layout.forceLayout(ids, [(id, e.dst) for id, edges in edgeMap.items() for e in edges if id < e.dst])
+        self.NetManager.loadMap(edgeMap)
+        self.replaceNetwork(DVR_logic.NodeRegistry([DVR_logic.WebNode(id) for id in ids]), positions)
+        DVR_logic.actionLog("Topology imported from %s", path)
+        if ids:
+            self.submit("readNet", ids)
+    
+    def replaceNetwork(self, NodeList: DVR_logic.NodeRegistry, positions: dict[int, tuple[float, float]]):
+        """
+        Replaces the nodes, after their edges were loaded in NetManager, and draws the new network fitting the view.
+        
+        Args:
+            NodeList (NodeRegistry): The new nodes.
+            positions (dict[int, tuple[float, float]]): The position of every node in the network.
+        """
+        self.NodeList = NodeList
+        self.worker.NodeList = NodeList
+        self.worker.pending = []
+        self.nodeVisuals = {}
+        self.edgeVisuals = {}
+        self.spatialIndex.clear()
+        
+        ids = NodeList.ids()
+        for id in ids:
+            self.drawNode(id, positions[id][0], positions[id][1], render=False)
+        for id in ids:
+            for e in self.NetManager.getEdges(id):
+                if id < e.dst:
+                    self.drawEdge(id, e.dst, e.w, render=False)
+        
+        self.idCounter = max(ids, default=0) + 1
+        self.fitView()
+
+    def close(self):
+        """
+        Stops the convergence, writes the buffered log lines to the log file and closes the window.
+        """
+        self.worker.close()
+        DVR_log.sink.close()
+        self.root.destroy()
 
 def main():
-    with open('log.txt', "w"):
-        pass
+    DVR_log.sink.reset()
     root = tk.Tk()
     app = GraphGUI(root)
     root.mainloop()